@@ -0,0 +1,334 @@
+# Python 3.7
+# appendix to sherdog-parser.py
+# Created by - Montanaz0r (https://github.com/Montanaz0r)
+# Career statistics computed over scraped fight histories. Output of sherdog-parser.py (csv or json) is loaded once
+# into NumPy arrays with categorical codes, then every aggregate is computed for all fighters at once with batched
+# array operations (bincount, lexsort, ufunc.at) instead of looping over fighters in Python.
+#
+# Usage: python analytics.py sherdog.json [sherdog-stats.csv]
+#        python analytics.py sherdog.csv.gz                      - statistics are saved to sherdog-stats.csv
+
+import csv
+import json
+import sys
+
+import numpy as np
+
+import normalize
+from compressed_io import open_input, compression_from_path, COMPRESSIONS
+
+RESULTS = ('win', 'loss', 'draw', 'nc', 'other')  # categorical codes of fight results.
+WIN, LOSS, DRAW, NO_CONTEST, OTHER_RESULT = range(len(RESULTS))
+METHODS = ('ko_tko', 'submission', 'decision', 'other')  # categorical codes of fight end methods.
+KO_TKO, SUBMISSION, DECISION, OTHER_METHOD = range(len(METHODS))
+MISSING_DAY = np.iinfo(np.int32).min  # epoch day used when event date could not be parsed.
+MISSING_VALUE = -1  # round number or fight seconds which could not be parsed.
+
+
+class FightTable(object):
+    """FightTable class - columnar representation of all pro fights found in scraped output, one row per fight.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty FightTable instance.
+        """
+        self.fighters = None  # array of str: unique fighter keys (url when available, name otherwise)
+        self.fighter_names = None  # array of str: fighter names matching self.fighters
+        self.opponents = None  # array of str: unique opponent names
+        self.referees = None  # array of str: unique referee names
+
+        self.fighter = None  # array of int32: index into self.fighters for every fight
+        self.opponent = None  # array of int32: index into self.opponents for every fight
+        self.referee = None  # array of int32: index into self.referees for every fight
+        self.result = None  # array of int8: index into RESULTS for every fight
+        self.method = None  # array of int8: index into METHODS for every fight
+        self.day = None  # array of int32: event date as days since 1970-01-01, MISSING_DAY if unknown
+        self.round_number = None  # array of int16: round in which fight has ended, MISSING_VALUE if unknown
+        self.seconds = None  # array of int32: total fight duration in seconds, MISSING_VALUE if unknown
+        self.order = None  # array of int32: position of the fight in the source file
+
+    def __len__(self):
+        return 0 if self.fighter is None else len(self.fighter)
+
+
+def _parse_event_day(event_date):
+    """
+    Converts sherdog's event date to number of days since 1970-01-01.
+    :param event_date: string with event date, for instance 'Mar / 20 / 2005'
+    :return: integer with epoch day or MISSING_DAY in case date could not be parsed
+    """
+    day = normalize.parse_event_date(event_date)
+    return MISSING_DAY if day is None else day
+
+
+def _parsed_or_missing(parse):
+    """
+    Wraps parsing function of normalize.py, so values which could not be parsed become MISSING_VALUE.
+    :param parse: function taking string and returning integer or None
+    :return: function taking string and returning integer
+    """
+    def parsed(value):
+        number = parse(value)
+        return MISSING_VALUE if number is None else number
+    return parsed
+
+
+def _method_category(method):
+    """
+    Assigns fight end method to one of METHODS categories.
+    :param method: string with method scraped from sherdog, for instance 'TKO (Punches)'
+    :return: integer with METHODS code
+    """
+    method = method.strip().lower()
+    if method.startswith(('ko', 'tko')):
+        return KO_TKO
+    elif method.startswith('submission'):
+        return SUBMISSION
+    elif 'decision' in method:
+        return DECISION
+    return OTHER_METHOD
+
+
+def _result_category(result):
+    """
+    Assigns fight result to one of RESULTS categories.
+    :param result: string with result scraped from sherdog, for instance 'win'
+    :return: integer with RESULTS code
+    """
+    result = result.strip().lower()
+    if result in RESULTS:
+        return RESULTS.index(result)
+    return OTHER_RESULT
+
+
+def _encode(values, mapper=None, dtype=np.int32):
+    """
+    Builds categorical codes for list of strings, mapper is applied once per unique value rather than once per row.
+    :param values: list of strings
+    :param mapper: optional - function translating unique value to code, when None index of unique value is used
+    :param dtype: NumPy dtype of returned codes
+    :return: tuple (array with unique values, array with code for every value)
+    """
+    uniques, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    if mapper is None:
+        return uniques, inverse.astype(dtype)
+    lookup = np.array([mapper(value) for value in uniques], dtype=dtype)
+    return uniques, lookup[inverse]
+
+
+def _iter_csv_fights(filename):
+    """
+    Iterates over fights saved by Fighter.save_to_csv.
+    :param filename: string with path to csv file
+    :return: generator of tuples (fighter key, fighter name, opponent, result, event date, method, referee, round, time)
+    """
+    with open_input(filename, newline='', encoding="ISO-8859-1") as csvfile:
+        reader = csv.reader(csvfile, delimiter=';')
+        for row in reader:
+            if len(row) < 9 or row[0].startswith('Fighter'):  # skipping headers and broken lines.
+                continue
+            key = row[12] if len(row) > 12 and row[12] else row[0]  # older files have no Fighter_url column.
+            yield key, row[0], row[1], row[2], row[4], row[5], row[6], row[7], row[8]
+
+
+def _iter_json_fights(filename):
+    """
+    Iterates over fights saved by Fighter.save_data or Fighter.save_to_json.
+    :param filename: string with path to json file
+    :return: generator of tuples (fighter key, fighter name, opponent, result, event date, method, referee, round, time)
+    """
+    with open_input(filename, encoding='utf-8') as fighter_json:
+        data = json.load(fighter_json)
+    if isinstance(data.get('fighters'), list):
+        for fighter in data['fighters']:
+            key = fighter.get('fighterUrl') or fighter.get('name')
+            for fight in fighter.get('fightHistoryPro', []):
+                yield (key, fighter.get('name'), fight['opponent'], fight['result'], fight['date'], fight['method'],
+                       fight['judge'], fight['round'], fight['time'])
+    else:
+        for name, fights in data.items():
+            for fight in fights:
+                yield (name, name, fight['opponent'], fight['result'], fight['date'], fight['method'], fight['judge'],
+                       fight['round'], fight['time'])
+
+
+def load_fights(filename):
+    """
+    Loads output of sherdog-parser.py into FightTable instance.
+    :param filename: string with path to .csv or .json file, optionally compressed (.gz or .zst suffix)
+    :return: FightTable instance
+    """
+    if '.json' in filename:
+        rows = list(_iter_json_fights(filename))
+    else:
+        rows = list(_iter_csv_fights(filename))
+    columns = list(zip(*rows)) if rows else [[] for _ in range(9)]
+    keys, names, opponents, results, dates, methods, referees, rounds, times = [[str(value) for value in column]
+                                                                                 for column in columns]
+
+    table = FightTable()
+    table.fighters, table.fighter = _encode(keys)
+    first_row = np.full(len(table.fighters), len(keys), dtype=np.int64)
+    np.minimum.at(first_row, table.fighter, np.arange(len(keys)))
+    table.fighter_names = np.asarray(names, dtype=str)[first_row] if len(keys) else np.asarray([], dtype=str)
+    table.opponents, table.opponent = _encode(opponents)
+    table.referees, table.referee = _encode(referees)
+    table.result = _encode(results, _result_category, np.int8)[1]
+    table.method = _encode(methods, _method_category, np.int8)[1]
+    table.day = _encode(dates, _parse_event_day, np.int32)[1]
+    table.round_number = _encode(rounds, _parsed_or_missing(normalize.parse_round), np.int16)[1]
+    fight_time = _encode(times, _parsed_or_missing(normalize.parse_time), np.int32)[1]
+    known = (table.round_number != MISSING_VALUE) & (fight_time != MISSING_VALUE)
+    table.seconds = np.where(known, (table.round_number - 1) * normalize.ROUND_SECONDS + fight_time, MISSING_VALUE)
+    table.seconds = table.seconds.astype(np.int32)
+    table.order = np.arange(len(keys), dtype=np.int32)
+    return table
+
+
+def chronological_order(table):
+    """
+    Sorts fights by fighter and then by event date. Sherdog lists fights from the most recent one, so fights from the
+    same day (or without date) keep reversed page order.
+    :param table: FightTable instance
+    :return: array with indices of fights in chronological order grouped by fighter
+    """
+    return np.lexsort((-table.order, table.day, table.fighter))
+
+
+def compute_career_stats(table):
+    """
+    Computes career aggregates for all fighters in FightTable instance at once.
+    :param table: FightTable instance
+    :return: dictionary of arrays, each array is indexed the same way as table.fighters
+    """
+    n = len(table.fighters)
+    stats = {}
+
+    by_result = np.bincount(table.fighter * len(RESULTS) + table.result,
+                            minlength=n * len(RESULTS)).reshape(n, len(RESULTS))
+    stats['fights'] = by_result.sum(axis=1)
+    stats['wins'] = by_result[:, WIN]
+    stats['losses'] = by_result[:, LOSS]
+    stats['draws'] = by_result[:, DRAW]
+    stats['no_contests'] = by_result[:, NO_CONTEST]
+
+    for code, label in ((WIN, 'wins'), (LOSS, 'losses')):
+        mask = table.result == code
+        by_method = np.bincount(table.fighter[mask] * len(METHODS) + table.method[mask],
+                                minlength=n * len(METHODS)).reshape(n, len(METHODS))
+        for method_code, method in enumerate(METHODS):
+            stats[f'{label}_{method}'] = by_method[:, method_code]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats['win_finish_rate'] = (stats['wins_ko_tko'] + stats['wins_submission']) / stats['wins']
+        stats['loss_finish_rate'] = (stats['losses_ko_tko'] + stats['losses_submission']) / stats['losses']
+
+    # Cage time: fights with unknown round or time are left out of both sum and mean.
+    timed = table.seconds != MISSING_VALUE
+    timed_count = np.bincount(table.fighter[timed], minlength=n)
+    stats['fight_seconds'] = np.bincount(table.fighter[timed], weights=table.seconds[timed],
+                                         minlength=n).astype(np.int64)
+    finished = ((table.result == WIN) & ((table.method == KO_TKO) | (table.method == SUBMISSION)) &
+                (table.round_number != MISSING_VALUE))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats['mean_fight_seconds'] = stats['fight_seconds'] / timed_count
+        stats['mean_finish_round'] = (np.bincount(table.fighter[finished], weights=table.round_number[finished],
+                                                  minlength=n) / np.bincount(table.fighter[finished], minlength=n))
+
+    # Streaks: consecutive fights of the same fighter with the same result form a run.
+    order = chronological_order(table)
+    fighter = table.fighter[order]
+    result = table.result[order]
+    day = table.day[order]
+    boundary = np.ones(len(order), dtype=bool)
+    boundary[1:] = (fighter[1:] != fighter[:-1]) | (result[1:] != result[:-1])
+    run = np.cumsum(boundary) - 1
+    run_length = np.bincount(run)
+    run_fighter = fighter[boundary]
+    run_result = result[boundary]
+
+    last_fight = np.full(n, -1, dtype=np.int64)
+    np.maximum.at(last_fight, fighter, np.arange(len(order)))
+    has_fights = last_fight >= 0
+    current_streak = np.zeros(n, dtype=np.int64)
+    last_run = run[last_fight[has_fights]]
+    sign = np.select([run_result[last_run] == WIN, run_result[last_run] == LOSS], [1, -1], 0)
+    current_streak[has_fights] = sign * run_length[last_run]
+    stats['current_streak'] = current_streak  # positive for win streak, negative for losing streak.
+
+    longest_win_streak = np.zeros(n, dtype=np.int64)
+    win_runs = run_result == WIN
+    np.maximum.at(longest_win_streak, run_fighter[win_runs], run_length[win_runs])
+    stats['longest_win_streak'] = longest_win_streak
+
+    # Activity: gaps between consecutive dated fights of the same fighter.
+    dated = day != MISSING_DAY
+    first_day = np.full(n, np.iinfo(np.int32).max, dtype=np.int64)
+    last_day = np.full(n, MISSING_DAY, dtype=np.int64)
+    np.minimum.at(first_day, fighter[dated], day[dated])
+    np.maximum.at(last_day, fighter[dated], day[dated])
+    first_day[first_day == np.iinfo(np.int32).max] = MISSING_DAY
+    stats['first_day'] = first_day
+    stats['last_day'] = last_day
+
+    dated_fighter = fighter[dated]
+    dated_day = day[dated].astype(np.int64)
+    same = dated_fighter[1:] == dated_fighter[:-1]
+    gap_fighter = dated_fighter[1:][same]
+    gaps = (dated_day[1:] - dated_day[:-1])[same]
+    gap_count = np.bincount(gap_fighter, minlength=n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats['mean_gap_days'] = np.bincount(gap_fighter, weights=gaps, minlength=n) / gap_count
+    max_gap = np.zeros(n, dtype=np.int64)
+    np.maximum.at(max_gap, gap_fighter, gaps)
+    stats['max_gap_days'] = max_gap
+    return stats
+
+
+def compute_pair_records(table, against='opponent'):
+    """
+    Computes records of every fighter against every opponent or under every referee.
+    :param table: FightTable instance
+    :param against: string with either 'opponent' or 'referee'
+    :return: dictionary of arrays with one entry per (fighter, opponent/referee) pair: 'fighter' and 'counterpart'
+             codes, followed by counts for each of RESULTS
+    """
+    other = table.opponent if against == 'opponent' else table.referee
+    n_other = len(table.opponents if against == 'opponent' else table.referees)
+    pair_key = table.fighter.astype(np.int64) * n_other + other
+    pairs, pair = np.unique(pair_key, return_inverse=True)
+    counts = np.bincount(pair * len(RESULTS) + table.result,
+                         minlength=len(pairs) * len(RESULTS)).reshape(len(pairs), len(RESULTS))
+    records = {'fighter': (pairs // n_other).astype(np.int32) if n_other else pairs,
+               'counterpart': (pairs % n_other).astype(np.int32) if n_other else pairs}
+    for code, result in enumerate(RESULTS):
+        records[result] = counts[:, code]
+    return records
+
+
+def save_career_stats(table, stats, filename):
+    """
+    Writing career statistics of all fighters to csv file.
+    :param table: FightTable instance
+    :param stats: dictionary returned by compute_career_stats
+    :param filename: string with name of the file we want to save data to; file will be created with given name
+    :return: None
+    """
+    columns = list(stats)
+    with open(f'{filename}.csv', 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile, delimiter=';')
+        writer.writerow(['Fighter', 'Key'] + columns)
+        for index in range(len(table.fighters)):
+            writer.writerow([table.fighter_names[index], table.fighters[index]] +
+                            [stats[column][index] for column in columns])
+    print(f'Career statistics saved for {len(table.fighters)} fighters!')
+
+
+if __name__ == '__main__':
+    source = sys.argv[1] if len(sys.argv) > 1 else 'sherdog.json'
+    suffix = COMPRESSIONS[compression_from_path(source)]  # both compression and format suffixes are dropped.
+    target = sys.argv[2] if len(sys.argv) > 2 else source[:len(source) - len(suffix)].rsplit('.', 1)[0] + '-stats'
+    fights = load_fights(source)
+    target = target[:-len('.csv')] if target.endswith('.csv') else target
+    save_career_stats(fights, compute_career_stats(fights), target)
@@ -0,0 +1,255 @@
+# Python 3.7
+# appendix to sherdog-parser.py
+# Created by - Montanaz0r (https://github.com/Montanaz0r)
+# Compressed streaming output files. Every time a file is opened for appending a new gzip member / zstd frame is
+# started, and readers decode all of them one after another, so the crawl can simply keep appending. Appended rows are
+# collected by BufferedAppender and written as one member / frame per MEMBER_BYTES, since a member per fighter would
+# hurt compression ratio badly. A gzip member cut short by a crash is read up to its last complete line and the rest
+# of it is dropped, truncated zstd frames are read up to the point where they were cut. zstd support needs optional
+# 'zstandard' package.
+
+import contextlib
+import gzip
+import io
+import logging
+import os
+import zlib
+
+COMPRESSIONS = {None: '', 'gzip': '.gz', 'zstd': '.zst'}  # supported compressions and their file suffixes.
+ZSTD_LEVEL = 3
+MEMBER_BYTES = 1024 * 1024  # bytes of appended text collected before they are written as one gzip member / zstd frame.
+READ_CHUNK_SIZE = 65536  # compressed bytes read at once.
+
+
+def _zstandard():
+    """
+    Imports optional zstandard package.
+    :return: zstandard module
+    """
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd compression requires 'zstandard' package, please install it or use gzip instead!")
+    return zstandard
+
+
+def compression_from_path(path):
+    """
+    Guesses compression from file suffix.
+    :param path: string with path to the file
+    :return: string with either 'gzip' or 'zstd', or None for plain files
+    """
+    for compression, suffix in COMPRESSIONS.items():
+        if suffix and path.endswith(suffix):
+            return compression
+    return None
+
+
+def output_path(filename, extension, compression=None):
+    """
+    Builds name of output file.
+    :param filename: string with name of the file, without extension
+    :param extension: string with either 'csv' or 'json'
+    :param compression: optional - string with either 'gzip' or 'zstd', None (default) for plain file
+    :return: string with path, for instance 'sherdog.csv.gz'
+    """
+    try:
+        return f'{filename}.{extension}{COMPRESSIONS[compression]}'
+    except KeyError:
+        raise ValueError(f'Unknown compression {compression}, please use one of {list(COMPRESSIONS)}!')
+
+
+def open_output(path, mode='a', compression=None, encoding=None, newline=None):
+    """
+    Opens text file for writing ('w') or appending ('a'), compressed files get a new gzip member or zstd frame.
+    :param path: string with path to the file
+    :param mode: string with either 'w' or 'a'
+    :param compression: optional - string with either 'gzip' or 'zstd', None (default) for plain file
+    :param encoding: optional - string with text encoding
+    :param newline: optional - newline argument as in built-in open function
+    :return: file object accepting str
+    """
+    if compression is None:
+        return open(path, mode, encoding=encoding, newline=newline)
+    elif compression == 'gzip':
+        return gzip.open(path, f'{mode}t', encoding=encoding, newline=newline)
+    elif compression == 'zstd':
+        writer = _zstandard().ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(path, f'{mode}b'), closefd=True)
+        return io.TextIOWrapper(writer, encoding=encoding, newline=newline)
+    raise ValueError(f'Unknown compression {compression}, please use one of {list(COMPRESSIONS)}!')
+
+
+def _open_binary_output(path, mode, compression):
+    """
+    Supporting function opening compressed file for writing bytes, a new gzip member or zstd frame is started.
+    :param path: string with path to the file
+    :param mode: string with either 'w' or 'a'
+    :param compression: string with either 'gzip' or 'zstd'
+    :return: file object accepting bytes
+    """
+    if compression == 'gzip':
+        return gzip.open(path, f'{mode}b')
+    elif compression == 'zstd':
+        return _zstandard().ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(path, f'{mode}b'), closefd=True)
+    raise ValueError(f'Unknown compression {compression}, please use one of {list(COMPRESSIONS)}!')
+
+
+@contextlib.contextmanager
+def open_replacement(path, compression=None, encoding=None, newline=None):
+    """
+    Opens temporary file next to path for writing, path is replaced with it atomically once it is closed without
+    error, so a crash while rewriting the file never leaves it half written.
+    :param path: string with path to the file
+    :param compression: optional - string with either 'gzip' or 'zstd', None (default) for plain file
+    :param encoding: optional - string with text encoding
+    :param newline: optional - newline argument as in built-in open function
+    :return: context manager giving file object accepting str
+    """
+    temporary_path = f'{path}.tmp'
+    try:
+        with open_output(temporary_path, 'w', compression, encoding=encoding, newline=newline) as output_file:
+            yield output_file
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+    os.replace(temporary_path, path)
+
+
+class BufferedAppender(object):
+    """BufferedAppender class - collects text appended to compressed file record by record and writes it as one gzip
+    member / zstd frame once member_bytes are collected (or flush is called), instead of one member for every append.
+    """
+
+    def __init__(self, path, compression, encoding=None, member_bytes=MEMBER_BYTES):
+        """
+        Initializes a BufferedAppender instance, newlines are written as given (like newline='' in open).
+        :param path: string with path to the file
+        :param compression: string with either 'gzip' or 'zstd'
+        :param encoding: optional - string with text encoding, 'utf-8' by default
+        :param member_bytes: integer with number of encoded bytes written at once
+        """
+        self.path = path
+        self.compression = compression
+        self.encoding = encoding or 'utf-8'
+        self.member_bytes = member_bytes
+        self.chunks = []  # list of bytes: text encoded right away, so encoding errors are raised by write
+        self.size = 0  # int: bytes waiting in chunks
+
+    def write(self, text):
+        """
+        Collects text, it is written to the file by end_record or flush.
+        :param text: string
+        :return: integer with number of characters
+        """
+        data = text.encode(self.encoding)
+        self.chunks.append(data)
+        self.size += len(data)
+        return len(text)
+
+    def end_record(self):
+        """
+        Marks end of a record (for instance all rows of one fighter), collected text is written once member_bytes are
+        collected, so a member / frame never ends in the middle of a record.
+        :return: boolean value, True if collected text was written
+        """
+        if self.size < self.member_bytes:
+            return False
+        self.flush()
+        return True
+
+    def flush(self):
+        """
+        Writes collected text as a new gzip member / zstd frame.
+        :return: None
+        """
+        if not self.chunks:
+            return
+        with _open_binary_output(self.path, 'a', self.compression) as output_file:
+            output_file.write(b''.join(self.chunks))
+        self.chunks, self.size = [], 0
+
+    def close(self):
+        self.flush()
+
+
+class _GzipMembers(io.RawIOBase):
+    """_GzipMembers class - reads all gzip members of a file one after another. A member which was cut short (crash
+    while it was written) is read up to its last complete line, the rest of it is dropped.
+    """
+
+    def __init__(self, path):
+        """
+        Initializes a _GzipMembers instance.
+        :param path: string with path to gzip file
+        """
+        super().__init__()
+        self.path = path
+        self.file = open(path, 'rb')
+        self.decompressor = zlib.decompressobj(wbits=31)
+        self.member_started = False  # boolean: True once compressed data of current member was read
+        self.ready = b''  # bytes: decompressed data which can be returned
+        self.position = 0  # int: number of bytes of self.ready already returned
+        self.pending = b''  # bytes: data after the last newline of unfinished member
+        self.finished = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self.position == len(self.ready) and not self.finished:
+            self._fill()
+        count = min(len(buffer), len(self.ready) - self.position)
+        buffer[:count] = self.ready[self.position:self.position + count]
+        self.position += count
+        return count
+
+    def _fill(self):
+        """
+        Supporting method decompressing next chunk of the file into self.ready.
+        :return: None
+        """
+        data = b''
+        if self.decompressor.eof:  # member is complete, next one may start in data which has already been read.
+            data = self.decompressor.unused_data
+            self.decompressor = zlib.decompressobj(wbits=31)
+            self.member_started = False
+        data = data or self.file.read(READ_CHUNK_SIZE)
+        if not data:
+            if self.member_started:
+                logging.info(f'Last gzip member of {self.path} is truncated, {len(self.pending)} bytes were dropped!')
+            self.finished = True
+            return
+        self.member_started = True
+        output = self.pending + self.decompressor.decompress(data)
+        cut = len(output) if self.decompressor.eof else output.rfind(b'\n') + 1
+        self.ready, self.position, self.pending = output[:cut], 0, output[cut:]
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+def open_input(path, compression=None, encoding=None, newline=None, binary=False):
+    """
+    Opens plain or compressed text file for reading, all gzip members / zstd frames are read one after another.
+    :param path: string with path to the file
+    :param compression: optional - string with either 'gzip' or 'zstd', guessed from file suffix when None
+    :param encoding: optional - string with text encoding
+    :param newline: optional - newline argument as in built-in open function
+    :param binary: boolean, if True decompressed bytes are returned instead of str (encoding and newline are ignored)
+    :return: file object returning str, or bytes if binary is True
+    """
+    compression = compression or compression_from_path(path)
+    if compression is None:
+        return open(path, 'rb') if binary else open(path, 'r', encoding=encoding, newline=newline)
+    elif compression == 'gzip':
+        reader = io.BufferedReader(_GzipMembers(path))
+        return reader if binary else io.TextIOWrapper(reader, encoding=encoding, newline=newline)
+    elif compression == 'zstd':
+        reader = _zstandard().ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True,
+                                                                 closefd=True)
+        if binary:
+            return io.BufferedReader(reader)
+        return io.TextIOWrapper(io.BufferedReader(reader), encoding=encoding, newline=newline)
+    raise ValueError(f'Unknown compression {compression}, please use one of {list(COMPRESSIONS)}!')
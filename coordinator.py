@@ -0,0 +1,233 @@
+# Python 3.7
+# appendix to sherdog-parser.py
+# Created by - Montanaz0r (https://github.com/Montanaz0r)
+# Crawl coordinator - splits sherdog's fighter id space, or a list of fighter urls, into work units stored in a
+# sqlite database file. Any number of worker processes on one machine claim units under a time limited lease,
+# heartbeat while working and complete or release them. Units whose lease has expired (worker crashed or hung) are
+# handed out again. No external services are needed, but the database file has to stay on a local filesystem of a
+# single host - sqlite locking is not reliable on network filesystems (NFS, SMB), so the file must not be shared
+# between machines.
+#
+# Usage: python coordinator.py crawl.db init-range 0 300000 [--unit-size 500]
+#        python coordinator.py crawl.db init-urls fighters.txt [--unit-size 50]
+#        python coordinator.py crawl.db status
+#        python coordinator.py crawl.db recover
+# Workers are started with 'worker' command of sherdog-parser.py (python sherdog-parser.py worker crawl.db -o part-1)
+# or with scrape_leased_fighters function.
+
+import argparse
+import collections
+import json
+import os
+import socket
+import sqlite3
+import time
+
+LEASE_SECONDS = 300  # default lease duration, workers are expected to heartbeat more often than that.
+
+# kind: 'range' (start <= fighter index < stop) or 'urls' (list of fighter pages).
+WorkUnit = collections.namedtuple('WorkUnit', ['id', 'kind', 'start', 'stop', 'urls', 'attempts'])
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    start INTEGER,
+    stop INTEGER,
+    urls TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    completed_at REAL
+);
+CREATE INDEX IF NOT EXISTS units_status ON units (status, lease_expires);
+'''
+
+
+def default_worker_id():
+    """
+    Builds worker id unique across machines and processes.
+    :return: string with 'hostname:pid'
+    """
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class CrawlCoordinator(object):
+    """CrawlCoordinator class - leases work units stored in sqlite database file to crawl workers.
+    """
+
+    def __init__(self, db_path, lease_seconds=LEASE_SECONDS):
+        """
+        Initializes a CrawlCoordinator instance, database file and table are created when missing.
+        :param db_path: string with path to sqlite database file
+        :param lease_seconds: integer with number of seconds a claimed unit stays leased without heartbeat
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        # autocommit mode, transactions are opened explicitly with BEGIN IMMEDIATE to serialize claims.
+        self.connection = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        self.connection.executescript(_schema)
+
+    def close(self):
+        """
+        Closes database connection.
+        :return: None
+        """
+        self.connection.close()
+
+    def add_id_range(self, start, stop, unit_size=500):
+        """
+        Splits range of sherdog fighter indexes into work units.
+        :param start: integer with first fighter index
+        :param stop: integer with fighter index where range ends (exclusive)
+        :param unit_size: integer with number of indexes in a single unit
+        :return: integer with number of created units
+        """
+        units = [('range', index, min(index + unit_size, stop)) for index in range(start, stop, unit_size)]
+        with self._transaction():
+            self.connection.executemany('INSERT INTO units (kind, start, stop) VALUES (?, ?, ?)', units)
+        return len(units)
+
+    def add_urls(self, urls, unit_size=50):
+        """
+        Splits list of fighter urls (or pages like '/fighter/Jon-Jones-27944') into work units.
+        :param urls: list of strings
+        :param unit_size: integer with number of urls in a single unit
+        :return: integer with number of created units
+        """
+        units = [('urls', json.dumps(urls[index:index + unit_size])) for index in range(0, len(urls), unit_size)]
+        with self._transaction():
+            self.connection.executemany('INSERT INTO units (kind, urls) VALUES (?, ?)', units)
+        return len(units)
+
+    def claim(self, worker_id):
+        """
+        Leases one pending unit, or one whose lease has expired, to the worker.
+        :param worker_id: string identifying the worker
+        :return: WorkUnit instance, or None when there is nothing left to claim
+        """
+        now = time.time()
+        with self._transaction():
+            row = self.connection.execute(
+                "SELECT id, kind, start, stop, urls, attempts FROM units "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) ORDER BY id LIMIT 1",
+                (now,)).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE units SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE id = ?", (worker_id, now + self.lease_seconds, row[0]))
+        urls = json.loads(row[4]) if row[4] is not None else None
+        return WorkUnit(row[0], row[1], row[2], row[3], urls, row[5] + 1)
+
+    def heartbeat(self, unit_id, worker_id):
+        """
+        Extends lease of the unit held by the worker.
+        :param unit_id: integer with unit id
+        :param worker_id: string identifying the worker
+        :return: True if lease was extended, False if the worker does not hold the lease anymore
+        """
+        cursor = self.connection.execute(
+            "UPDATE units SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + self.lease_seconds, unit_id, worker_id))
+        return cursor.rowcount == 1
+
+    def complete(self, unit_id, worker_id):
+        """
+        Marks the unit held by the worker as done.
+        :param unit_id: integer with unit id
+        :param worker_id: string identifying the worker
+        :return: True if unit was completed, False if the worker does not hold the lease anymore
+        """
+        cursor = self.connection.execute(
+            "UPDATE units SET status = 'done', lease_expires = NULL, completed_at = ? "
+            "WHERE id = ? AND worker = ? AND status = 'leased'", (time.time(), unit_id, worker_id))
+        return cursor.rowcount == 1
+
+    def release(self, unit_id, worker_id):
+        """
+        Gives the unit back to the pool without completing it, for instance when worker is shutting down.
+        :param unit_id: integer with unit id
+        :param worker_id: string identifying the worker
+        :return: True if unit was released, False if the worker does not hold the lease anymore
+        """
+        cursor = self.connection.execute(
+            "UPDATE units SET status = 'pending', worker = NULL, lease_expires = NULL "
+            "WHERE id = ? AND worker = ? AND status = 'leased'", (unit_id, worker_id))
+        return cursor.rowcount == 1
+
+    def recover_expired(self):
+        """
+        Returns units with expired leases back to pending state.
+        :return: integer with number of recovered units
+        """
+        cursor = self.connection.execute(
+            "UPDATE units SET status = 'pending', worker = NULL, lease_expires = NULL "
+            "WHERE status = 'leased' AND lease_expires < ?", (time.time(),))
+        return cursor.rowcount
+
+    def progress(self):
+        """
+        Counts units in every state.
+        :return: dictionary with 'pending', 'leased' and 'done' counts
+        """
+        counts = {'pending': 0, 'leased': 0, 'done': 0}
+        for status, count in self.connection.execute('SELECT status, COUNT(*) FROM units GROUP BY status'):
+            counts[status] = count
+        return counts
+
+    def _transaction(self):
+        """
+        Supporting method opening write transaction that takes database lock immediately.
+        :return: context manager
+        """
+        return _ImmediateTransaction(self.connection)
+
+
+class _ImmediateTransaction(object):
+    """Context manager running BEGIN IMMEDIATE / COMMIT (or ROLLBACK on error) on sqlite connection.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.connection.execute('COMMIT')
+        else:
+            self.connection.execute('ROLLBACK')
+        return False
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manages leased work units for distributed sherdog crawls.')
+    parser.add_argument('db')
+    commands = parser.add_subparsers(dest='command')
+    init_range = commands.add_parser('init-range', help='split fighter index range into units')
+    init_range.add_argument('start', type=int)
+    init_range.add_argument('stop', type=int)
+    init_range.add_argument('--unit-size', type=int, default=500)
+    init_urls = commands.add_parser('init-urls', help='split file with one fighter url per line into units')
+    init_urls.add_argument('urls_file')
+    init_urls.add_argument('--unit-size', type=int, default=50)
+    commands.add_parser('status', help='show number of units in each state')
+    commands.add_parser('recover', help='return units with expired leases to the pool')
+    args = parser.parse_args()
+
+    coordinator = CrawlCoordinator(args.db)
+    if args.command == 'init-range':
+        print(f'Created {coordinator.add_id_range(args.start, args.stop, args.unit_size)} work units.')
+    elif args.command == 'init-urls':
+        with open(args.urls_file) as urls_file:
+            urls = [line.strip() for line in urls_file if line.strip()]
+        print(f'Created {coordinator.add_urls(urls, args.unit_size)} work units.')
+    elif args.command == 'recover':
+        print(f'Recovered {coordinator.recover_expired()} work units.')
+    else:
+        print(coordinator.progress())
+    coordinator.close()
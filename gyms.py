@@ -0,0 +1,189 @@
+# Python 3.7
+# appendix to sherdog-parser.py
+# Created by - Montanaz0r (https://github.com/Montanaz0r)
+# Gym (association) entity table. Every gym is stored once, keyed by its sherdog url, under a small integer id, and
+# scraped fighters reference gyms by id instead of repeating gym names and urls thousands of times. The table also
+# remembers which fighters were seen training in every gym, and optionally the roster listed on gym's own page -
+# every gym page is requested only once and cached in the table file, so team-level queries need no fighter scans.
+#
+# Usage: python gyms.py sherdog-gyms.json                      - lists gyms with number of fighters
+#        python gyms.py sherdog-gyms.json "Team Alpha Male"    - lists fighters of a gym
+
+import json
+import os
+import sys
+import threading
+import time
+
+from normalize import normalize_name
+
+SHERDOG_URL = 'https://www.sherdog.com'
+
+
+def _gym_key(name, url):
+    """
+    Supporting function building lookup key of a gym - url when sherdog gives one, otherwise normalized name.
+    :param name: string with gym's name, or None
+    :param url: string with gym's url, or None
+    :return: string with key
+    """
+    if url and url not in ('NA', 'N/A'):
+        return url.split('sherdog.com')[-1]
+    return f'name:{normalize_name(name)}'
+
+
+def parse_gym_roster(html):
+    """
+    Finds fighter profiles linked from gym's page.
+    :param html: string with html of gym's page
+    :return: list of fighter pages, for instance ['/fighter/Jon-Jones-27944'], without duplicates
+    """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, features='html.parser')
+    roster = []
+    for link in soup.select('a[href*="/fighter/"]'):
+        page = link['href'].split('sherdog.com')[-1]
+        if page not in roster:
+            roster.append(page)
+    return roster
+
+
+class GymTable(object):
+    """GymTable class - deduplicated gyms keyed by url, persisted to a json file.
+    """
+
+    def __init__(self, path=None):
+        """
+        Initializes a GymTable instance, gyms are loaded from path if the file exists so ids stay stable between runs.
+        :param path: optional - string with path to json file, None keeps the table in memory only
+        """
+        self.path = path
+        self.lock = threading.Lock()  # fighters are registered from scraping threads.
+        self.gyms = []  # list of dictionaries: gym entities, position in the list is gym's id - 1
+        self.ids = {}  # dictionary: gym key -> gym id
+        self.members = {}  # dictionary: gym id -> set of urls in gym's 'fighters' list, for constant time lookups
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def register(self, name, url, fighter_url=None):
+        """
+        Adds gym to the table unless it is already there, and records fighter as its member.
+        :param name: string with gym's name
+        :param url: string with gym's url
+        :param fighter_url: optional - string with url of fighter training in the gym
+        :return: integer with gym's id
+        """
+        key = _gym_key(name, url)
+        with self.lock:
+            gym_id = self.ids.get(key)
+            if gym_id is None:
+                gym_id = len(self.gyms) + 1
+                self.ids[key] = gym_id
+                self.gyms.append({'gymId': gym_id, 'gymName': name, 'gymUrl': url, 'fighters': [],
+                                  'roster': None, 'rosterScrapedAt': None})
+            members = self.members.setdefault(gym_id, set())
+            if fighter_url and fighter_url not in members:
+                members.add(fighter_url)
+                self.gyms[gym_id - 1]['fighters'].append(fighter_url)
+        return gym_id
+
+    def register_fighter(self, names, urls, fighter_url=None):
+        """
+        Registers all associations of a fighter.
+        :param names: list with gym names collected by Fighter.set_associations, or None
+        :param urls: list with gym urls collected by Fighter.set_associations, or None
+        :param fighter_url: optional - string with fighter's url
+        :return: list of gym ids
+        """
+        names, urls = names or [], urls or []
+        return [self.register(name, urls[position] if position < len(urls) else None, fighter_url)
+                for position, name in enumerate(names)]
+
+    def get(self, gym_id):
+        """
+        :param gym_id: integer with gym's id
+        :return: dictionary with gym entity, or None for unknown id
+        """
+        return self.gyms[gym_id - 1] if 0 < gym_id <= len(self.gyms) else None
+
+    def find(self, name=None, url=None):
+        """
+        Finds gym by url, or by name when url is not given.
+        :param name: optional - string with gym's name
+        :param url: optional - string with gym's url
+        :return: dictionary with gym entity, or None if gym is not in the table
+        """
+        gym_id = self.ids.get(_gym_key(None, url)) if url else None
+        if gym_id is None and name:
+            normalized = normalize_name(name)
+            gym_id = next((gym['gymId'] for gym in self.gyms if normalize_name(gym['gymName']) == normalized), None)
+        return self.get(gym_id) if gym_id is not None else None
+
+    def fighters_of(self, gym):
+        """
+        Lists fighters of a gym - fighters seen with the gym while scraping plus gym's scraped roster.
+        :param gym: dictionary with gym entity
+        :return: list of fighter pages, for instance ['/fighter/Jon-Jones-27944']
+        """
+        fighters = [url.split('sherdog.com')[-1] for url in gym['fighters']]
+        seen = set(fighters)
+        return fighters + [page for page in gym['roster'] or [] if page not in seen]
+
+    def scrape_rosters(self, fetch, max_age=None):
+        """
+        Scrapes roster from page of every gym, each page is requested once and cached in the table.
+        :param fetch: function taking url and returning response object, usually fetch from sherdog-parser.py
+        :param max_age: optional - integer with number of seconds after which cached roster is scraped again,
+                        None keeps cached rosters forever
+        :return: integer with number of requested gym pages
+        """
+        now = int(time.time())
+        requested = 0
+        for gym in list(self.gyms):
+            fresh = gym['rosterScrapedAt'] is not None and (max_age is None or now - gym['rosterScrapedAt'] < max_age)
+            if fresh or not gym['gymUrl'] or gym['gymUrl'] in ('NA', 'N/A'):
+                continue
+            url = gym['gymUrl'] if gym['gymUrl'].startswith('http') else SHERDOG_URL + gym['gymUrl']
+            try:
+                roster = parse_gym_roster(fetch(url).text)
+            except Exception as e:
+                print(f'Could not scrape roster of {gym["gymName"]}: {e!r}')
+                continue
+            with self.lock:
+                gym['roster'], gym['rosterScrapedAt'] = roster, now
+            requested += 1
+        return requested
+
+    def load(self):
+        """
+        Reads gyms from self.path.
+        :return: None
+        """
+        with open(self.path, encoding='utf-8') as gyms_json:
+            self.gyms = json.load(gyms_json)['gyms']
+        self.ids = {_gym_key(gym['gymName'], gym['gymUrl']): gym['gymId'] for gym in self.gyms}
+        self.members = {gym['gymId']: set(gym['fighters']) for gym in self.gyms}
+
+    def save(self):
+        """
+        Writes gyms to self.path, file is replaced atomically so a crash never leaves it half written.
+        :return: None
+        """
+        if self.path is None:
+            return
+        temporary_path = f'{self.path}.tmp'
+        with self.lock:
+            with open(temporary_path, 'w', encoding='utf-8') as gyms_json:
+                json.dump({'gyms': self.gyms}, gyms_json, indent=4)
+        os.replace(temporary_path, self.path)
+
+
+if __name__ == '__main__':
+    table = GymTable(sys.argv[1])
+    if len(sys.argv) > 2:
+        found_gym = table.find(name=sys.argv[2], url=sys.argv[2] if '/' in sys.argv[2] else None)
+        for fighter_page in table.fighters_of(found_gym) if found_gym else []:
+            print(fighter_page)
+    else:
+        for entity in table.gyms:
+            print(f"{entity['gymId']:6} {entity['gymName']} - {len(table.fighters_of(entity))} fighters")
@@ -0,0 +1,187 @@
+# Python 3.7
+# appendix to sherdog-parser.py
+# Created by - Montanaz0r (https://github.com/Montanaz0r)
+# Compact persisted map of sherdog fighter ids. Every id takes 2 bits (unknown / empty / valid), so the whole id
+# space fits in well under 100KB. Reruns of scrape_all_fighters skip ids already known to be empty, and probing
+# functions below find the real end of the id space before crawling instead of guessing it from misses in a row.
+# Between full saves, changes are appended to a small journal file ('<path>.log', 5 bytes per id) right after the
+# fighter is written to output, so a resumed crawl neither skips nor repeats fighters scraped before a crash.
+
+import os
+import struct
+
+UNKNOWN, EMPTY, VALID = range(3)
+_magic = b'SHIDS1'
+_journal_entry = struct.Struct('<IB')  # fighter's index, state
+
+
+class IdBitmap(object):
+    """IdBitmap class - 2 bits per fighter id, persisted to a binary file.
+    """
+
+    def __init__(self, path=None):
+        """
+        Initializes an IdBitmap instance, state is loaded from path if the file exists.
+        :param path: optional - string with path to bitmap file, None keeps bitmap in memory only
+        """
+        self.path = path
+        self.journal_path = None if path is None else f'{path}.log'
+        self.bits = bytearray()  # bytearray: 4 ids per byte, 2 bits each
+        self._last_valid = -1  # int: highest id known to be valid, -1 if none
+        self.changes = []  # list of tuples (index, state) set since bitmap was last saved or flushed
+        if path is not None and (os.path.exists(path) or os.path.exists(self.journal_path)):
+            self.load()
+
+    def get(self, index):
+        """
+        Gets state of fighter id.
+        :param index: integer with fighter's index
+        :return: UNKNOWN, EMPTY or VALID
+        """
+        byte, shift = divmod(index, 4)
+        if byte >= len(self.bits):
+            return UNKNOWN
+        return (self.bits[byte] >> (shift * 2)) & 3
+
+    def set(self, index, state):
+        """
+        Sets state of fighter id.
+        :param index: integer with fighter's index
+        :param state: UNKNOWN, EMPTY or VALID
+        :return: None
+        """
+        self._set(index, state)
+        if self.path is not None:
+            self.changes.append((index, state))
+
+    def _set(self, index, state):
+        """
+        Supporting method changing bits of fighter id.
+        :param index: integer with fighter's index
+        :param state: UNKNOWN, EMPTY or VALID
+        :return: None
+        """
+        byte, shift = divmod(index, 4)
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte - len(self.bits) + 1))
+        self.bits[byte] = (self.bits[byte] & ~(3 << (shift * 2))) | (state << (shift * 2))
+        if state == VALID and index > self._last_valid:
+            self._last_valid = index
+
+    def is_empty(self, index):
+        return self.get(index) == EMPTY
+
+    def mark_empty(self, index):
+        self.set(index, EMPTY)
+
+    def mark_valid(self, index):
+        self.set(index, VALID)
+
+    def last_valid(self):
+        """
+        Supporting method returning the highest id known to be valid.
+        :return: integer with fighter's index, -1 if no valid id is known
+        """
+        return self._last_valid
+
+    def counts(self):
+        """
+        Counts ids in every state within the range covered by the bitmap.
+        :return: dictionary with 'unknown', 'empty' and 'valid' counts
+        """
+        counts = [0, 0, 0, 0]
+        for byte in self.bits:
+            for shift in range(0, 8, 2):
+                counts[(byte >> shift) & 3] += 1
+        return {'unknown': counts[UNKNOWN], 'empty': counts[EMPTY], 'valid': counts[VALID]}
+
+    def load(self):
+        """
+        Reads bitmap from self.path and replays changes from its journal.
+        :return: None
+        """
+        data = _magic
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as bitmap_file:
+                data = bitmap_file.read()
+        if not data.startswith(_magic):
+            raise ValueError(f'{self.path} is not an id bitmap file!')
+        self.bits = bytearray(data[len(_magic):])
+        self.changes = []
+        self._last_valid = -1
+        for byte in range(len(self.bits) - 1, -1, -1):
+            if self.bits[byte]:
+                for shift in (3, 2, 1, 0):
+                    if (self.bits[byte] >> (shift * 2)) & 3 == VALID:
+                        self._last_valid = byte * 4 + shift
+                        break
+                if self._last_valid >= 0:
+                    break
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'rb') as journal_file:
+                journal = journal_file.read()
+            usable = len(journal) - len(journal) % _journal_entry.size  # entry cut short by a crash is dropped.
+            for index, state in _journal_entry.iter_unpack(journal[:usable]):
+                self._set(index, state)
+
+    def flush(self):
+        """
+        Appends changes made since last save or flush to the journal file, much cheaper than save.
+        :return: None
+        """
+        if self.path is None or not self.changes:
+            return
+        with open(self.journal_path, 'ab') as journal_file:
+            journal_file.write(b''.join(_journal_entry.pack(index, state) for index, state in self.changes))
+        self.changes = []
+
+    def save(self):
+        """
+        Writes bitmap to self.path, file is replaced atomically so a crash never leaves it half written, journal is
+        not needed anymore and is removed.
+        :return: None
+        """
+        if self.path is None:
+            return
+        temporary_path = f'{self.path}.tmp'
+        with open(temporary_path, 'wb') as bitmap_file:
+            bitmap_file.write(_magic + bytes(self.bits))
+        os.replace(temporary_path, self.path)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.changes = []
+
+
+def any_valid(is_valid, start, window):
+    """
+    Checks if there is at least one valid id in window starting at given id, stops at the first valid one.
+    :param is_valid: function taking fighter's index and returning boolean
+    :param start: integer with first fighter's index in the window
+    :param window: integer with number of ids in the window
+    :return: boolean value
+    """
+    return any(is_valid(index) for index in range(start, start + window))
+
+
+def probe_upper_bound(is_valid, start=1, window=50):
+    """
+    Finds end of the id space - exponential probing doubles the id until a whole window of empty ids is found,
+    then binary search narrows the boundary down. Gaps shorter than window do not end the id space.
+    :param is_valid: function taking fighter's index and returning boolean, usually backed by IdBitmap cache
+    :param start: integer with id known (or expected) to be valid
+    :param window: integer with number of consecutive ids checked at every probe
+    :return: integer with id past the last window that contains valid fighters
+    """
+    low = max(start, 1)
+    if not any_valid(is_valid, low, window):
+        return low
+    high = low * 2
+    while any_valid(is_valid, high, window):
+        low, high = high, high * 2
+    while high - low > window:  # invariant: window at low has valid ids, window at high has none.
+        middle = (low + high) // 2
+        if any_valid(is_valid, middle, window):
+            low = middle
+        else:
+            high = middle
+    return high + window
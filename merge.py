@@ -0,0 +1,326 @@
+# Python 3.7
+# appendix to sherdog-parser.py
+# Created by - Montanaz0r (https://github.com/Montanaz0r)
+# External-memory merge of sharded crawl outputs. Crawls split across processes (see coordinator.py) or days leave many
+# partial, overlapping output files. The merge reads them fighter by fighter, sorts fighters by url in sorted runs that
+# fit in a memory budget and are spilled to temporary files, then merges the runs with a heap. When the same fighter
+# appears more than once, the copy with the newest scrape timestamp wins (later input file wins ties). Memory use is
+# bounded by the buffer size whatever the total data size, and the output is written as a stream as well.
+#
+# Inputs are csv files, json files made by sherdog-parser.py (indent=4 layout) or json lines files made by sinks.py,
+# plain or compressed. Csv inputs give csv output, json and json lines inputs give json or json lines output. Json of
+# scrape_all_fighters keys fighters by name ({name: [...]}), it can only be merged with the same kind of json.
+#
+# Usage: python merge.py -o merged.csv shard-1.csv shard-2.csv.gz ...
+#        python merge.py -o merged.json --buffer-mb 256 day-1.json day-2.json
+
+import argparse
+import csv
+import heapq
+import itertools
+import json
+import os
+import tempfile
+
+from compressed_io import COMPRESSIONS, compression_from_path, open_input, open_output
+from normalize import normalize_name
+from offset_index import iter_json_entries
+from sinks import CSV_HEADERS
+
+CSV_ENCODING = 'ISO-8859-1'
+BUFFER_BYTES = 64 * 1024 * 1024  # serialized fighters kept in memory before a sorted run is spilled to disk.
+MAX_OPEN_RUNS = 64  # runs merged at once, more runs are merged in several passes.
+
+
+def _data_format(path):
+    """
+    Supporting function recognizing format of a file from its name, compression suffix is ignored.
+    :param path: string with path to the file
+    :return: string with 'csv', 'json' or 'jsonl'
+    """
+    compression = compression_from_path(path)
+    name = path[:-len(COMPRESSIONS[compression])] if compression else path
+    for data_format in ('csv', 'jsonl', 'json'):
+        if name.endswith(f'.{data_format}'):
+            return data_format
+    raise ValueError(f'Cannot recognize format of {path}, please use .csv, .json or .jsonl file!')
+
+
+def _fighter_key(url, name):
+    """
+    Supporting function building key fighters are sorted and deduplicated by - url, or normalized name without url.
+    :param url: string with fighter's url, or None
+    :param name: string with fighter's name
+    :return: string with key
+    """
+    return url if url else f'name:{normalize_name(name)}'
+
+
+def _timestamp(value):
+    """
+    Supporting function converting scrape timestamp to integer, fighters without timestamp lose to any other copy.
+    :param value: integer, string or None
+    :return: integer
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+def iter_csv_fighters(path):
+    """
+    Reads fighters from csv output - consecutive rows with the same fighter and scrape timestamp form one fighter.
+    :param path: string with path to csv file, plain or compressed
+    :return: generator of tuples (key, scrape timestamp, list of rows)
+    """
+    with open_input(path, newline='', encoding=CSV_ENCODING) as csvfile:
+        rows = (row for row in csv.reader(csvfile, delimiter=';') if row and not row[0].startswith('Fighter'))
+        grouped = itertools.groupby(rows, key=lambda row: (row[12] if len(row) > 12 else None, row[0],
+                                                           row[13] if len(row) > 13 else None))
+        for (url, name, scraped_at), fighter_rows in grouped:
+            yield _fighter_key(url, name), _timestamp(scraped_at), list(fighter_rows)
+
+
+def iter_json_fighters(path):
+    """
+    Reads fighters from json output one by one, without loading the whole file - either {'fighters': [...]} made by
+    Fighter.save_data, or {name: [...]} made by Fighter.save_to_json (both written with indent=4, see
+    offset_index.iter_json_entries).
+    :param path: string with path to json file, plain or compressed
+    :return: generator of tuples (key, scrape timestamp, fighter) where fighter is a dictionary, or a list
+             [name, fights] for {name: [...]} layout
+    """
+    with open_input(path, binary=True) as fighter_json:
+        for url, name, offset, entry in iter_json_entries(fighter_json):
+            if entry.startswith(b'    "'):  # '"name": [...]' entry of save_to_json layout.
+                name, fights = next(iter(json.loads(b'{' + entry + b'}').items()))
+                yield _fighter_key(None, name), -1, [name, fights]
+            else:
+                fighter = json.loads(entry)
+                yield (_fighter_key(fighter.get('fighterUrl'), fighter.get('name')),
+                       _timestamp(fighter.get('scrapedAt')), fighter)
+
+
+def is_flat_json(path):
+    """
+    Checks if json output uses {name: [...]} layout of Fighter.save_to_json (scrape_all_fighters), which keys
+    fighters by name only and cannot be mixed with {'fighters': [...]} layout of Fighter.save_data.
+    :param path: string with path to json file, plain or compressed
+    :return: boolean value, False for json without any fighter
+    """
+    with open_input(path, binary=True) as fighter_json:
+        fighter_json.readline()
+        second = fighter_json.readline()
+        return second.startswith(b'    "') and not second.strip().startswith(b'"fighters": [')
+
+
+def iter_jsonl_fighters(path):
+    """
+    Reads fighters from json lines file made by JsonLinesSink.
+    :param path: string with path to json lines file, plain or compressed
+    :return: generator of tuples (key, scrape timestamp, fighter dictionary)
+    """
+    with open_input(path, encoding='utf-8') as fighter_lines:
+        for line in fighter_lines:
+            if line.strip():
+                fighter = json.loads(line)
+                yield (_fighter_key(fighter.get('fighterUrl'), fighter.get('name')),
+                       _timestamp(fighter.get('scrapedAt')), fighter)
+
+
+_readers = {'csv': iter_csv_fighters, 'json': iter_json_fighters, 'jsonl': iter_jsonl_fighters}
+
+
+def iter_fighters(path):
+    """
+    Reads fighters from csv, json or json lines file one by one, format is recognized from file name.
+    :param path: string with path to the file, plain or compressed
+    :return: generator of tuples (key, scrape timestamp, fighter) - see iter_csv_fighters, iter_json_fighters and
+             iter_jsonl_fighters for fighter's format
+    """
+    return _readers[_data_format(path)](path)
+
+
+def _spill(records, temp_dir):
+    """
+    Supporting function sorting buffered fighters and writing them to temporary run file.
+    :param records: list of tuples (key, timestamp, sequence, json line [key, timestamp, sequence, fighter])
+    :param temp_dir: string with directory for temporary files, or None for system default
+    :return: string with path to run file
+    """
+    records.sort(key=lambda record: record[:3])
+    descriptor, run_path = tempfile.mkstemp(prefix='sherdog-merge-', suffix='.run', dir=temp_dir)
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as run_file:
+        run_file.writelines(record[3] for record in records)
+    return run_path
+
+
+def _iter_run(run_path):
+    with open(run_path, encoding='utf-8') as run_file:
+        for line in run_file:
+            yield json.loads(line)
+
+
+def _merge_runs(run_paths, temp_dir):
+    """
+    Supporting function merging too many runs in several passes, so at most MAX_OPEN_RUNS files are open at once.
+    :param run_paths: list of paths to run files
+    :param temp_dir: string with directory for temporary files, or None for system default
+    :return: list of paths to at most MAX_OPEN_RUNS run files, on error all run files are removed
+    """
+    while len(run_paths) > MAX_OPEN_RUNS:
+        merged_paths = []
+        try:
+            for start in range(0, len(run_paths), MAX_OPEN_RUNS):
+                group = run_paths[start:start + MAX_OPEN_RUNS]
+                descriptor, run_path = tempfile.mkstemp(prefix='sherdog-merge-', suffix='.run', dir=temp_dir)
+                merged_paths.append(run_path)
+                with os.fdopen(descriptor, 'w', encoding='utf-8') as run_file:
+                    for record in heapq.merge(*map(_iter_run, group), key=lambda record: record[:3]):
+                        run_file.write(json.dumps(record) + '\n')
+                for path in group:
+                    os.remove(path)
+        except BaseException:
+            # caller only knows runs it has passed in, runs written by a failed pass are removed here.
+            for path in run_paths + merged_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        run_paths = merged_paths
+    return run_paths
+
+
+def _newest(records):
+    """
+    Supporting function picking the newest copy of a fighter - copies come sorted by timestamp and input order,
+    so the last one wins.
+    :param records: iterator of merged records of one fighter
+    :return: list [key, timestamp, sequence, fighter]
+    """
+    for newest in records:
+        pass
+    return newest
+
+
+class _JsonWriter(object):
+    """_JsonWriter class - streams fighters into the same indent=4 layout json.dump gives in sherdog-parser.py.
+    """
+
+    def __init__(self, output_file, flat=False):
+        """
+        Initializes a _JsonWriter instance.
+        :param output_file: file object accepting str
+        :param flat: boolean, True for {name: [...]} layout of save_to_json, False for {'fighters': [...]} layout
+        """
+        self.output_file = output_file
+        self.count = 0
+        self.flat = flat
+
+    def write(self, fighter):
+        """
+        Writes one fighter.
+        :param fighter: dictionary with fighter's data, or list [name, fights] for {name: [...]} layout
+        :return: None
+        """
+        if isinstance(fighter, list) != self.flat:
+            raise ValueError('Fighters keyed by name ({name: [...]} json of scrape_all_fighters) cannot be mixed with '
+                             'fighters keyed by url ({"fighters": [...]} json or json lines) in one output!')
+        if not self.count:
+            self.output_file.write('{\n' if self.flat else '{\n    "fighters": [\n')
+        separator = ',\n' if self.count else ''
+        if self.flat:
+            name, fights = fighter
+            self.output_file.write(f'{separator}    {json.dumps(name)}: '
+                                   + json.dumps(fights, indent=4).replace('\n', '\n    '))
+        else:
+            self.output_file.write(separator + '        ' + json.dumps(fighter, indent=4).replace('\n', '\n        '))
+        self.count += 1
+
+    def close(self):
+        """
+        Closes json document, file itself is closed by the caller.
+        :return: None
+        """
+        if not self.count:
+            self.output_file.write('{}' if self.flat else '{\n    "fighters": []\n}')
+        else:
+            self.output_file.write('\n}' if self.flat else '\n    ]\n}')
+
+
+def merge_outputs(input_paths, output_file, buffer_bytes=BUFFER_BYTES, temp_dir=None):
+    """
+    Merges sharded outputs into one file, sorted by fighter url, keeping only the newest copy of every fighter.
+    :param input_paths: list of paths to csv, json or json lines files, later files win ties of scrape timestamps
+    :param output_file: string with path to merged file (.csv, .json or .jsonl, optionally compressed)
+    :param buffer_bytes: integer with bytes of serialized fighters kept in memory before spilling a sorted run
+    :param temp_dir: optional - string with directory for temporary run files
+    :return: dictionary with number of 'read' fighters, 'written' fighters and 'duplicates' dropped
+    """
+    output_format = _data_format(output_file)
+    input_formats = {_data_format(path) for path in input_paths}
+    if (output_format == 'csv') != (input_formats == {'csv'}):
+        raise ValueError('Csv inputs can only be merged into csv output, json inputs into json or json lines output!')
+    flat_inputs = [path for path in input_paths if _data_format(path) == 'json' and is_flat_json(path)]
+    if flat_inputs and (output_format != 'json' or len(flat_inputs) != len(input_paths)):
+        raise ValueError(f'{flat_inputs} key fighters by name ({{name: [...]}} json of scrape_all_fighters), they can '
+                         f'only be merged with each other into json output!')
+
+    run_paths, buffer, buffered_bytes, read = [], [], 0, 0
+    try:
+        sequence = itertools.count()
+        for path in input_paths:
+            for key, scraped_at, fighter in iter_fighters(path):
+                position = next(sequence)
+                line = json.dumps([key, scraped_at, position, fighter]) + '\n'
+                buffer.append((key, scraped_at, position, line))
+                buffered_bytes += len(line)
+                read += 1
+                if buffered_bytes >= buffer_bytes:
+                    run_paths.append(_spill(buffer, temp_dir))
+                    buffer, buffered_bytes = [], 0
+        if buffer:
+            run_paths.append(_spill(buffer, temp_dir))
+        buffer = None
+        run_paths = _merge_runs(run_paths, temp_dir)
+
+        merged = heapq.merge(*map(_iter_run, run_paths), key=lambda record: record[:3])
+        written = 0
+        compression = compression_from_path(output_file)
+        if output_format == 'csv':
+            with open_output(output_file, 'w', compression, encoding=CSV_ENCODING, newline='') as csvfile:
+                writer = csv.writer(csvfile, delimiter=';')
+                writer.writerow(CSV_HEADERS)
+                for key, records in itertools.groupby(merged, key=lambda record: record[0]):
+                    newest = _newest(records)
+                    writer.writerows(newest[3])
+                    written += 1
+        else:
+            with open_output(output_file, 'w', compression, encoding='utf-8') as fighter_file:
+                json_writer = _JsonWriter(fighter_file, bool(flat_inputs)) if output_format == 'json' else None
+                for key, records in itertools.groupby(merged, key=lambda record: record[0]):
+                    newest = _newest(records)
+                    if json_writer is not None:
+                        json_writer.write(newest[3])
+                    else:
+                        fighter_file.write(json.dumps(newest[3]) + '\n')
+                    written += 1
+                if json_writer is not None:
+                    json_writer.close()
+    finally:
+        for run_path in run_paths:
+            if os.path.exists(run_path):
+                os.remove(run_path)
+    return {'read': read, 'written': written, 'duplicates': read - written}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Merges sharded sherdog-parser.py outputs with bounded memory.')
+    parser.add_argument('inputs', nargs='+', help='csv, json or jsonl files, later files win ties')
+    parser.add_argument('-o', '--output', required=True, help='merged file (.csv, .json or .jsonl, may be compressed)')
+    parser.add_argument('--buffer-mb', type=int, default=BUFFER_BYTES // (1024 * 1024),
+                        help='memory used for sorting before spilling to temporary files')
+    parser.add_argument('--temp-dir', default=None, help='directory for temporary run files')
+    args = parser.parse_args()
+    stats = merge_outputs(args.inputs, args.output, args.buffer_mb * 1024 * 1024, args.temp_dir)
+    print(f"Merged {stats['read']} fighters into {stats['written']}, dropped {stats['duplicates']} older copies.")
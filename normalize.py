@@ -0,0 +1,148 @@
+# Python 3.7
+# appendix to sherdog-parser.py
+# Created by - Montanaz0r (https://github.com/Montanaz0r)
+# Parsers turning raw strings scraped from sherdog into compact numeric values: event dates into epoch days, fight
+# end time into total fight seconds, rounds into integers, height and weight into cm and kg. Sherdog repeats the same
+# dates, times and measurements across thousands of fights, so every parser is cached.
+# Each parser returns None when the value is missing or could not be understood. Names of fighters and gyms are
+# normalized into lookup keys shared by offset index, gym table, merge and opponent graph.
+
+import datetime
+import functools
+import re
+import unicodedata
+
+EPOCH = datetime.date(1970, 1, 1)
+ROUND_SECONDS = 300  # standard 5 minute round, used to convert round & time into total fight seconds.
+INCH_CM = 2.54
+POUND_KG = 0.45359237
+
+_feet_inches = re.compile(r'''(\d+)\s*'\s*(\d+(?:\.\d+)?)?''')
+_number = re.compile(r'(\d+(?:\.\d+)?)')
+_non_alphanumeric = re.compile(r'[^0-9a-z]+')
+
+
+@functools.lru_cache(maxsize=None)
+def parse_event_date(event_date):
+    """
+    Converts sherdog's event date to number of days since 1970-01-01.
+    :param event_date: string with event date, for instance 'Mar / 20 / 2005'
+    :return: integer with epoch day or None
+    """
+    for date_format in ('%b/%d/%Y', '%Y-%m-%d'):
+        try:
+            return (datetime.datetime.strptime(event_date.replace(' ', ''), date_format).date() - EPOCH).days
+        except ValueError:
+            continue
+        except AttributeError:
+            return None
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def parse_birth_date(birth_date):
+    """
+    Converts fighter's birth date in ISO 8601 format to number of days since 1970-01-01.
+    :param birth_date: string with birth date, for instance '1987-07-19'
+    :return: integer with epoch day or None
+    """
+    return parse_event_date(birth_date)
+
+
+@functools.lru_cache(maxsize=None)
+def parse_round(rounds):
+    """
+    Converts round in which fight has ended to integer.
+    :param rounds: string with round, for instance '2'
+    :return: integer with round or None
+    """
+    try:
+        return int(rounds.strip())
+    except (ValueError, AttributeError):
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def parse_time(fight_time):
+    """
+    Converts time in round when fight has ended to seconds.
+    :param fight_time: string with time, for instance '3:24'
+    :return: integer with seconds or None
+    """
+    try:
+        minutes, seconds = fight_time.strip().split(':')
+        return int(minutes) * 60 + int(seconds)
+    except (ValueError, AttributeError):
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def parse_fight_seconds(rounds, fight_time, round_seconds=ROUND_SECONDS):
+    """
+    Converts round and time in round into total fight duration. Sherdog does not tell round length, so every earlier
+    round is counted as round_seconds long - fights with other rounds (10 minute first rounds of old Pride events,
+    3 minute rounds of some promotions) get approximate duration.
+    :param rounds: string with round, for instance '2'
+    :param fight_time: string with time, for instance '3:24'
+    :param round_seconds: optional - integer with length of one round, standard 5 minutes by default
+    :return: integer with total fight seconds or None
+    """
+    round_number = parse_round(rounds)
+    seconds = parse_time(fight_time)
+    if round_number is None or seconds is None:
+        return None
+    return (round_number - 1) * round_seconds + seconds
+
+
+@functools.lru_cache(maxsize=None)
+def parse_height(height):
+    """
+    Converts fighter's height to centimeters.
+    :param height: string with height in feet and inches ('5\\'11"') or in metric units ('180.34 cm', '1.8 m')
+    :return: float with height in cm or None
+    """
+    if not height:
+        return None
+    match = _feet_inches.search(height)
+    if match:
+        inches = int(match.group(1)) * 12 + float(match.group(2) or 0)
+        return round(inches * INCH_CM, 1)
+    match = _number.search(height)
+    if match is None:
+        return None
+    value = float(match.group(1))
+    if 'cm' in height.lower():
+        return round(value, 1)
+    elif 'm' in height.lower():
+        return round(value * 100, 1)
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def parse_weight(weight):
+    """
+    Converts fighter's weight to kilograms.
+    :param weight: string with weight in pounds ('155 lbs') or kilograms ('70.3 kg')
+    :return: float with weight in kg or None
+    """
+    if not weight:
+        return None
+    match = _number.search(weight)
+    if match is None:
+        return None
+    value = float(match.group(1))
+    if 'kg' in weight.lower():
+        return round(value, 1)
+    return round(value * POUND_KG, 1)
+
+
+def normalize_name(name):
+    """
+    Normalizes fighter's (or gym's) name for lookups - accents are dropped, letters lowercased, everything else
+    collapsed into single spaces, so 'José  Aldo' and 'jose aldo' give the same key.
+    :param name: string with name
+    :return: string with normalized name, empty for None
+    """
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _non_alphanumeric.sub(' ', stripped.lower()).strip()
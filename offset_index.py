@@ -0,0 +1,246 @@
+# Python 3.7
+# appendix to sherdog-parser.py
+# Created by - Montanaz0r (https://github.com/Montanaz0r)
+# Sidecar offset index over output files. For every fighter it keeps byte offset and length of the fighter's rows
+# (csv) or object (json) under two keys - fighter url and normalized name - in a small sqlite file next to the output.
+# OffsetReader memory-maps the output file and returns records of one fighter without reading the rest of the file.
+# Index is built while writing csv output (see Fighter.save_to_csv) or by a one-off scan with build_index.
+# Only plain (not compressed) files can be indexed, compressed streams cannot be read from the middle.
+#
+# Usage: python offset_index.py sherdog.csv                      - builds sherdog.csv.idx
+#        python offset_index.py sherdog.csv "Tony Galindo"       - prints fighter's records
+
+import csv
+import itertools
+import json
+import mmap
+import os
+import sqlite3
+import sys
+
+from normalize import normalize_name
+
+CSV_ENCODING = 'ISO-8859-1'
+_schema = '''
+CREATE TABLE IF NOT EXISTS entries (key TEXT NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS entries_key ON entries (key);
+'''
+
+
+class OffsetIndex(object):
+    """OffsetIndex class - sqlite sidecar mapping fighter url and normalized name to byte ranges in output file.
+    """
+
+    def __init__(self, data_path, index_path=None):
+        """
+        Initializes an OffsetIndex instance, sidecar file is created when missing.
+        :param data_path: string with path to indexed output file
+        :param index_path: optional - string with path to sidecar file, '<data_path>.idx' by default
+        """
+        self.data_path = data_path
+        self.index_path = index_path or f'{data_path}.idx'
+        # writes come from scraping threads, they are serialized by the caller (output_lock in sherdog-parser.py).
+        self.connection = sqlite3.connect(self.index_path, check_same_thread=False)
+        self.connection.executescript(_schema)
+
+    def add(self, url, name, offset, length):
+        """
+        Adds byte range of one fighter's records.
+        :param url: string with fighter's url, or None
+        :param name: string with fighter's name, or None
+        :param offset: integer with byte offset of the first record
+        :param length: integer with number of bytes taken by fighter's records
+        :return: None
+        """
+        keys = []
+        if url:
+            keys.append(f'url:{url}')
+        if name:
+            keys.append(f'name:{normalize_name(name)}')
+        self.connection.executemany('INSERT INTO entries (key, offset, length) VALUES (?, ?, ?)',
+                                    [(key, offset, length) for key in keys])
+
+    def commit(self):
+        self.connection.commit()
+
+    def clear(self):
+        """
+        Removes all entries, used before output file is written from scratch.
+        :return: None
+        """
+        self.connection.execute('DELETE FROM entries')
+        self.connection.commit()
+
+    def lookup(self, url=None, name=None):
+        """
+        Finds byte ranges of fighter's records.
+        :param url: optional - string with fighter's url
+        :param name: optional - string with fighter's name, used when url is not given
+        :return: list of tuples (offset, length), several when name is shared by different fighters
+        """
+        key = f'url:{url}' if url else f'name:{normalize_name(name)}'
+        return self.connection.execute('SELECT offset, length FROM entries WHERE key = ? ORDER BY offset',
+                                       (key,)).fetchall()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+def _scan_csv(data_path, index):
+    """
+    Indexes csv output - consecutive rows of the same fighter form one entry.
+    :param data_path: string with path to csv file
+    :param index: OffsetIndex instance
+    :return: integer with number of indexed fighters
+    """
+    fighters = 0
+    current, start, offset = None, 0, 0
+    with open(data_path, 'rb') as data_file:
+        for line in data_file:
+            row = next(csv.reader([line.decode(CSV_ENCODING)], delimiter=';'), [])
+            if offset == 0 and row and row[0].startswith('Fighter'):  # header.
+                offset += len(line)
+                start = offset
+                continue
+            key = (row[12] if len(row) > 12 else None, row[0] if row else None)
+            if key != current:
+                if current is not None:
+                    index.add(current[0], current[1], start, offset - start)
+                    fighters += 1
+                current, start = key, offset
+            offset += len(line)
+    if current is not None:
+        index.add(current[0], current[1], start, offset - start)
+        fighters += 1
+    return fighters
+
+
+def iter_json_entries(data_file):
+    """
+    Splits json output written by json.dump(..., indent=4) into fighters - either {'fighters': [...]} made by
+    Fighter.save_data, or {name: [...]} made by Fighter.save_to_json. Lines are read one by one, the file is never
+    loaded as a whole.
+    :param data_file: file object returning bytes, positioned at the beginning of the file
+    :return: generator of tuples (url, name, offset, entry) - entry is bytes of fighter's object (save_data layout)
+             or of '"name": [...]' entry (save_to_json layout) without trailing comma, offset its position in the file
+    """
+    first = data_file.readline()
+    second = data_file.readline()
+    nested = second.strip().startswith(b'"fighters": [')
+    offset = len(first)
+    lines, url, name = None, None, None
+    for line in itertools.chain([second], data_file):
+        entry = line.rstrip(b',\r\n')
+        if nested:
+            # fighter objects are indented with 8 spaces, their fields with 12.
+            if lines is None and entry == b'        {':
+                lines, start = [line], offset
+            elif lines is not None:
+                lines.append(line)
+                if line.startswith(b'            "fighterUrl": '):
+                    url = json.loads(entry.split(b':', 1)[1])
+                elif line.startswith(b'            "name": '):
+                    name = json.loads(entry.split(b':', 1)[1])
+                elif entry == b'        }':
+                    yield url, name, start, b''.join(lines).rstrip(b',\r\n')
+                    lines, url, name = None, None, None
+        elif lines is None and line.startswith(b'    "'):  # '    "name": [' opens list of fighter's fights.
+            name = json.loads(entry.rsplit(b':', 1)[0])
+            if entry.endswith(b'[]'):  # fighter without fights, whole entry fits in one line.
+                yield None, name, offset, entry
+            else:
+                lines, start = [line], offset
+        elif lines is not None:
+            lines.append(line)
+            if entry == b'    ]':
+                yield None, name, start, b''.join(lines).rstrip(b',\r\n')
+                lines, name = None, None
+        offset += len(line)
+
+
+def _scan_json(data_path, index):
+    """
+    Indexes json output, see iter_json_entries.
+    :param data_path: string with path to json file
+    :param index: OffsetIndex instance
+    :return: integer with number of indexed fighters
+    """
+    fighters = 0
+    with open(data_path, 'rb') as data_file:
+        for url, name, offset, entry in iter_json_entries(data_file):
+            index.add(url, name, offset, len(entry))
+            fighters += 1
+    return fighters
+
+
+def build_index(data_path, index_path=None):
+    """
+    Builds sidecar index with a one-off scan of existing output file.
+    :param data_path: string with path to plain .csv or .json file
+    :param index_path: optional - string with path to sidecar file, '<data_path>.idx' by default
+    :return: integer with number of indexed fighters
+    """
+    index = OffsetIndex(data_path, index_path)
+    index.clear()
+    if data_path.endswith('.json'):
+        fighters = _scan_json(data_path, index)
+    else:
+        fighters = _scan_csv(data_path, index)
+    index.close()
+    return fighters
+
+
+class OffsetReader(object):
+    """OffsetReader class - random-access reader returning records of a single fighter from indexed output file.
+    """
+
+    def __init__(self, data_path, index_path=None):
+        """
+        Initializes an OffsetReader instance, output file is memory-mapped.
+        :param data_path: string with path to indexed output file
+        :param index_path: optional - string with path to sidecar file, '<data_path>.idx' by default
+        """
+        self.data_path = data_path
+        self.index = OffsetIndex(data_path, index_path)
+        self.data_file = open(data_path, 'rb')
+        self.mapped = mmap.mmap(self.data_file.fileno(), 0, access=mmap.ACCESS_READ) \
+            if os.path.getsize(data_path) else b''
+
+    def read_fighter(self, url=None, name=None):
+        """
+        Reads records of one fighter.
+        :param url: optional - string with fighter's url
+        :param name: optional - string with fighter's name, used when url is not given
+        :return: list of entries, one per matching fighter - list of csv rows for csv files, or dictionary
+                 (save_data layout) / tuple (name, list of fights) (save_to_json layout) for json files
+        """
+        entries = []
+        for offset, length in self.index.lookup(url, name):
+            chunk = self.mapped[offset:offset + length]
+            if self.data_path.endswith('.json'):
+                text = chunk.decode('utf-8')
+                if text.lstrip().startswith('"'):  # '"name": [...]' entry of save_to_json layout.
+                    entries.append(next(iter(json.loads('{' + text + '}').items())))
+                else:
+                    entries.append(json.loads(text))
+            else:
+                entries.append(list(csv.reader(chunk.decode(CSV_ENCODING).splitlines(), delimiter=';')))
+        return entries
+
+    def close(self):
+        if self.mapped:
+            self.mapped.close()
+        self.data_file.close()
+        self.index.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        reader = OffsetReader(sys.argv[1])
+        lookup = {'url': sys.argv[2]} if 'sherdog.com' in sys.argv[2] else {'name': sys.argv[2]}
+        for entry in reader.read_fighter(**lookup):
+            print(json.dumps(entry, indent=4))
+        reader.close()
+    else:
+        print(f'Indexed {build_index(sys.argv[1])} fighters.')
@@ -0,0 +1,366 @@
+# Python 3.7
+# appendix to sherdog-parser.py
+# Created by - Montanaz0r (https://github.com/Montanaz0r)
+# Compact opponent graph. Scraped fight histories are turned once into CSR (compressed sparse row) adjacency arrays:
+# fighter n's fights are edges indptr[n]:indptr[n + 1] of indices (opponents), result, day and method arrays, sorted
+# by opponent and date. Arrays are saved as .npy files and memory-mapped on load, so queries - head-to-head, common
+# opponents, k-hop neighbourhoods and shortest win chains - touch only a few rows instead of scanning every fighter.
+#
+# Fighters are identified by sherdog id taken from their urls, so profile links found in fight histories
+# (opponentUrl in json output) connect the graph. Csv output has no opponent urls, there opponents are matched to
+# scraped fighters by unique name. Every fight is stored from both sides - when the opponent was not scraped, the
+# reverse edge is made from the fighter's record.
+#
+# Usage: python opponent_graph.py build sherdog-graph sherdog.json [more files]
+#        python opponent_graph.py sherdog-graph h2h "Jon Jones" "Daniel Cormier"
+#        python opponent_graph.py sherdog-graph common "Jon Jones" "Daniel Cormier"
+#        python opponent_graph.py sherdog-graph khop "Jon Jones" 2
+#        python opponent_graph.py sherdog-graph chain "Tony Galindo" "Jon Jones"
+
+import itertools
+import os
+import re
+import sys
+from array import array
+
+import numpy as np
+
+from analytics import RESULTS, METHODS, WIN, LOSS, MISSING_DAY, _method_category, _parse_event_day, _result_category
+from merge import iter_fighters
+from normalize import normalize_name
+
+_sherdog_id = re.compile(r'(\d+)\.?$')
+_arrays = ('keys', 'names', 'name_keys', 'scraped', 'indptr', 'indices', 'result', 'day', 'method')
+_inverted_result = np.arange(len(RESULTS), dtype=np.int8)  # result of the same fight seen from the opponent's side.
+_inverted_result[[WIN, LOSS]] = [LOSS, WIN]
+
+
+def node_key(url=None, name=None):
+    """
+    Builds key of graph node - sherdog id taken from fighter's url, or normalized name when url is unknown.
+    :param url: optional - string with fighter's url or page, for instance '/fighter/Jon-Jones-27944'
+    :param name: optional - string with fighter's name
+    :return: string with key, for instance 'id:27944' or 'name:jon jones'
+    """
+    if url and url not in ('N/A', 'NA'):
+        page = url.split('sherdog.com')[-1]
+        match = _sherdog_id.search(page)
+        return f'id:{int(match.group(1))}' if match else page
+    return f'name:{normalize_name(name)}'
+
+
+def _fight_history(fighter):
+    """
+    Supporting function reading fights of one fighter returned by merge.iter_fighters.
+    :param fighter: dictionary (json layout), list [name, fights] (save_to_json layout) or list of csv rows
+    :return: tuple (fighter's url, fighter's name, list of tuples (opponent url, opponent name, result, date, method))
+    """
+    if isinstance(fighter, dict):
+        fights = [(fight.get('opponentUrl'), fight['opponent'], fight['result'],
+                   fight.get('dateDay') if isinstance(fight.get('dateDay'), int) else fight['date'], fight['method'])
+                  for fight in fighter.get('fightHistoryPro', [])]
+        return fighter.get('fighterUrl'), fighter.get('name'), fights
+    if fighter and isinstance(fighter[0], str):  # [name, fights]
+        name, fights = fighter
+        return None, name, [(None, fight['opponent'], fight['result'], fight['date'], fight['method'])
+                            for fight in fights]
+    rows = fighter
+    return (rows[0][12] if len(rows[0]) > 12 else None, rows[0][0],
+            [(None, row[1], row[2], row[4], row[5]) for row in rows if len(row) > 5])
+
+
+class OpponentGraph(object):
+    """OpponentGraph class - fighter-opponent graph stored as CSR integer arrays.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty OpponentGraph instance.
+        """
+        self.keys = None  # array of str: sorted node keys (see node_key), position is node's id
+        self.names = None  # array of str: fighter names
+        self.name_keys = None  # array of str: normalized fighter names for lookups by name
+        self.scraped = None  # array of bool: True for fighters whose own fight history was scraped
+        self.indptr = None  # array of int64: node n's edges are indptr[n]:indptr[n + 1]
+        self.indices = None  # array of int32: opponent node of every edge, sorted within a node
+        self.result = None  # array of int8: RESULTS code of every edge, from the node's point of view
+        self.day = None  # array of int32: event date as days since 1970-01-01, MISSING_DAY if unknown
+        self.method = None  # array of int8: METHODS code of every edge
+
+    def __len__(self):
+        return 0 if self.keys is None else len(self.keys)
+
+    def save(self, directory):
+        """
+        Writes graph arrays as .npy files.
+        :param directory: string with path to directory, created when missing
+        :return: None
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in _arrays:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """
+        Reads graph saved with save.
+        :param directory: string with path to directory
+        :param mmap: boolean, if True arrays are memory-mapped instead of read into memory
+        :return: OpponentGraph instance
+        """
+        graph = cls()
+        for name in _arrays:
+            setattr(graph, name, np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r' if mmap else None))
+        return graph
+
+    def node(self, fighter):
+        """
+        Finds node of a fighter.
+        :param fighter: integer with node id, string with fighter's url, page or node key, or fighter's name
+        :return: integer with node id, KeyError is raised for unknown fighter and ValueError for ambiguous name
+        """
+        if isinstance(fighter, (int, np.integer)):
+            return int(fighter)
+        if fighter.startswith(('id:', 'name:')):
+            key = fighter
+        elif '/' in fighter:
+            key = node_key(url=fighter)
+        else:
+            matches = np.flatnonzero(self.name_keys == normalize_name(fighter))
+            scraped = matches[self.scraped[matches]]
+            matches = scraped if len(scraped) else matches
+            if len(matches) > 1:
+                raise ValueError(f'{fighter} matches {len(matches)} fighters, please use url instead: '
+                                 f'{list(self.keys[matches])}')
+            if not len(matches):
+                raise KeyError(fighter)
+            return int(matches[0])
+        position = int(np.searchsorted(self.keys, key))
+        if position == len(self.keys) or self.keys[position] != key:
+            raise KeyError(fighter)
+        return position
+
+    def opponents(self, fighter):
+        """
+        :param fighter: fighter accepted by node
+        :return: array with opponent node of every fight, sorted
+        """
+        node = self.node(fighter)
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def head_to_head(self, fighter, opponent):
+        """
+        Finds all fights between two fighters.
+        :param fighter: fighter accepted by node, results are given from this fighter's point of view
+        :param opponent: fighter accepted by node
+        :return: dictionary with 'result', 'day' and 'method' arrays, one entry per fight in chronological order
+        """
+        node, other = self.node(fighter), self.node(opponent)
+        start = int(self.indptr[node])
+        row = self.indices[start:self.indptr[node + 1]]
+        low = start + int(np.searchsorted(row, other, 'left'))
+        high = start + int(np.searchsorted(row, other, 'right'))
+        return {'result': self.result[low:high], 'day': self.day[low:high], 'method': self.method[low:high]}
+
+    def common_opponents(self, fighter, other):
+        """
+        Finds opponents both fighters have fought.
+        :param fighter: fighter accepted by node
+        :param other: fighter accepted by node
+        :return: array with node ids
+        """
+        node, other_node = self.node(fighter), self.node(other)
+        common = np.intersect1d(self.opponents(node), self.opponents(other_node))
+        return common[(common != node) & (common != other_node)]
+
+    def _expand(self, nodes):
+        """
+        Supporting method gathering edges of many nodes at once.
+        :param nodes: array with node ids
+        :return: tuple (array with source node of every edge, array with edge positions)
+        """
+        starts = self.indptr[nodes]
+        counts = (self.indptr[nodes + 1] - starts).astype(np.int64)
+        sources = np.repeat(nodes, counts)
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return sources, positions
+
+    def k_hop(self, fighter, k=2):
+        """
+        Finds fighters within k fights of a fighter (opponents, opponents of opponents, ...).
+        :param fighter: fighter accepted by node
+        :param k: integer with maximum number of hops
+        :return: tuple (array with node ids, array with number of hops to each of them)
+        """
+        node = self.node(fighter)
+        distance = np.full(len(self), -1, dtype=np.int16)
+        distance[node] = 0
+        frontier = np.array([node], dtype=np.int64)
+        for hop in range(1, k + 1):
+            if not len(frontier):
+                break
+            reached = np.unique(self.indices[self._expand(frontier)[1]])
+            frontier = reached[distance[reached] < 0]
+            distance[frontier] = hop
+        found = np.flatnonzero(distance > 0)
+        return found, distance[found]
+
+    def win_chain(self, fighter, other, max_hops=6):
+        """
+        Finds the shortest chain of wins from one fighter to another (A beat B, who beat C, ...).
+        :param fighter: fighter accepted by node, the first winner in the chain
+        :param other: fighter accepted by node, the last one beaten
+        :param max_hops: integer with maximum number of wins in the chain
+        :return: list of node ids from fighter to other, or None if there is no such chain
+        """
+        node, target = self.node(fighter), self.node(other)
+        parent = np.full(len(self), -1, dtype=np.int64)
+        parent[node] = node
+        frontier = np.array([node], dtype=np.int64)
+        for _ in range(max_hops):
+            if parent[target] >= 0 or not len(frontier):
+                break
+            sources, positions = self._expand(frontier)
+            wins = self.result[positions] == WIN
+            sources, targets = sources[wins], self.indices[positions[wins]]
+            new = parent[targets] < 0
+            targets, first = np.unique(targets[new], return_index=True)
+            parent[targets] = sources[new][first]
+            frontier = targets
+        if parent[target] < 0:
+            return None
+        chain = [target]
+        while chain[-1] != node:
+            chain.append(int(parent[chain[-1]]))
+        return chain[::-1]
+
+    def describe(self, nodes):
+        """
+        :param nodes: iterable with node ids
+        :return: list of strings 'name (key)'
+        """
+        return [f'{self.names[node]} ({self.keys[node]})' for node in nodes]
+
+
+def build_graph(input_paths):
+    """
+    Builds opponent graph from output files of sherdog-parser.py. When the same fighter appears more than once, only
+    the copy with the newest scrape timestamp is used.
+    :param input_paths: list of paths to csv, json or json lines files, plain or compressed
+    :return: OpponentGraph instance
+    """
+    keys, names, nodes = [], [], {}  # node key -> node id
+
+    def node(key, name):
+        number = nodes.get(key)
+        if number is None:
+            number = nodes[key] = len(keys)
+            keys.append(key)
+            names.append(name or '')
+        elif name and not names[number]:
+            names[number] = name
+        return number
+
+    newest = {}  # owner node -> (timestamp, record number) of the copy used
+    source, target, record = array('i'), array('i'), array('i')
+    results, days, methods = array('b'), array('i'), array('b')
+    result_codes, method_codes, day_codes = {}, {}, {}
+    fighters = itertools.chain.from_iterable(iter_fighters(path) for path in input_paths)
+    for record_number, (_, scraped_at, fighter) in enumerate(fighters):
+        owner_url, owner_name, fights = _fight_history(fighter)
+        owner = node(node_key(owner_url, owner_name), owner_name)
+        if owner not in newest or scraped_at >= newest[owner][0]:
+            newest[owner] = (scraped_at, record_number)
+        for opponent_url, opponent_name, result, date, method in fights:
+            source.append(owner)
+            target.append(node(node_key(opponent_url, opponent_name), opponent_name))
+            record.append(record_number)
+            if result not in result_codes:
+                result_codes[result] = _result_category(str(result))
+            if method not in method_codes:
+                method_codes[method] = _method_category(str(method))
+            if date not in day_codes:
+                day_codes[date] = date if isinstance(date, int) else _parse_event_day(str(date))
+            results.append(result_codes[result])
+            days.append(day_codes[date])
+            methods.append(method_codes[method])
+
+    n = len(keys)
+    source, target, record = (np.frombuffer(column, dtype=np.intc).astype(np.int64)
+                              for column in (source, target, record))
+    results = np.frombuffer(results, dtype=np.int8)
+    days = np.frombuffer(days, dtype=np.intc).astype(np.int32)
+    methods = np.frombuffer(methods, dtype=np.int8)
+    scraped = np.zeros(n, dtype=bool)
+    newest_record = np.full(n, -1, dtype=np.int64)
+    for owner, (_, record_number) in newest.items():
+        scraped[owner] = True
+        newest_record[owner] = record_number
+    keep = newest_record[source] == record  # older copies of rescraped fighters are dropped.
+
+    # opponents known only by name are matched with a scraped fighter of the same (unique) name.
+    scraped_by_name = {}
+    for owner in np.flatnonzero(scraped):
+        name_key = normalize_name(names[owner])
+        scraped_by_name[name_key] = -1 if name_key in scraped_by_name else owner
+    remap = np.arange(n, dtype=np.int64)
+    for number, key in enumerate(keys):
+        if key.startswith('name:') and not scraped[number] and scraped_by_name.get(key[5:], -1) >= 0:
+            remap[number] = scraped_by_name[key[5:]]
+    source, target = source[keep], remap[target[keep]]
+    results, days, methods = results[keep], days[keep], methods[keep]
+    loops = source == target
+    source, target, results, days, methods = (column[~loops] for column in (source, target, results, days, methods))
+
+    # fights against opponents who were not scraped are added from the opponent's side as well.
+    reverse = ~scraped[target]
+    source, target = np.concatenate([source, target[reverse]]), np.concatenate([target, source[reverse]])
+    results = np.concatenate([results, _inverted_result[results[reverse]]])
+    days, methods = np.concatenate([days, days[reverse]]), np.concatenate([methods, methods[reverse]])
+
+    # nodes are renumbered in key order, so keys can be found with binary search.
+    used = np.union1d(np.union1d(source, target), np.flatnonzero(scraped)).astype(np.int64)
+    used_keys = np.asarray(keys, dtype=str)[used] if len(used) else np.asarray([], dtype=str)
+    by_key = np.argsort(used_keys, kind='stable')
+    relabel = np.full(n, -1, dtype=np.int64)
+    relabel[used[by_key]] = np.arange(len(used))
+    source, target = relabel[source], relabel[target]
+
+    order = np.lexsort((days, target, source))
+    graph = OpponentGraph()
+    graph.keys = used_keys[by_key]
+    graph.names = np.asarray(names, dtype=str)[used[by_key]] if len(used) else np.asarray([], dtype=str)
+    graph.name_keys = np.asarray([normalize_name(name) for name in graph.names], dtype=str)
+    graph.scraped = scraped[used[by_key]]
+    graph.indptr = np.concatenate([[0], np.cumsum(np.bincount(source, minlength=len(used)))]).astype(np.int64)
+    graph.indices = target[order].astype(np.int32)
+    graph.result = results[order]
+    graph.day = days[order]
+    graph.method = methods[order]
+    return graph
+
+
+def _format_day(day):
+    return 'unknown date' if day == MISSING_DAY else str(np.datetime64(int(day), 'D'))
+
+
+if __name__ == '__main__':
+    if sys.argv[1] == 'build':
+        built = build_graph(sys.argv[3:])
+        built.save(sys.argv[2])
+        print(f'Graph with {len(built)} fighters and {len(built.indices)} edges saved to {sys.argv[2]}')
+    else:
+        graph, query = OpponentGraph.load(sys.argv[1]), sys.argv[2]
+        if query == 'h2h':
+            fights = graph.head_to_head(sys.argv[3], sys.argv[4])
+            for result, day, method in zip(fights['result'], fights['day'], fights['method']):
+                print(f'{_format_day(day)} {RESULTS[result]} ({METHODS[method]})')
+        elif query == 'common':
+            print('\n'.join(graph.describe(graph.common_opponents(sys.argv[3], sys.argv[4]))))
+        elif query == 'khop':
+            found, hops = graph.k_hop(sys.argv[3], int(sys.argv[4]) if len(sys.argv) > 4 else 2)
+            by_hops = {int(hop): int(count) for hop, count in zip(*np.unique(hops, return_counts=True))}
+            print(f'{len(found)} fighters, by hops: {by_hops}')
+        elif query == 'chain':
+            path = graph.win_chain(sys.argv[3], sys.argv[4])
+            print(' > '.join(graph.describe(path)) if path else 'No chain of wins found.')
@@ -0,0 +1,151 @@
+# Python 3.7
+# appendix to sherdog-parser.py
+# Created by - Montanaz0r (https://github.com/Montanaz0r)
+# Opt-in profiling mode. Every profiled call (scraping one fighter, or sending & parsing one fightfinder search) runs
+# under its own cProfile profiler, profiles are aggregated with pstats, and tracemalloc snapshots are sampled every
+# few calls to find allocation hot spots. The report lists the slowest fighters with their urls, hot functions and
+# allocation sites, so a slow run can be inspected after it has finished.
+
+import contextlib
+import cProfile
+import heapq
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+
+SNAPSHOT_EVERY = 50  # profiled calls between tracemalloc snapshots.
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 20
+# allocations made by the profiler itself (and by imports) are left out of the report.
+_allocation_filters = [tracemalloc.Filter(False, module.__file__) for module in (cProfile, pstats, tracemalloc)] + [
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+]
+
+
+class ScrapeProfiler(object):
+    """ScrapeProfiler class - collects cProfile statistics, tracemalloc samples and timings of profiled calls.
+    """
+
+    def __init__(self, report_path, slowest=20, snapshot_every=SNAPSHOT_EVERY):
+        """
+        Initializes a ScrapeProfiler instance and starts tracemalloc.
+        :param report_path: string with path to text file where report will be written
+        :param slowest: integer with number of slowest calls listed in the report
+        :param snapshot_every: integer with number of profiled calls between tracemalloc snapshots
+        """
+        self.report_path = report_path
+        self.slowest = slowest
+        self.snapshot_every = snapshot_every
+        self.lock = threading.Lock()
+        self.stats = None  # pstats.Stats: aggregated profile of all calls
+        self.timings = []  # list of tuples: (seconds, kind, label, url) of every profiled call
+        self.allocations = {}  # dict: allocation site -> largest size (bytes) seen in sampled snapshots
+        self.calls = 0
+        self.unprofiled_calls = 0  # calls timed without cProfile, because another profiler was active
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def profile(self, kind, label=None, url=None):
+        """
+        Profiles block of code, record yielded by the context manager may be updated with label and url once they
+        are known (for instance fighter's url after the page was requested).
+        :param kind: string describing profiled call, for instance 'fighter' or 'search'
+        :param label: optional - string identifying the call in the report
+        :param url: optional - string with requested url
+        :return: context manager yielding dictionary with 'label' and 'url' keys
+        """
+        record = {'label': label, 'url': url}
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # Python 3.12+ allows only one active profiler, concurrent calls are only timed.
+            profiler = None
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+            self._collect(kind, record, elapsed, profiler)
+
+    def _collect(self, kind, record, elapsed, profiler):
+        """
+        Supporting method merging results of one profiled call.
+        :return: None
+        """
+        with self.lock:
+            self.calls += 1
+            self.timings.append((elapsed, kind, record['label'], record['url']))
+            if profiler is None:
+                self.unprofiled_calls += 1
+            elif not profiler.getstats():
+                pass  # nothing was recorded - pstats raises TypeError for an empty profile.
+            elif self.stats is None:
+                self.stats = pstats.Stats(profiler)
+            else:
+                self.stats.add(profiler)
+            take_snapshot = self.calls % self.snapshot_every == 0
+        if take_snapshot:
+            self.sample_allocations()
+
+    def sample_allocations(self):
+        """
+        Takes tracemalloc snapshot and remembers the largest size seen for each allocation site.
+        :return: None
+        """
+        snapshot = tracemalloc.take_snapshot().filter_traces(_allocation_filters)
+        top = snapshot.statistics('lineno')[:TOP_ALLOCATIONS * 2]
+        with self.lock:
+            for statistic in top:
+                site = str(statistic.traceback)
+                self.allocations[site] = max(self.allocations.get(site, 0), statistic.size)
+
+    def write_report(self):
+        """
+        Writes profiling report to self.report_path.
+        :return: string with path to the report
+        """
+        self.sample_allocations()
+        current, peak = tracemalloc.get_traced_memory()
+        with self.lock:
+            timings = list(self.timings)
+            stats = self.stats
+            allocations = heapq.nlargest(TOP_ALLOCATIONS, self.allocations.items(), key=lambda item: item[1])
+            calls, unprofiled_calls = self.calls, self.unprofiled_calls
+
+        with open(self.report_path, 'w', encoding='utf-8') as report:
+            report.write(f'Profiled calls: {calls} ({unprofiled_calls} timed only)\n')
+            for kind in sorted({timing[1] for timing in timings}):
+                seconds = [timing[0] for timing in timings if timing[1] == kind]
+                report.write(f'{kind}: {len(seconds)} calls, {sum(seconds):.2f}s total, '
+                             f'{sum(seconds) / len(seconds):.3f}s mean, {max(seconds):.3f}s max\n')
+            report.write(f'Traced memory: {current / 1024:.0f} KiB current, {peak / 1024:.0f} KiB peak\n')
+
+            report.write(f'\n=== {self.slowest} slowest calls ===\n')
+            for elapsed, kind, label, url in heapq.nlargest(self.slowest, timings, key=lambda timing: timing[0]):
+                report.write(f'{elapsed:8.3f}s  {kind:<8} {label}  {url or ""}\n')
+
+            report.write('\n=== Hot functions (cumulative time) ===\n')
+            if stats is not None:
+                stream = io.StringIO()
+                stats.stream = stream
+                stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+                report.write(stream.getvalue())
+
+            report.write('\n=== Allocation sites (largest sampled size) ===\n')
+            for site, size in allocations:
+                report.write(f'{size / 1024:10.1f} KiB  {site}\n')
+        return self.report_path
+
+    def close(self):
+        """
+        Stops tracemalloc.
+        :return: None
+        """
+        tracemalloc.stop()
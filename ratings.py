@@ -0,0 +1,254 @@
+# Python 3.7
+# appendix to sherdog-parser.py
+# Created by - Montanaz0r (https://github.com/Montanaz0r)
+# Incremental chronological rating engine (Glicko or Elo) over the opponent graph (see opponent_graph.py). Bouts are
+# sorted by normalized event date and every date is one rating period - all bouts of the day are rated at once with
+# vectorized NumPy operations against ratings from the start of the day. Engine state (ratings, rating deviations,
+# fighters' last fight dates and hashes of rated bouts) is checkpointed to a .npz file, so after an incremental crawl
+# only new bouts are applied instead of replaying the whole history.
+#
+# Bouts dated on or before the last rated date which were not rated yet (for instance history of a newly scraped
+# fighter) cannot be placed into already rated history - they are counted as 'late' and skipped, --replay rebuilds
+# ratings from scratch including them.
+#
+# Usage: python ratings.py sherdog-graph sherdog-ratings.npz [--system elo] [--replay] [--top 25]
+
+import argparse
+import hashlib
+import os
+
+import numpy as np
+
+from analytics import WIN, LOSS, DRAW, MISSING_DAY
+from opponent_graph import OpponentGraph
+
+INITIAL_RATING = 1500.0
+INITIAL_RD = 350.0  # rating deviation of a new fighter, also the highest deviation reachable through inactivity.
+MIN_RD = 30.0
+RD_GROWTH = 35.0  # growth of rating deviation per RD_PERIOD_DAYS of inactivity (Glicko's c constant).
+RD_PERIOD_DAYS = 30
+ELO_K = 32.0
+_q = np.log(10) / 400
+_scores = {WIN: 1.0, LOSS: 0.0, DRAW: 0.5}  # no contests and other results are not rated.
+
+
+def extract_bouts(graph):
+    """
+    Collects every bout once from the opponent graph - edges of both fighters describing the same fight are merged.
+    Fighters who met more than once on the same day (tournaments) keep all their bouts: edges of the fighter whose
+    record lists more of them are used, the mirrored edges of the other fighter are dropped.
+    :param graph: OpponentGraph instance
+    :return: dictionary of arrays: 'a' and 'b' node ids (a < b), 'day' and 'score' of fighter a (1, 0.5 or 0) and
+             'rematch' - number of earlier bouts of the same pair on the same day
+    """
+    source = np.repeat(np.arange(len(graph), dtype=np.int64), np.diff(graph.indptr))
+    target = np.asarray(graph.indices, dtype=np.int64)
+    result = np.asarray(graph.result)
+    score = np.full(len(result), np.nan)
+    for code, value in _scores.items():
+        score[result == code] = value
+    rated = ~np.isnan(score) & (source != target)
+    source, target, score, day = source[rated], target[rated], score[rated], np.asarray(graph.day)[rated]
+    flipped = source > target
+    a, b = np.where(flipped, target, source), np.where(flipped, source, target)
+    score = np.where(flipped, 1.0 - score, score)
+    _, group = np.unique(np.stack([a, b, day.astype(np.int64)]), axis=1, return_inverse=True)
+    group = group.reshape(-1)
+    from_b = np.bincount(group, weights=flipped)
+    from_a = np.bincount(group) - from_b
+    kept = np.flatnonzero(flipped == (from_b > from_a)[group])
+    order = kept[np.lexsort((kept, group[kept]))]  # bouts of the same group next to each other, in edge order.
+    starts = np.ones(len(order), dtype=bool)
+    starts[1:] = group[order][1:] != group[order][:-1]
+    rematch = np.arange(len(order)) - np.maximum.accumulate(np.where(starts, np.arange(len(order)), 0))
+    by_edge = np.argsort(order)
+    kept, rematch = order[by_edge], rematch[by_edge]
+    return {'a': a[kept], 'b': b[kept], 'day': day[kept], 'score': score[kept], 'rematch': rematch}
+
+
+def _bout_hashes(keys_a, keys_b, days, rematches):
+    """
+    Supporting function hashing bouts, so rated bouts can be recognized in a rebuilt graph with different node ids.
+    :param keys_a: iterable with node keys of fighter a
+    :param keys_b: iterable with node keys of fighter b
+    :param days: iterable with bout days
+    :param rematches: iterable with numbers of earlier bouts of the same pair on the same day
+    :return: array of int64 hashes
+    """
+    # the first bout of the day keeps hash without rematch number, so older checkpoints stay valid.
+    bouts = (f'{a}|{b}|{day}' + (f'|{rematch}' if rematch else '')
+             for a, b, day, rematch in zip(keys_a, keys_b, days, rematches))
+    return np.array([int.from_bytes(hashlib.blake2b(bout.encode(), digest_size=8).digest(), 'little', signed=True)
+                     for bout in bouts], dtype=np.int64)
+
+
+def _g(rd):
+    return 1 / np.sqrt(1 + 3 * _q ** 2 * rd ** 2 / np.pi ** 2)
+
+
+class RatingEngine(object):
+    """RatingEngine class - ratings of all fighters, updated one event date at a time.
+    """
+
+    def __init__(self, system='glicko'):
+        """
+        Initializes a RatingEngine instance without any rated bouts.
+        :param system: string with either 'glicko' or 'elo'
+        """
+        if system not in ('glicko', 'elo'):
+            raise ValueError(f'Unknown rating system {system}, please use glicko or elo!')
+        self.system = system
+        self.keys = np.asarray([], dtype=str)  # array of str: sorted node keys of rated fighters
+        self.rating = np.zeros(0)  # array of float64: rating of every fighter
+        self.rd = np.zeros(0)  # array of float64: rating deviation (glicko only, constant for elo)
+        self.last_day = np.zeros(0, dtype=np.int32)  # array of int32: day of fighter's last rated bout
+        self.fights = np.zeros(0, dtype=np.int32)  # array of int32: number of rated bouts
+        self.applied = np.zeros(0, dtype=np.int64)  # array of int64: sorted hashes of rated bouts
+        self.rated_until = MISSING_DAY  # int: last rated date
+
+    def _add_fighters(self, keys):
+        """
+        Supporting method adding new fighters with initial ratings, keys stay sorted.
+        :param keys: array with node keys
+        :return: None
+        """
+        all_keys = np.union1d(self.keys, keys)
+        if len(all_keys) == len(self.keys):
+            return
+        old = np.searchsorted(all_keys, self.keys)
+        rating, rd = np.full(len(all_keys), INITIAL_RATING), np.full(len(all_keys), INITIAL_RD)
+        last_day, fights = np.full(len(all_keys), MISSING_DAY, dtype=np.int32), np.zeros(len(all_keys), dtype=np.int32)
+        rating[old], rd[old], last_day[old], fights[old] = self.rating, self.rd, self.last_day, self.fights
+        self.keys, self.rating, self.rd, self.last_day, self.fights = all_keys, rating, rd, last_day, fights
+
+    def update(self, graph, replay=False):
+        """
+        Rates bouts of the graph which were not rated yet, in chronological order.
+        :param graph: OpponentGraph instance
+        :param replay: boolean, if True state is reset and whole history is rated again
+        :return: dictionary with number of 'applied' bouts, 'late' bouts skipped, 'undated' bouts skipped and
+                 rated 'days'
+        """
+        if replay:
+            self.__init__(self.system)
+        bouts = extract_bouts(graph)
+        keys = np.asarray(graph.keys)
+        dated = bouts['day'] != MISSING_DAY
+        hashes = _bout_hashes(keys[bouts['a']], keys[bouts['b']], bouts['day'], bouts['rematch'])
+        new = dated & ~np.isin(hashes, self.applied)
+        late = new & (bouts['day'] <= self.rated_until)
+        new &= ~late
+
+        self._add_fighters(keys[np.unique(np.concatenate([bouts['a'][new], bouts['b'][new]]))])
+        a = np.searchsorted(self.keys, keys[bouts['a'][new]])
+        b = np.searchsorted(self.keys, keys[bouts['b'][new]])
+        day, score = bouts['day'][new], bouts['score'][new]
+        order = np.argsort(day, kind='stable')
+        a, b, day, score = a[order], b[order], day[order], score[order]
+        days, starts = np.unique(day, return_index=True)
+        ends = np.append(starts[1:], len(day))
+        for period_day, start, end in zip(days, starts, ends):
+            self._rate_period(int(period_day), a[start:end], b[start:end], score[start:end])
+
+        if len(days):
+            self.rated_until = int(days[-1])
+        self.applied = np.union1d(self.applied, hashes[new])
+        return {'applied': int(new.sum()), 'late': int(late.sum()), 'undated': int((~dated).sum()), 'days': len(days)}
+
+    def _rate_period(self, day, a, b, score):
+        """
+        Supporting method rating all bouts of one date at once against ratings from the start of the day.
+        :param day: integer with the date as days since 1970-01-01
+        :param a: array with state positions of fighters a
+        :param b: array with state positions of fighters b
+        :param score: array with scores of fighters a
+        :return: None
+        """
+        players = np.concatenate([a, b])
+        opponents = np.concatenate([b, a])
+        scores = np.concatenate([score, 1.0 - score])
+        # sums are accumulated over fighters of the day only, not over the whole state.
+        involved, player = np.unique(players, return_inverse=True)
+        if self.system == 'elo':
+            expected = 1 / (1 + 10 ** ((self.rating[opponents] - self.rating[players]) / 400))
+            self.rating[involved] += np.bincount(player, weights=ELO_K * (scores - expected), minlength=len(involved))
+        else:
+            inactive = self.last_day[involved] != MISSING_DAY
+            periods = np.where(inactive, (day - self.last_day[involved]) / RD_PERIOD_DAYS, 0)
+            self.rd[involved] = np.minimum(np.sqrt(self.rd[involved] ** 2 + RD_GROWTH ** 2 * periods), INITIAL_RD)
+            g = _g(self.rd[opponents])
+            expected = 1 / (1 + 10 ** (-g * (self.rating[players] - self.rating[opponents]) / 400))
+            variance_sum = np.bincount(player, weights=g ** 2 * expected * (1 - expected), minlength=len(involved))
+            improvement_sum = np.bincount(player, weights=g * (scores - expected), minlength=len(involved))
+            precision = 1 / self.rd[involved] ** 2 + _q ** 2 * variance_sum
+            self.rating[involved] += _q / precision * improvement_sum
+            self.rd[involved] = np.maximum(np.sqrt(1 / precision), MIN_RD)
+        self.fights[involved] += np.bincount(player, minlength=len(involved)).astype(np.int32)
+        self.last_day[involved] = day
+
+    def top(self, count=25, min_fights=5):
+        """
+        Lists the best rated fighters.
+        :param count: integer with number of fighters
+        :param min_fights: integer with minimum number of rated bouts
+        :return: list of tuples (node key, rating, rating deviation, number of bouts)
+        """
+        eligible = np.flatnonzero(self.fights >= min_fights)
+        best = eligible[np.argsort(-self.rating[eligible], kind='stable')[:count]]
+        return [(str(self.keys[i]), float(self.rating[i]), float(self.rd[i]), int(self.fights[i])) for i in best]
+
+    def save(self, path):
+        """
+        Writes engine state checkpoint.
+        :param path: string with path to .npz file
+        :return: None
+        """
+        temporary_path = f'{path}.tmp.npz'
+        np.savez(temporary_path, system=np.asarray(self.system), keys=self.keys, rating=self.rating, rd=self.rd,
+                 last_day=self.last_day, fights=self.fights, applied=self.applied,
+                 rated_until=np.asarray(self.rated_until))
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads engine state checkpoint written by save.
+        :param path: string with path to .npz file
+        :return: RatingEngine instance
+        """
+        with np.load(path) as state:
+            engine = cls(str(state['system']))
+            engine.keys, engine.rating, engine.rd = state['keys'], state['rating'], state['rd']
+            engine.last_day, engine.fights, engine.applied = state['last_day'], state['fights'], state['applied']
+            engine.rated_until = int(state['rated_until'])
+        return engine
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rates fighters from opponent graph, incrementally.')
+    parser.add_argument('graph', help='directory with graph made by opponent_graph.py')
+    parser.add_argument('checkpoint', help='.npz file with engine state, created when missing')
+    parser.add_argument('--system', choices=['glicko', 'elo'],
+                        help='rating system, default is glicko or the one of existing checkpoint')
+    parser.add_argument('--replay', action='store_true', help='rate whole history again')
+    parser.add_argument('--top', type=int, default=25, help='number of best rated fighters printed')
+    args = parser.parse_args()
+
+    fight_graph = OpponentGraph.load(args.graph)
+    if os.path.exists(args.checkpoint) and not args.replay:
+        rating_engine = RatingEngine.load(args.checkpoint)
+        if args.system is not None and args.system != rating_engine.system:
+            parser.error(f'{args.checkpoint} was rated with {rating_engine.system}, please use --replay to rate it '
+                         f'again with {args.system}!')
+    else:
+        rating_engine = RatingEngine(args.system or 'glicko')
+    stats = rating_engine.update(fight_graph, replay=args.replay)
+    rating_engine.save(args.checkpoint)
+    print(f"Rated {stats['applied']} new bouts over {stats['days']} dates, skipped {stats['late']} late and "
+          f"{stats['undated']} undated bouts.")
+    for key, rating, rd, fights in rating_engine.top(args.top):
+        try:
+            name = fight_graph.names[fight_graph.node(key)]
+        except KeyError:
+            name = key
+        print(f'{rating:7.1f} +/- {rd:5.1f} {fights:4} bouts  {name}')
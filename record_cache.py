@@ -0,0 +1,153 @@
+# Python 3.7
+# appendix to sherdog-parser.py
+# Created by - Montanaz0r (https://github.com/Montanaz0r)
+# Persistent cache of parsed fighter records. Every extracted profile is stored in sqlite file as a json object with
+# Fighter's fields, keyed by url, hash of the profile section of downloaded html and parser version. A page whose
+# profile has not changed is restored from the cache instead of being parsed with BeautifulSoup again, and
+# 'export-cache' command of sherdog-parser.py regenerates csv / json output (for instance after a fix in save_*
+# methods) straight from the cache without any requests or html parsing. Records made by another parser version are
+# ignored, bump PARSER_VERSION in sherdog-parser.py whenever extraction logic changes.
+#
+# Only the profile section is hashed - from fighter's name (the first field parsed) to the end of streamed html, with
+# scripts and comments left out - since page header, ads and inline scripts differ on every request.
+#
+# Usage: python record_cache.py sherdog-records.db             - prints number of cached records per parser version
+
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+import threading
+
+CACHE_FORMAT = 1  # stored as sqlite user_version, caches of older formats (pickled fields) are dropped on open.
+_schema = '''
+CREATE TABLE IF NOT EXISTS records (url TEXT PRIMARY KEY, content_hash TEXT NOT NULL,
+    parser_version INTEGER NOT NULL, scraped_at INTEGER, fields TEXT NOT NULL);
+'''
+_profile_start = re.compile(r'''class\s*=\s*["']fn["']''')
+_volatile = re.compile(r'<script\b.*?</script\s*>|<!--.*?-->', re.DOTALL | re.IGNORECASE)
+
+
+def profile_section(html):
+    """
+    Cuts the part of fighter's page which fields are extracted from, see the header of this file.
+    :param html: string with html
+    :return: string with profile section, or whole html without scripts if fighter's name was not found
+    """
+    start = _profile_start.search(html)
+    return _volatile.sub('', html[start.start():] if start else html)
+
+
+def content_hash(html):
+    """
+    Hashes profile section of downloaded html of fighter's page.
+    :param html: string with html
+    :return: string with hex digest
+    """
+    return hashlib.blake2b(profile_section(html).encode('utf-8', errors='replace'), digest_size=16).hexdigest()
+
+
+class RecordCache(object):
+    """RecordCache class - sqlite file with parsed fighter records, shared by scraping threads.
+    """
+
+    def __init__(self, path, parser_version):
+        """
+        Initializes a RecordCache instance, database file is created if it does not exist.
+        :param path: string with path to sqlite database file
+        :param parser_version: integer with version of extraction logic, records of other versions are not used
+        """
+        self.path = path
+        self.parser_version = parser_version
+        self.lock = threading.Lock()  # one connection is used by all scraping threads.
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != CACHE_FORMAT:
+            self.connection.execute('DROP TABLE IF EXISTS records')
+            self.connection.execute(f'PRAGMA user_version = {CACHE_FORMAT}')
+        self.connection.executescript(_schema)
+        self.hits = 0  # int: pages restored from the cache
+        self.misses = 0  # int: pages which had to be parsed
+
+    def get(self, url, html):
+        """
+        Looks up parsed record of the page, valid only if profile section of html and parser version are the same as
+        when it was stored.
+        :param url: string with fighter's url
+        :param html: string with downloaded html
+        :return: dictionary with Fighter's fields, or None if there is no valid record
+        """
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT fields FROM records WHERE url = ? AND content_hash = ? AND parser_version = ?',
+                (url, content_hash(html), self.parser_version)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, url, html, fields, scraped_at=None):
+        """
+        Stores parsed record of the page, replacing older record of the same url.
+        :param url: string with fighter's url
+        :param html: string with downloaded html the record was extracted from
+        :param fields: dictionary with Fighter's fields
+        :param scraped_at: optional - integer with unix time when the page was downloaded
+        :return: None
+        """
+        encoded = json.dumps(fields, ensure_ascii=False)
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)',
+                                    (url, content_hash(html), self.parser_version, scraped_at, encoded))
+
+    def touch(self, url, scraped_at):
+        """
+        Updates download time of cached record, called when unchanged page was downloaded again.
+        :param url: string with fighter's url
+        :param scraped_at: integer with unix time when the page was downloaded
+        :return: None
+        """
+        with self.lock:
+            self.connection.execute('UPDATE records SET scraped_at = ? WHERE url = ?', (scraped_at, url))
+
+    def iter_records(self, batch_size=1000):
+        """
+        Reads all records of current parser version, ordered by url.
+        :param batch_size: integer with number of rows fetched at once
+        :return: generator of tuples (url, scraped_at, dictionary with Fighter's fields)
+        """
+        with self.lock:
+            cursor = self.connection.execute(
+                'SELECT url, scraped_at, fields FROM records WHERE parser_version = ? ORDER BY url',
+                (self.parser_version,))
+            rows = cursor.fetchmany(batch_size)
+        while rows:
+            for url, scraped_at, encoded in rows:
+                yield url, scraped_at, json.loads(encoded)
+            with self.lock:
+                rows = cursor.fetchmany(batch_size)
+
+    def prune(self):
+        """
+        Deletes records made by other parser versions.
+        :return: integer with number of deleted records
+        """
+        with self.lock:
+            return self.connection.execute('DELETE FROM records WHERE parser_version != ?',
+                                           (self.parser_version,)).rowcount
+
+    def close(self):
+        """
+        Closes database connection.
+        :return: None
+        """
+        self.connection.close()
+
+
+if __name__ == '__main__':
+    database = sqlite3.connect(sys.argv[1])
+    for version, count in database.execute('SELECT parser_version, COUNT(*) FROM records GROUP BY parser_version'):
+        print(f'parser version {version}: {count} records')
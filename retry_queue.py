@@ -0,0 +1,160 @@
+# Python 3.7
+# appendix to sherdog-parser.py
+# Created by - Montanaz0r (https://github.com/Montanaz0r)
+# Persistent retry queue (dead-letter file) for fighters that could not be scraped. Every failure is appended as one
+# json line with work item, reason and attempt count, and successful retries append a 'resolved' line, so the file
+# survives crashes and never has to be rewritten while crawling. Replaying the file gives fighters still waiting for
+# a retry, which 'retry-failed' command of sherdog-parser.py processes without re-running the whole crawl.
+# Transient errors (connection problems, 429 and 5xx responses) are retried with exponential backoff first, and only
+# work items which still fail with one of them are queued - other outcomes (fighter not found, ambiguous search, data
+# which did not pass validation) would be the same on every retry.
+#
+# Usage: python retry_queue.py sherdog-failed.jsonl             - lists pending fighters with reasons
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+RETRY_ATTEMPTS = 3  # attempts made within the run before work item goes to the dead-letter file.
+BACKOFF_SECONDS = 1.0  # delay before the first retry, doubled for every next one.
+MAX_BACKOFF_SECONDS = 30.0
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class TransientError(Exception):
+    """TransientError class - raised for failures which are likely to disappear when request is repeated.
+    """
+
+
+TRANSIENT_ERRORS = (TransientError, OSError)  # OSError covers connection errors raised by requests.
+
+
+def retry_with_backoff(function, attempts=RETRY_ATTEMPTS, backoff=BACKOFF_SECONDS, retry_on=TRANSIENT_ERRORS):
+    """
+    Calls function until it succeeds, sleeping exponentially longer (with jitter) between attempts.
+    :param function: function without arguments
+    :param attempts: integer with maximum number of calls
+    :param backoff: float with seconds to wait before the first retry
+    :param retry_on: tuple of exception classes worth retrying, other exceptions are raised right away
+    :return: value returned by function, exception of the last attempt is raised when all attempts fail
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return function()
+        except retry_on:
+            if attempt == attempts:
+                raise
+            delay = min(backoff * 2 ** (attempt - 1), MAX_BACKOFF_SECONDS)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+
+def work_key(kind, payload):
+    """
+    Builds key identifying work item in the queue.
+    :param kind: string with either 'index' (fighter's index), 'page' (fighter's page) or 'search' (fighter's tuple)
+    :param payload: integer, string or list describing the work item
+    :return: string with key
+    """
+    return f'{kind}:{json.dumps(payload)}'
+
+
+class RetryQueue(object):
+    """RetryQueue class - append-only dead-letter file with fighters waiting for a retry.
+    """
+
+    def __init__(self, path):
+        """
+        Initializes a RetryQueue instance, entries are replayed from path if the file exists.
+        :param path: string with path to json lines file
+        """
+        self.path = path
+        self.lock = threading.Lock()  # failures are recorded from scraping threads.
+        self.entries = {}  # dictionary: work key -> latest failure record of items which are not resolved
+        if os.path.exists(path):
+            self.load()
+
+    def _append(self, record):
+        """
+        Supporting method appending one record to the file.
+        :param record: dictionary with the record
+        :return: None
+        """
+        with open(self.path, 'a', encoding='utf-8') as queue_file:
+            queue_file.write(json.dumps(record) + '\n')
+
+    def record_failure(self, kind, payload, reason, attempts=1):
+        """
+        Records failed work item, attempt count is added to attempts made in earlier runs.
+        :param kind: string with either 'index', 'page' or 'search'
+        :param payload: integer with fighter's index, string with fighter's page, or list with fighter's tuple
+        :param reason: string describing the failure
+        :param attempts: integer with number of attempts made in this run
+        :return: dictionary with the record
+        """
+        key = work_key(kind, payload)
+        with self.lock:
+            previous = self.entries.get(key)
+            record = {'key': key, 'kind': kind, 'payload': payload, 'reason': reason,
+                      'attempts': attempts + (previous['attempts'] if previous else 0), 'failedAt': int(time.time())}
+            self.entries[key] = record
+            self._append(record)
+        return record
+
+    def resolve(self, kind, payload):
+        """
+        Marks work item as done, so it is not retried anymore.
+        :param kind: string with either 'index', 'page' or 'search'
+        :param payload: integer, string or list describing the work item
+        :return: None
+        """
+        key = work_key(kind, payload)
+        with self.lock:
+            if self.entries.pop(key, None) is not None:
+                self._append({'key': key, 'resolved': True, 'resolvedAt': int(time.time())})
+
+    def pending(self, max_attempts=None):
+        """
+        Lists work items waiting for a retry, oldest failures first.
+        :param max_attempts: optional - integer, items which already failed that many times are left out
+        :return: list of failure records
+        """
+        with self.lock:
+            records = sorted(self.entries.values(), key=lambda record: record['failedAt'])
+        return [record for record in records if max_attempts is None or record['attempts'] < max_attempts]
+
+    def load(self):
+        """
+        Replays records from self.path - the latest record of every item wins, resolved items are dropped.
+        :return: None
+        """
+        self.entries = {}
+        with open(self.path, encoding='utf-8') as queue_file:
+            for line in queue_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:  # line cut short by a crash.
+                    continue
+                if record.get('resolved'):
+                    self.entries.pop(record['key'], None)
+                else:
+                    self.entries[record['key']] = record
+
+    def compact(self):
+        """
+        Rewrites the file with pending items only, file is replaced atomically.
+        :return: None
+        """
+        temporary_path = f'{self.path}.tmp'
+        with self.lock:
+            with open(temporary_path, 'w', encoding='utf-8') as queue_file:
+                for record in self.entries.values():
+                    queue_file.write(json.dumps(record) + '\n')
+            os.replace(temporary_path, self.path)
+
+
+if __name__ == '__main__':
+    for entry in RetryQueue(sys.argv[1]).pending():
+        print(f"{entry['attempts']:3} {entry['kind']:<7} {entry['payload']}  - {entry['reason']}")
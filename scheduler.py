@@ -0,0 +1,134 @@
+# Python 3.7
+# appendix to sherdog-parser.py
+# Created by - Montanaz0r (https://github.com/Montanaz0r)
+# Freshness-priority recrawl scheduler. Active fighters' records change after every event while retired fighters
+# never change, so instead of recrawling everybody the scheduler ranks fighters from previous output by how likely
+# their profile has changed and spends a fixed request budget on the highest ranked ones first.
+#
+# priority = activity * roster * staleness
+#   activity  - decays with days since fighter's last fight (fighters inactive for years rarely come back)
+#   roster    - fighters on current UFC roster fight regularly and matter the most
+#   staleness - grows with days since fighter's page was last scraped, so everybody is refreshed eventually
+#
+# Usage: python scheduler.py sherdog.json 500 [ufc-roster.csv]
+
+import csv
+import heapq
+import json
+import math
+import sys
+import time
+
+import normalize
+from compressed_io import open_input
+
+ACTIVITY_DECAY_DAYS = 365  # activity drops to ~37% a year after the last fight.
+STALENESS_DAYS = 30  # staleness reaches ~63% a month after the last scrape.
+ROSTER_WEIGHT = 3.0  # multiplier for fighters on current UFC roster.
+UNKNOWN_ACTIVITY = 0.5  # activity used when fighter has no dated fights.
+NEVER_SCRAPED_DAYS = 10 * 365  # days since scrape assumed when timestamp is missing.
+
+
+def _fighter_page(url):
+    """
+    Converts fighter's url to page accepted by Fighter._set_url_from_selector.
+    :param url: string with fighter's url
+    :return: string with page, for instance '/fighter/Jon-Jones-27944'
+    """
+    return url.split('sherdog.com')[-1]
+
+
+def load_fighter_states(filename):
+    """
+    Collects state of every fighter found in previous output of sherdog-parser.py.
+    :param filename: string with path to .csv or .json file (optionally compressed), produced with fighter urls -
+                     json output of scrape_all_fighters keys fighters by name without urls, so it raises ValueError
+    :return: dictionary url -> {'name': str, 'last_event_day': int or None, 'scraped_at': int or None}
+    """
+    states = {}
+
+    def update(url, name, event_day, scraped_at):
+        state = states.setdefault(url, {'name': name, 'last_event_day': None, 'scraped_at': None})
+        if event_day is not None and (state['last_event_day'] is None or event_day > state['last_event_day']):
+            state['last_event_day'] = event_day
+        if scraped_at is not None and (state['scraped_at'] is None or scraped_at > state['scraped_at']):
+            state['scraped_at'] = scraped_at
+
+    if '.json' in filename:
+        with open_input(filename, encoding='utf-8') as fighter_json:
+            data = json.load(fighter_json)
+        if 'fighters' not in data:
+            raise ValueError(f'{filename} keys fighters by name ({{name: [...]}} json of scrape_all_fighters) and '
+                             f'has no fighter urls, please use csv output or json of scrape_list_of_fighters!')
+        for fighter in data['fighters']:
+            url = fighter.get('fighterUrl')
+            if not url:
+                continue
+            update(url, fighter.get('name'), None, fighter.get('scrapedAt'))
+            for fight in fighter.get('fightHistoryPro', []):
+                event_day = fight.get('dateDay')
+                if event_day is None:
+                    event_day = normalize.parse_event_date(fight.get('date'))
+                update(url, fighter.get('name'), event_day, None)
+    else:
+        with open_input(filename, newline='', encoding="ISO-8859-1") as csvfile:
+            for row in csv.reader(csvfile, delimiter=';'):
+                if len(row) < 14 or not row[12] or row[0].startswith('Fighter'):  # rows without fighter url.
+                    continue
+                scraped_at = int(row[13]) if row[13].isdigit() else None
+                update(row[12], row[0], normalize.parse_event_date(row[4]), scraped_at)
+    return states
+
+
+def recrawl_priority(state, roster_names=(), now=None):
+    """
+    Estimates how likely fighter's profile has changed since it was last scraped.
+    :param state: dictionary returned for a fighter by load_fighter_states
+    :param roster_names: set of lowercase names of fighters on current UFC roster
+    :param now: optional - unix time used as current time
+    :return: float with priority, higher means recrawl sooner
+    """
+    now = time.time() if now is None else now
+    today = int(now // 86400)
+    if state['last_event_day'] is None:
+        activity = UNKNOWN_ACTIVITY
+    else:
+        activity = math.exp(-max(today - state['last_event_day'], 0) / ACTIVITY_DECAY_DAYS)
+    roster = ROSTER_WEIGHT if (state['name'] or '').lower() in roster_names else 1.0
+    if state['scraped_at'] is None:
+        days_since_scrape = NEVER_SCRAPED_DAYS
+    else:
+        days_since_scrape = max(now - state['scraped_at'], 0) / 86400
+    staleness = 1 - math.exp(-days_since_scrape / STALENESS_DAYS)
+    return activity * roster * staleness
+
+
+def plan_recrawl(states, budget, roster_names=(), now=None):
+    """
+    Chooses fighters to recrawl within request budget.
+    :param states: dictionary returned by load_fighter_states
+    :param budget: integer with number of profiles that may be requested in this run
+    :param roster_names: iterable with names of fighters on current UFC roster
+    :param now: optional - unix time used as current time
+    :return: list of tuples (priority, fighter page) sorted from the highest priority
+    """
+    roster_names = {name.lower() for name in roster_names}
+    ranked = ((recrawl_priority(state, roster_names, now), _fighter_page(url)) for url, state in states.items())
+    return heapq.nlargest(budget, ranked)
+
+
+def read_roster_names(filename):
+    """
+    Reads fighter names from csv file made by scrape_ufc_roster.
+    :param filename: string with path to csv file, compressed files are recognized by suffix (.gz / .zst)
+    :return: list of names
+    """
+    with open_input(filename, newline='', encoding="ISO-8859-1") as csvfile:
+        return [row[0] for row in csv.reader(csvfile) if row and not row[0].startswith('Name')]
+
+
+if __name__ == '__main__':
+    fighter_states = load_fighter_states(sys.argv[1])
+    roster = read_roster_names(sys.argv[3]) if len(sys.argv) > 3 else ()
+    for priority, page in plan_recrawl(fighter_states, int(sys.argv[2]), roster):
+        print(f'{priority:.4f} {page}')
@@ -3,29 +3,240 @@
 # please get familiar with readme file before using!
 # Created by - Montanaz0r (https://github.com/Montanaz0r)
 
-from bs4 import BeautifulSoup
-import requests
+# bs4, requests and googlesearch, as well as helper modules of optional features (sqlite coordinator & record cache,
+# offset index, gym table, profiling, sink threads), are imported inside functions that use them, so that importing
+# this file or running it with --help stays fast. Small helper modules needed by every crawl (normalize,
+# compressed_io, id_bitmap, scheduler, retry_queue, sinks' csv headers, single_flight) import only the standard
+# library and are imported right below.
+import argparse
+import collections
 import csv
 import logging
 import json
 import time
 import concurrent.futures
-from googlesearch import search
+import codecs
+import contextlib
+import os
+import threading
+from html.parser import HTMLParser
+import normalize
+from compressed_io import (open_input, open_output, open_replacement, output_path, compression_from_path,
+                           BufferedAppender, COMPRESSIONS)
+from id_bitmap import IdBitmap, probe_upper_bound, UNKNOWN, VALID
+from scheduler import load_fighter_states, plan_recrawl, read_roster_names
+from retry_queue import RetryQueue, TransientError, retry_with_backoff, RETRY_STATUS_CODES, TRANSIENT_ERRORS
+from sinks import CSV_HEADERS
+from single_flight import SingleFlight
 
-# Initializes logging file.
-logging.basicConfig(filename='sherdog.log', level=logging.INFO, format='%(asctime)s:%(levelname)s:%(message)s')
 allfighters = {'fighters' : []}
-missedFighters = ()
 number_of_failed_searches = 0
+failed_searches_lock = threading.Lock()
 MAX_THREADS = 30
+BITMAP_SAVE_EVERY = 500  # ids scraped between full saves of the id bitmap file, ids are journaled in between.
 user_agent = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_12_1) AppleWebKit/602.2.14 (KHTML, like Gecko) Version/10.0.1 Safari/602.2.14'
 since_last_google_rq = 0.0
+STREAM_CHUNK_SIZE = 16384  # bytes read at once while streaming fighter's profile.
+ACCEPT_ENCODING = 'gzip, deflate'  # compressed transfer requested on every fetch.
+LOG_FILE = 'sherdog.log'
+PARSER_VERSION = 1  # bump whenever extraction logic changes, records cached by older parser are then not used.
+transfer_stats = {'compressed': 0, 'uncompressed': 0}  # number of responses sent with and without compression.
+transfer_lock = threading.Lock()
+request_flights = SingleFlight()  # coalesces concurrent downloads of the same url (see fetch_once).
+
+# Outcome of scraping one fighter from a list: position in the list, input tuple, resolved profile url, number of
+# fightfinder searches sent, status ('scraped', 'empty', 'invalid', 'not_found', 'ambiguous', 'unknown_weight_class' or
+# 'error'), seconds spent on searching and on scraping the profile, and error message if status is 'error'.
+FighterOutcome = collections.namedtuple('FighterOutcome', ['position', 'fighter', 'url', 'hops', 'status',
+                                                           'search_seconds', 'scrape_seconds', 'error'])
+output_lock = threading.Lock()  # serializes appends to output files shared by scraping threads.
+buffered_outputs = {}  # path -> BufferedAppender collecting rows of compressed csv output (see flush_outputs).
+profiler = None  # ScrapeProfiler instance when profiling mode is enabled (see enable_profiling).
+
+
+def count_failed_search(delta=1):
+    """
+    Thread-safe update of number_of_failed_searches counter.
+    :param delta: integer added to the counter
+    :return: None
+    """
+    global number_of_failed_searches
+    with failed_searches_lock:
+        number_of_failed_searches += delta
+
+
+def _buffered_output(path, compression):
+    """
+    Supporting function giving BufferedAppender which collects rows of compressed csv output, called under output_lock.
+    :param path: string with path to csv file
+    :param compression: string with either 'gzip' or 'zstd'
+    :return: BufferedAppender instance
+    """
+    if path not in buffered_outputs:
+        buffered_outputs[path] = BufferedAppender(path, compression, encoding="ISO-8859-1")
+    return buffered_outputs[path]
+
+
+def flush_outputs():
+    """
+    Writes rows collected for compressed csv outputs (see Fighter._write_csv_rows), called at the end of every run.
+    :return: None
+    """
+    with output_lock:
+        for appender in buffered_outputs.values():
+            appender.close()
+        buffered_outputs.clear()
+
+
+def outputs_waiting():
+    """
+    Checks if rows collected for compressed csv outputs are waiting to be written.
+    :return: boolean value
+    """
+    with output_lock:
+        return any(appender.size for appender in buffered_outputs.values())
+
+
+def setup_logging(filename=LOG_FILE):
+    """
+    Initializes logging file, called by command-line entry point (or manually when functions are used from code).
+    :param filename: string with path to log file
+    :return: None
+    """
+    logging.basicConfig(filename=filename, level=logging.INFO, format='%(asctime)s:%(levelname)s:%(message)s')
+
+
+def enable_profiling(report_path, slowest=20):
+    """
+    Turns on profiling mode - every scraped fighter and every fightfinder search is profiled with cProfile and
+    tracemalloc until write_profile_report is called.
+    :param report_path: string with path to text file where report will be written
+    :param slowest: integer with number of slowest fighters listed in the report
+    :return: ScrapeProfiler instance
+    """
+    from profiling import ScrapeProfiler
+    global profiler
+    profiler = ScrapeProfiler(report_path, slowest)
+    return profiler
+
+
+def write_profile_report():
+    """
+    Writes report of profiling mode and turns it off.
+    :return: string with path to the report, or None if profiling mode was not enabled
+    """
+    global profiler
+    if profiler is None:
+        return None
+    report_path = profiler.write_report()
+    profiler.close()
+    profiler = None
+    print(f'Profiling report saved to {report_path}')
+    logging.info(f'Profiling report saved to {report_path}')
+    return report_path
+
+
+def fetch(url, stream=False):
+    """
+    Sends GET request asking for compressed transfer and records whether the server has actually compressed the response.
+    :param url: string with url
+    :param stream: boolean, if True response body is not downloaded upfront
+    :return: response object, TransientError is raised for 429 and 5xx responses
+    """
+    import requests
+    resource = requests.get(url, headers={'Accept-Encoding': ACCEPT_ENCODING}, stream=stream)
+    if resource.status_code in RETRY_STATUS_CODES:  # throttled or server error, page would look like an empty profile.
+        resource.close()
+        raise TransientError(f'{url} answered with status {resource.status_code}')
+    compressed = resource.headers.get('Content-Encoding', '').lower() in ('gzip', 'deflate', 'br', 'zstd')
+    with transfer_lock:
+        transfer_stats['compressed' if compressed else 'uncompressed'] += 1
+    if not compressed:
+        logging.info(f'Response for {url} was sent without compression!')
+    return resource
+
+
+def fetch_once(url, load):
+    """
+    Downloads and parses url with load, concurrent calls for the same url are coalesced - threads asking for url which
+    is already being loaded wait for that load and share its result (or exception) instead of fetching it again.
+    :param url: string with url
+    :param load: function taking url, which downloads and parses it
+    :return: value returned by load
+    """
+    return request_flights.do(url, lambda: load(url))
+
+
+def report_transfer():
+    """
+    Prints and logs how many responses were transferred with compression and how many requests were saved by
+    coalescing duplicate fetches.
+    :return: dictionary with 'compressed', 'uncompressed' and 'coalesced' counts
+    """
+    with transfer_lock:
+        stats = dict(transfer_stats)
+    stats['coalesced'] = request_flights.stats()['saved']
+    message = f"Compressed transfer: {stats['compressed']} responses, uncompressed: {stats['uncompressed']} responses."
+    print(message)
+    logging.info(message)
+    message = f"Coalesced fetches: {stats['coalesced']} duplicate requests saved."
+    print(message)
+    logging.info(message)
+    return stats
+
+
+class ProfileStreamParser(HTMLParser):
+    """ProfileStreamParser class - incremental parser fed with chunks of fighter's profile as they arrive, it only
+    watches div nesting to tell when 'Fight History - Pro' module has been closed.
+    """
+
+    def __init__(self):
+        """
+        Initializes a ProfileStreamParser instance.
+        """
+        super().__init__(convert_charrefs=True)
+        self.depth = 0  # int: current depth of nested div tags
+        self.history_depth = None  # int: depth of currently open fight_history module, None outside of it
+        self.heading = None  # list of str: text of h2 heading of fight_history module while it is being read
+        self.is_pro = False  # boolean: True if currently open fight_history module is the pro one
+        self.complete = False  # boolean: True once pro fight history module is closed
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'div':
+            self.depth += 1
+            classes = (dict(attrs).get('class') or '').split()
+            if self.history_depth is None and 'fight_history' in classes:
+                self.history_depth = self.depth
+        elif tag == 'h2' and self.history_depth is not None:
+            self.heading = []
+
+    def handle_endtag(self, tag):
+        if tag == 'div':
+            if self.history_depth == self.depth:
+                self.complete = self.complete or self.is_pro
+                self.history_depth = None
+                self.is_pro = False
+            self.depth -= 1
+        elif tag == 'h2' and self.heading is not None:
+            self.is_pro = ''.join(self.heading).strip() == 'Fight History - Pro'
+            self.heading = None
+
+    def handle_data(self, data):
+        if self.heading is not None:  # text may come in several pieces when heading is split between chunks.
+            self.heading.append(data)
 
 
 class Fighter(object):
     """Fighter class - creating fighter instance based on fighter's Sherdog profile.
     """
 
+    # fields extracted from the profile, stored in record cache (see record_cache.py).
+    CACHED_FIELDS = ('name', 'nickName', 'gender', 'birth_date', 'height', 'weight', 'locality', 'nationality',
+                     'weight_class', 'wins', 'losses', 'draws', 'no_contests', 'association_names', 'association_urls',
+                     'result_data', 'opponents', 'opponent_urls', 'events', 'event_urls', 'events_date', 'method',
+                     'judges', 'rounds', 'time', 'birth_day', 'height_cm', 'weight_kg', 'events_day', 'rounds_number',
+                     'fight_seconds')
+
     def __init__(self):
         """
         Initializes a Fighter instance.
@@ -45,9 +256,12 @@ class Fighter(object):
         self.draws = 0  # default is 0, not None because of the site layout being dynamic
         self.no_contests = 0 # default is 0, not None because of the site layout being dynamic
         self.resource = None  # setting up resource based on url, None by default
+        self.html = None  # str: part of fighter's page read while streaming, None by default
         self.soup = None  # creating BeautifulSoup object, None by default
         self.pro_range = None  # selector: selecting range to pro fights exclusively, None by default
         self.validation = False  # boolean: confirms if scraped data for fighter instance is validated, False by default
+        self.scraped_at = None  # int: unix time when fighter's page was downloaded, None by default
+        self.saved = False  # boolean: True once fighter's data was written to output, False by default
 
 
         self.association_names = None
@@ -66,6 +280,15 @@ class Fighter(object):
         self.rounds = None  # list of str: rounds in which fights have ended
         self.time = None  # list of str: exact point of time in the round where fights have ended
 
+        # Numeric values normalized at parse time, emitted alongside raw strings.
+
+        self.birth_day = None  # int: birth date as days since 1970-01-01
+        self.height_cm = None  # float: height in centimeters
+        self.weight_kg = None  # float: weight in kilograms
+        self.events_day = None  # list of int: events date as days since 1970-01-01
+        self.rounds_number = None  # list of int: rounds in which fights have ended
+        self.fight_seconds = None  # list of int: total fight duration in seconds
+
     def _set_url_from_index(self, fighter_index):
         """
         Sets up url for fighter's instance.
@@ -84,22 +307,74 @@ class Fighter(object):
 
     def _set_resource(self):
         """
-        Sets up response object based on self.url value.
+        Sets up response object based on self.url value. Profile body is streamed and fed to ProfileStreamParser,
+        reading stops as soon as pro fight history module is complete, since nothing below it is scraped.
         :return: response object
         """
-        resource = requests.get(self.url)
+        resource = fetch(self.url, stream=True)
+        watcher = ProfileStreamParser()
+        decoder = codecs.getincrementaldecoder(resource.encoding or 'utf-8')(errors='replace')
+        html = []
+        try:
+            for chunk in resource.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                text = decoder.decode(chunk)
+                html.append(text)
+                watcher.feed(text)
+                if watcher.complete:
+                    break
+            else:
+                html.append(decoder.decode(b'', final=True))
+        finally:
+            resource.close()  # unread part of the body is dropped together with the connection.
         self.resource = resource
+        self.html = ''.join(html)
         return resource
 
     def _set_soup(self):
         """
-        Sets up soup for Fighter's instance using data provided in self.resource.
+        Sets up soup for Fighter's instance using html read in self._set_resource (or data provided in self.resource).
         :return: BeautifulSoup instance
         """
-        soup = BeautifulSoup(self.resource.text, features='html.parser')
+        from bs4 import BeautifulSoup
+        html = self.html if self.html is not None else self.resource.text
+        soup = BeautifulSoup(html, features='html.parser')
         self.soup = soup
         return soup
 
+    def _load_page(self, records=None):
+        """
+        Downloads and parses self.url (see self._set_resource and self._set_soup). Concurrent loads of the same page,
+        for instance a duplicated roster entry, share one download and one parse.
+        :param records: optional - RecordCache instance, page is not parsed if it holds record of the same html
+        :return: dictionary with cached fields of the page, or None if page was parsed into self.soup
+        """
+        def load(url):
+            self._set_resource()
+            fields = records.get(url, self.html) if records is not None else None
+            if fields is None:
+                self._set_soup()
+            return self.resource, self.html, self.soup, fields
+
+        self.resource, self.html, self.soup, fields = fetch_once(self.url, load)
+        return fields
+
+    def _cached_fields(self):
+        """
+        Supporting method collecting extracted fields for record cache.
+        :return: dictionary with values of CACHED_FIELDS
+        """
+        return {field: getattr(self, field) for field in self.CACHED_FIELDS}
+
+    def _restore_fields(self, fields):
+        """
+        Supporting method setting fields restored from record cache, gender given by the caller is kept.
+        :param fields: dictionary with values of CACHED_FIELDS
+        :return: None
+        """
+        for field in self.CACHED_FIELDS:
+            if field in fields and not (field == 'gender' and self.gender is not None):
+                setattr(self, field, fields[field])
+
     def set_pro_fights(self):
         """
         Sets up range of pro fights for Fighter instance with html code scraped from the site.
@@ -392,6 +667,23 @@ class Fighter(object):
             self.time = time
             return time
 
+    def normalize_fields(self):
+        """
+        Converts scraped strings into numeric values: dates into epoch days, rounds into integers, round & time into
+        total fight seconds, height and weight into cm and kg. Values that could not be parsed are set to None.
+        :return: None
+        """
+        self.birth_day = normalize.parse_birth_date(self.birth_date)
+        self.height_cm = normalize.parse_height(self.height)
+        self.weight_kg = normalize.parse_weight(self.weight)
+        if self.events_date is not None:
+            self.events_day = [normalize.parse_event_date(date) for date in self.events_date]
+        if self.rounds is not None:
+            self.rounds_number = [normalize.parse_round(rounds) for rounds in self.rounds]
+            if self.time is not None:
+                self.fight_seconds = [normalize.parse_fight_seconds(rounds, time)
+                                      for rounds, time in zip(self.rounds, self.time)]
+
     def get_validation(self):
         """
         Making validation by comparing collected data, checking if length of all information matches number of fights
@@ -420,13 +712,50 @@ class Fighter(object):
         else:
             return False
 
-    def save_to_csv(self, filename):
+    def _normalized_fight(self, index):
+        """
+        Supporting method returning normalized values for a single fight.
+        :param index: integer with index of the fight
+        :return: tuple (event day, round number, total fight seconds), None for values that are missing
+        """
+        normalized = []
+        for values in (self.events_day, self.rounds_number, self.fight_seconds):
+            try:
+                normalized.append(values[index])
+            except (IndexError, TypeError):
+                normalized.append(None)
+        return tuple(normalized)
+
+    def save_to_csv(self, filename, compression=None, index=None):
         """
         Writing all collected information regarding fighter instance to csv file.
         :param filename: string with name of the file we want to save data to; file will be created with given name
+        :param compression: optional - string with either 'gzip' or 'zstd', None (default) for plain file
+        :param index: optional - OffsetIndex instance where byte range of written rows is recorded (plain files only)
+        :return: None
+        """
+        path = output_path(filename, 'csv', compression)
+        with output_lock:
+            offset = os.path.getsize(path) if index is not None and os.path.exists(path) else 0
+            self._write_csv_rows(path, compression)
+            if index is not None:
+                index.add(self.url, self.name, offset, os.path.getsize(path) - offset)
+                index.commit()
+        print(f'CSV file was successfully overwritten for {self.name}!')
+
+    def _write_csv_rows(self, path, compression=None):
+        """
+        Supporting method appending rows of all pro fights of fighter instance to csv file. Rows of compressed file
+        are collected in buffered_outputs, so that many fighters share one gzip member / zstd frame.
+        :param path: string with path to csv file
+        :param compression: optional - string with either 'gzip' or 'zstd', None (default) for plain file
         :return: None
         """
-        with open(f'{filename}.csv', 'a', newline='', encoding="ISO-8859-1") as csvfile:
+        if compression is None:
+            output = open_output(path, 'a', encoding="ISO-8859-1", newline='')
+        else:
+            output = contextlib.nullcontext(_buffered_output(path, compression))
+        with output as csvfile:
             writer = csv.writer(csvfile, delimiter=';')
             for index in range(len(self.result_data)):
                 try:
@@ -461,16 +790,20 @@ class Fighter(object):
                     time = self.time[index]
                 except IndexError:
                     time = 'NA'
+                event_day, round_number, fight_seconds = self._normalized_fight(index)
                 try:
-                    writer.writerow([self.name, opp, result, event, event_date, method, judges, rounds, time])
+                    writer.writerow([self.name, opp, result, event, event_date, method, judges, rounds, time,
+                                     event_day, round_number, fight_seconds, self.url, self.scraped_at])
                 except UnicodeEncodeError:
                     print(f'Coding error while attempting to save date for {self.name}, line was dropped!')
-            print(f'CSV file was successfully overwritten for {self.name}!')
+            if compression is not None:
+                csvfile.end_record()
 
-    def save_to_json(self, filename):
+    def save_to_json(self, filename, compression=None):
         """
         Writing all collected information regarding fighter instance to json file.
         :param filename: string with name of the file we want to save data to; file will be created with given name
+        :param compression: optional - string with either 'gzip' or 'zstd', None (default) for plain file
         :return: None
         """
         fighter_dictionary = {self.name: []}  # initializing dictionary that will be passed into json file.
@@ -515,38 +848,58 @@ class Fighter(object):
                 time = self.time[index]
             except IndexError:
                 time = 'NA'
+            event_day, round_number, fight_seconds = self._normalized_fight(index)
             line = {'opponent': opp, 'result': result, 'event': event, 'date': event_date, 'method': method,
-                    'judge': judges, 'round': rounds, 'time': time}
+                    'judge': judges, 'round': rounds, 'time': time, 'dateDay': event_day, 'roundNumber': round_number,
+                    'fightSeconds': fight_seconds}
             fighter_dictionary[self.name].append(line)
             #fighter_dictionary['fightHistoryPro'].append(line)
 
         #fighters_dict['fighters'].append(fighter_dictionary)
 
-        with open(f'{filename}.json') as fighter_json:
-            data = json.load(fighter_json)
-        data.update(fighter_dictionary)
-        #data.update(fighters_dict)
-        with open(f'{filename}.json', 'w', encoding="utf-8") as fighter_json:
-            json.dump(data, fighter_json, indent=4)
+        with output_lock:
+            with open_input(output_path(filename, 'json', compression), compression) as fighter_json:
+                data = json.load(fighter_json)
+            data.update(fighter_dictionary)
+            #data.update(fighters_dict)
+            # file is replaced atomically, a crash while it is rewritten must not destroy fighters saved earlier.
+            with open_replacement(output_path(filename, 'json', compression), compression,
+                                  encoding="utf-8") as fighter_json:
+                json.dump(data, fighter_json, indent=4)
         print(f'JSON file was successfully overwritten for {self.name}!')
     
-    def save_data(self):
+    def save_data(self, gym_ids=None):
         """
         Writing all collected information regarding fighter instance to json file.
         :param filename: string with name of the file we want to save data to; file will be created with given name
+        :param gym_ids: optional - list of ids of fighter's gyms in GymTable, saved instead of full associations
         :return: None
         """
+        allfighters['fighters'].append(self.to_record(gym_ids))
+        print(f'Added {self.name} to fighter list')
+
+    def to_record(self, gym_ids=None):
+        """
+        Collects all information regarding fighter instance into dictionary, the same one save_data writes to json file
+        and sinks (see sinks.py) receive.
+        :param gym_ids: optional - list of ids of fighter's gyms in GymTable, stored instead of full associations
+        :return: dictionary with fighter's data
+        """
         #fighter_dictionary = {self.name: []}  # initializing dictionary that will be passed into json file.
         #fighters_dict = {'fighters' : []}
         fighter_dictionary = {}
 
         fighter_dictionary['fighterUrl'] = self.url
+        fighter_dictionary['scrapedAt'] = self.scraped_at
         fighter_dictionary['name'] = self.name
         fighter_dictionary['nickName'] = self.nickName
         fighter_dictionary['gender'] = self.gender
         fighter_dictionary['birthDate'] = self.birth_date
+        fighter_dictionary['birthDay'] = self.birth_day
         fighter_dictionary['height'] = self.height
+        fighter_dictionary['heightCm'] = self.height_cm
         fighter_dictionary['weight'] = self.weight
+        fighter_dictionary['weightKg'] = self.weight_kg
         fighter_dictionary['locality'] = self.locality
         fighter_dictionary['nationality'] = self.nationality
         fighter_dictionary['weightClass'] = self.weight_class
@@ -554,10 +907,13 @@ class Fighter(object):
         fighter_dictionary['losses'] = self.losses
         fighter_dictionary['draws'] = self.draws
         fighter_dictionary['noContests'] = self.no_contests
-        fighter_dictionary['associations'] = []
+        if gym_ids is None:
+            fighter_dictionary['associations'] = []
+        else:
+            fighter_dictionary['gymIds'] = gym_ids
         fighter_dictionary['fightHistoryPro'] = []
 
-        for association_index in range(len(self.association_names)):
+        for association_index in range(len(self.association_names) if gym_ids is None else 0):
             try:
                 association_name = self.association_names[association_index]
             except IndexError:
@@ -611,21 +967,46 @@ class Fighter(object):
                 time = self.time[index]
             except IndexError:
                 time = 'NA'
+            event_day, round_number, fight_seconds = self._normalized_fight(index)
             line = {'opponent': opp, 'opponentUrl' : opponent_url, 'result': result, 'event': event, 'eventUrl' : event_url, 'date': event_date, 'method': method,
-                    'judge': judges, 'round': rounds, 'time': time}
+                    'judge': judges, 'round': rounds, 'time': time, 'dateDay': event_day, 'roundNumber': round_number,
+                    'fightSeconds': fight_seconds}
             #fighter_dictionary[self.name].append(line)
             fighter_dictionary['fightHistoryPro'].append(line)
 
         #fighters_dict['fighters'].append(fighter_dictionary)
-        allfighters['fighters'].append(fighter_dictionary)
-        print(f'Added {self.name} to fighter list')
+        return fighter_dictionary
 
-    def scrape_fighter(self, filetype, filename, fighter_index=None, fighter_page=None):
+    def scrape_fighter(self, filetype, filename, fighter_index=None, fighter_page=None, compression=None, index=None,
+                       gyms=None, sinks=None, records=None):
         """
         :param filetype: string with either 'csv' or 'json' as a type of file where results will be stored.
         :param filename: string with name of the file we want to save data to; file will be created with given name
         :param fighter_index: optional - integer with fighter's index, or None
         :param fighter_page: optional - css selector match with fighter's page, or None
+        :param compression: optional - string with either 'gzip' or 'zstd', None (default) for plain file
+        :param index: optional - OffsetIndex instance updated with byte range of fighter's csv rows
+        :param gyms: optional - GymTable instance where fighter's gyms are registered, json output then references
+                     gyms by id
+        :param sinks: optional - FanOut instance (see sinks.py) receiving fighter's record next to the output file
+        :param records: optional - RecordCache instance (see record_cache.py), unchanged pages are restored from it
+                        instead of being parsed, newly parsed pages are stored there
+        :return: True for valid fighter's page and False if page was empty
+        """
+        if profiler is None:
+            return self._scrape_fighter(filetype, filename, fighter_index, fighter_page, compression, index, gyms,
+                                        sinks, records)
+        with profiler.profile('fighter') as record:
+            try:
+                return self._scrape_fighter(filetype, filename, fighter_index, fighter_page, compression, index, gyms,
+                                            sinks, records)
+            finally:
+                record['label'], record['url'] = self.name, self.url
+
+    def _scrape_fighter(self, filetype, filename, fighter_index, fighter_page, compression, index, gyms, sinks,
+                        records):
+        """
+        Supporting method doing the actual work of scrape_fighter.
         :return: True for valid fighter's page and False if page was empty
         """
         if fighter_index is not None:
@@ -634,9 +1015,12 @@ class Fighter(object):
             self._set_url_from_selector(fighter_page)
         else:
             print("Error, please pass fighter's index, or fighter's page in order to proceed.")
-        self._set_resource()
-        self._set_soup()
-        if self.set_name() != AttributeError:  # checking if there is existing name for a fighter instance.
+        fields = self._load_page(records)
+        self.scraped_at = int(time.time())
+        if fields is not None:
+            self._restore_fields(fields)  # page has not changed since it was parsed, no need to parse it again.
+            records.touch(self.url, self.scraped_at)
+        elif self.set_name() != AttributeError:  # checking if there is existing name for a fighter instance.
             self.set_nick_name()
             self.set_birth_date()
             self.set_height()
@@ -656,63 +1040,334 @@ class Fighter(object):
             self.grab_method()
             self.grab_rounds()
             self.grab_time()
-            
-            if self.get_validation() != TypeError:  # if there was an empty list while validating data, fighter instance will be dropped.
-                if filetype == 'csv':
-                    self.save_to_csv(filename)
-                elif filetype == 'json':
-                    if(fighter_index):
-                        self.save_to_json(filename)
-                    else:
-                        self.save_data()
-            return True
+            self.normalize_fields()
+            if records is not None:
+                records.put(self.url, self.html, self._cached_fields(), self.scraped_at)
         else:
             return False
+        self.save_extracted(filetype, filename, fighter_index, compression, index, gyms, sinks)
+        return True
+
+    def save_extracted(self, filetype, filename, fighter_index=None, compression=None, index=None, gyms=None,
+                       sinks=None):
+        """
+        Validates extracted data and writes it to output file (and gym table & sinks), used for freshly parsed pages
+        as well as for records restored from record cache.
+        :param filetype: string with either 'csv' or 'json' as a type of file where results will be stored.
+        :param filename: string with name of the file we want to save data to
+        :param fighter_index: optional - integer with fighter's index, json output then uses save_to_json layout
+        :param compression: optional - string with either 'gzip' or 'zstd', None (default) for plain file
+        :param index: optional - OffsetIndex instance updated with byte range of fighter's csv rows
+        :param gyms: optional - GymTable instance where fighter's gyms are registered
+        :param sinks: optional - FanOut instance (see sinks.py) receiving fighter's record
+        :return: True if data passed validation and was saved, False otherwise
+        """
+        if self.get_validation() != TypeError:  # if there was an empty list while validating data, fighter instance will be dropped.
+            gym_ids = None
+            if gyms is not None:
+                gym_ids = gyms.register_fighter(self.association_names, self.association_urls, self.url)
+            if filetype == 'csv':
+                self.save_to_csv(filename, compression, index)
+            elif filetype == 'json':
+                if(fighter_index):
+                    self.save_to_json(filename, compression)
+                else:
+                    self.save_data(gym_ids)
+            if sinks is not None:
+                sinks.emit(self.to_record(gym_ids))
+            self.saved = True
+        return self.saved
 
 # END OF FIGHTER CLASS
 
 
-def scrape_all_fighters(filename, filetype='csv'):
+def is_valid_fighter_index(fighter_index, bitmap=None):
+    """
+    Checks if there is a fighter's profile under given index without saving any data, answer is cached in bitmap.
+    :param fighter_index: integer with fighter's index
+    :param bitmap: optional - IdBitmap instance
+    :return: boolean value
+    """
+    if bitmap is not None and bitmap.get(fighter_index) != UNKNOWN:
+        return bitmap.get(fighter_index) == VALID
+    F = Fighter()
+    F._set_url_from_index(fighter_index)
+    retry_with_backoff(F._load_page)
+    valid = F.set_name() != AttributeError
+    if bitmap is not None:
+        if valid:
+            bitmap.mark_valid(fighter_index)
+        else:
+            bitmap.mark_empty(fighter_index)
+    return valid
+
+
+def scrape_with_retry(retry_queue, work, filetype, filename, fighter_index=None, fighter_page=None, **scrape_kwargs):
+    """
+    Scrapes one fighter, transient errors are retried with exponential backoff. Fighters which still fail are recorded
+    in retry queue, any other outcome resolves the work item - data which did not pass validation is saved (or
+    dropped) as usual and would be the same on a retry, so the fighter is never both saved and queued.
+    :param retry_queue: RetryQueue instance, or None
+    :param work: tuple (kind, payload) identifying work item in retry queue, for instance ('index', 15)
+    :param filetype: string with either 'csv' or 'json' as a type of file where results will be stored
+    :param filename: string with name of the file we want to save data to
+    :param fighter_index: optional - integer with fighter's index, or None
+    :param fighter_page: optional - string with fighter's page, or None
+    :param scrape_kwargs: other keyword arguments of Fighter.scrape_fighter (compression, index, gyms, sinks, records)
+    :return: scraped Fighter instance, or None if all attempts have failed
+    """
+    attempts = []
+
+    def attempt():
+        attempts.append(time.time())
+        F = Fighter()
+        F.scrape_fighter(filetype, filename, fighter_index=fighter_index, fighter_page=fighter_page, **scrape_kwargs)
+        return F
+
+    try:
+        F = retry_with_backoff(attempt)
+    except TRANSIENT_ERRORS as e:
+        print(f'Failed to scrape {work[1]} after {len(attempts)} attempts!')
+        logging.info(f'Failed to scrape {work[1]} after {len(attempts)} attempts: {e!r}')
+        if retry_queue is not None:
+            retry_queue.record_failure(*work, repr(e), len(attempts))
+        return None
+    if F.name is not None and F.validation is not True:  # empty lists, or lists of different lengths.
+        logging.info(f'Data of {F.name} ({F.url}) did not pass validation, saved: {F.saved}')
+    if retry_queue is not None:
+        retry_queue.resolve(*work)
+    return F
+
+
+def scrape_all_fighters(filename, filetype='csv', compression=None, bitmap_file=None, probe=False, probe_window=50,
+                        resume=False, build_offset_index=False, gyms_file=None, scrape_gym_rosters=False,
+                        dead_letter_file=None, sinks=None, record_cache_file=None):
     """
     Scrapes information about all fighters in Sherdog's database and saves them into csv or json file.
     :param filename: string with name of the file we want to save data to; file will be created with given name
     :param filetype: string with either 'csv' or 'json' as a type of file where results will be stored
+    :param compression: optional - string with either 'gzip' or 'zstd', None (default) for plain file
+    :param bitmap_file: optional - string with path to id bitmap file, ids known to be empty are skipped and results
+                        of this run are saved there
+    :param probe: boolean, if True end of the id space is found with exponential & binary probing before crawling,
+                  otherwise scraper stops after 10 empty ids in a row past the highest id known to be valid
+    :param probe_window: integer with number of consecutive ids checked at every probe, gaps in the id space shorter
+                         than that do not end the crawl
+    :param resume: boolean, if True existing output file is appended to and ids already recorded in bitmap file
+                   (both empty and valid) are skipped
+    :param build_offset_index: boolean, if True sidecar offset index '<output>.idx' is built for random-access lookups
+                               of single fighters (see offset_index.py), works only for plain files
+    :param gyms_file: optional - string with path to gym table json file (see gyms.py), every gym is stored there once
+                      and json output references gyms by id
+    :param scrape_gym_rosters: boolean, if True page of every gym in the table is scraped (once) for its roster
+    :param dead_letter_file: optional - string with path to retry queue file (see retry_queue.py) where fighters that
+                             could not be scraped are recorded for 'retry-failed' command
+    :param sinks: optional - list of 'kind:path' specs or Sink instances (see sinks.py), every scraped fighter is
+                  also written to all of them, for instance ['jsonl:sherdog.jsonl', 'sqlite:sherdog.db']
+    :param record_cache_file: optional - string with path to record cache database (see record_cache.py), pages which
+                              have not changed since they were cached are not parsed again
     :return: None
     """
-    if filetype == 'csv':
-        headers = ['Fighter', 'Opponent', 'Result', 'Event', 'Event_date', 'Method', 'Referee', 'Round', 'Time']
-        with open(f'{filename}.csv', 'w', newline='') as csvfile:
+    index = _open_offset_index(filename, filetype, compression, build_offset_index, keep=resume)
+    gyms = _open_gym_table(gyms_file)
+    retry_queue = RetryQueue(dead_letter_file) if dead_letter_file else None
+    fan_out = _open_sinks(sinks, append=resume)
+    records = _open_record_cache(record_cache_file)
+    if resume and os.path.exists(output_path(filename, filetype, compression)):
+        pass  # keeping data saved before the crawl was interrupted.
+    elif filetype == 'csv':
+        headers = CSV_HEADERS
+        with open_output(output_path(filename, 'csv', compression), 'w', compression, newline='') as csvfile:
             init_writer = csv.writer(csvfile, delimiter=',')
             init_writer.writerow(headers)
 
     elif filetype == 'json':
         json_init = {}
-        with open(f'{filename}.json', 'w') as fighter_json:
+        with open_output(output_path(filename, 'json', compression), 'w', compression) as fighter_json:
             json.dump(json_init, fighter_json)
             print(f'Created empty JSON file with name: {filename}')
 
+    bitmap = IdBitmap(bitmap_file)
+    upper_bound = None
+    if probe:
+        upper_bound = probe_upper_bound(lambda index: is_valid_fighter_index(index, bitmap),
+                                        start=max(bitmap.last_valid(), 1), window=probe_window)
+        bitmap.save()
+        print(f'Probing found end of the id space at index {upper_bound}.')
+
     fighter_index = 0   # sets up and stores index of a fighter that scraper is collecting information about.
     fail_counter = 0    # amount of 'empty' indexes in a row.
+    skipped = 0         # amount of indexes skipped thanks to the bitmap.
 
-    while fail_counter <= 10:  # scraper will be done after there were 10 non-existing sites (indexes) in a row.
-        F = Fighter()          # creating fighter's instance object.
-        scrapped_data = F.scrape_fighter(filetype, filename, fighter_index=fighter_index)
-        if scrapped_data is True:
+    while True:
+        if upper_bound is not None:
+            if fighter_index >= upper_bound:
+                break
+        elif fail_counter > 10 and fighter_index > bitmap.last_valid():
+            break  # scraper will be done after there were 10 non-existing sites (indexes) in a row.
+        if bitmap.is_empty(fighter_index) or (resume and bitmap.get(fighter_index) == VALID):  # no request needed.
+            skipped += 1
+            fighter_index += 1
+            continue
+        F = scrape_with_retry(retry_queue, ('index', fighter_index), filetype, filename, fighter_index=fighter_index,
+                              compression=compression, index=index, gyms=gyms, sinks=fan_out,
+                              records=records)
+        if F is None:
+            pass  # request kept failing, id stays unknown in bitmap and is waiting in retry queue.
+        elif F.name is not None:
             fail_counter = 0  # resetting fail counter after finding valid page(index) for a fighter.
+            bitmap.mark_valid(fighter_index)
         else:
             fail_counter += 1  # incrementing fail counter if there was no data for certain index.
+            bitmap.mark_empty(fighter_index)
         fighter_index += 1  # incrementing index.
+        if fighter_index % BITMAP_SAVE_EVERY == 0:
+            flush_outputs()  # fighters are written before their ids are saved as done.
+            bitmap.save()
+            if gyms is not None:
+                gyms.save()
+        elif not outputs_waiting():
+            bitmap.flush()  # ids are journaled as soon as their fighters are in output, resume will not repeat them.
+    flush_outputs()
+    bitmap.save()
+    print(f'Skipped {skipped} ids known to be empty.')
+    _close_offset_index(index, filename, filetype, build_offset_index)
+    _close_gym_table(gyms, scrape_gym_rosters)
+    _close_sinks(fan_out)
+    _close_record_cache(records)
+    report_transfer()
+
+
+def _open_offset_index(filename, filetype, compression, build_offset_index, keep=False):
+    """
+    Supporting function creating offset index updated while csv output is written.
+    :param filename: string with name of the output file
+    :param filetype: string with either 'csv' or 'json'
+    :param compression: string with compression of the output file, or None
+    :param build_offset_index: boolean, if False nothing is created
+    :param keep: boolean, if True entries of existing index are kept (output is appended to)
+    :return: OffsetIndex instance for csv output, None otherwise
+    """
+    if not build_offset_index:
+        return None
+    if compression is not None:
+        raise ValueError('Offset index can only be built for output files without compression!')
+    if filetype != 'csv':
+        return None  # json output is indexed with a scan once it is complete.
+    from offset_index import OffsetIndex
+    index = OffsetIndex(output_path(filename, 'csv'))
+    if not keep:
+        index.clear()
+    return index
+
+
+def _close_offset_index(index, filename, filetype, build_offset_index):
+    """
+    Supporting function finishing offset index - closes csv index, or scans complete json output.
+    :param index: OffsetIndex instance or None
+    :param filename: string with name of the output file
+    :param filetype: string with either 'csv' or 'json'
+    :param build_offset_index: boolean, if False nothing is done
+    :return: None
+    """
+    if index is not None:
+        index.close()
+    elif build_offset_index and filetype == 'json':
+        from offset_index import build_index
+        print(f'Offset index built for {build_index(output_path(filename, "json"))} fighters.')
+
+
+def _open_sinks(sinks, append=False):
+    """
+    Supporting function starting sinks fed next to the output file.
+    :param sinks: list of Sink instances or 'kind:path' specs (see sinks.py), or None
+    :param append: boolean, if True sinks append to their existing outputs instead of overwriting them
+    :return: FanOut instance, or None if no sinks were given
+    """
+    if not sinks:
+        return None
+    from sinks import FanOut
+    return FanOut(sinks, append)
+
+
+def _close_sinks(fan_out):
+    """
+    Supporting function flushing and closing sinks.
+    :param fan_out: FanOut instance or None
+    :return: None
+    """
+    if fan_out is None:
+        return
+    for path, stats in fan_out.close().items():
+        message = f"Sink {path}: {stats['written']} fighters written, {stats['dropped']} dropped, {stats['errors']} errors."
+        print(message)
+        logging.info(message)
 
 
-def scrape_ufc_roster(save='no', filetype=None):
+def _open_record_cache(record_cache_file):
+    """
+    Supporting function opening record cache where parsed fighter records are stored.
+    :param record_cache_file: string with path to record cache database, or None
+    :return: RecordCache instance, or None if record_cache_file is None
+    """
+    if not record_cache_file:
+        return None
+    from record_cache import RecordCache
+    return RecordCache(record_cache_file, PARSER_VERSION)
+
+
+def _close_record_cache(records):
+    """
+    Supporting function closing record cache and reporting how many pages were not parsed thanks to it.
+    :param records: RecordCache instance or None
+    :return: None
+    """
+    if records is None:
+        return
+    message = f'Record cache: {records.hits} unchanged pages restored, {records.misses} pages parsed.'
+    print(message)
+    logging.info(message)
+    records.close()
+
+
+def _open_gym_table(gyms_file):
+    """
+    Supporting function loading gym table where gyms of scraped fighters are registered.
+    :param gyms_file: string with path to gym table json file, or None
+    :return: GymTable instance, or None if gyms_file is None
+    """
+    if not gyms_file:
+        return None
+    from gyms import GymTable
+    return GymTable(gyms_file)
+
+
+def _close_gym_table(gyms, scrape_gym_rosters=False):
+    """
+    Supporting function saving gym table, optionally after scraping rosters of gyms that were not scraped yet.
+    :param gyms: GymTable instance or None
+    :param scrape_gym_rosters: boolean, if True page of every gym without cached roster is requested
+    :return: None
+    """
+    if gyms is None:
+        return
+    if scrape_gym_rosters:
+        print(f'Scraped rosters of {gyms.scrape_rosters(fetch)} gyms.')
+    gyms.save()
+    print(f'Gym table with {len(gyms.gyms)} gyms saved to {gyms.path}')
+
+
+def scrape_ufc_roster(save='no', filetype=None, compression=None):
     """
     Scrapes information about all fighters in UFC database and saves them into csv or json file.
     :param save: string with 'yes' or 'no' depends on output data allocation. Default is 'no' and data will be stored
                  only in variable
     :param filetype: string with either 'csv' or 'json' as a type of file where results will be stored. Default is None
+    :param compression: optional - string with either 'gzip' or 'zstd', None (default) for plain file
     :return: dictionary with information about UFC roster, for each fighter there will be a tuple containing
              (name, weight-division, nickname)
     """
+    from bs4 import BeautifulSoup
     scrape_start_time = time.time()
     ufc_roster = {
         'men': [],
@@ -746,8 +1401,8 @@ def scrape_ufc_roster(save='no', filetype=None):
     for gender_index in range(1, 3):
         page = 0
         while True:
-            resource = requests.get(f'https://www.ufc.com/athletes/all?filters%5B0%5D=status%3A23&'
-                                    f'gender={gender_index}&page={page}')
+            resource = fetch(f'https://www.ufc.com/athletes/all?filters%5B0%5D=status%3A23&'
+                             f'gender={gender_index}&page={page}')
             soup = BeautifulSoup(resource.text, features='html.parser')
             fighters = soup.find_all('div', class_='c-listing-athlete__text')
             if len(fighters) == 0:  # if page is empty = there are no fighters left, current gender index is done.
@@ -768,10 +1423,11 @@ def scrape_ufc_roster(save='no', filetype=None):
     if save == 'yes':
         if filetype == 'csv':
             headers = ['Name', 'Division', 'Nickname']
-            with open('ufc-roster.csv', 'w', newline='') as csvfile:
+            with open_output(output_path('ufc-roster', 'csv', compression), 'w', compression, newline='') as csvfile:
                 init_writer = csv.writer(csvfile, delimiter=';')
                 init_writer.writerow(headers)
-            with open('ufc-roster.csv', 'a', newline='', encoding="ISO-8859-1") as csvfile:
+            with open_output(output_path('ufc-roster', 'csv', compression), 'a', compression, encoding="ISO-8859-1",
+                             newline='') as csvfile:
                 writer = csv.writer(csvfile, delimiter=',')
                 for index in range(len(ufc_roster['men'])):
                     try:
@@ -788,19 +1444,28 @@ def scrape_ufc_roster(save='no', filetype=None):
                         print(f'Unfortunately record containing {ufc_roster["women"][index]} '
                               f'dropped due to UnicodeEncodeError!')
         elif filetype == 'json':
-            with open('ufc-roster.json', 'w') as fighter_json:
+            with open_output(output_path('ufc-roster', 'json', compression), 'w', compression) as fighter_json:
                 json.dump(ufc_roster, fighter_json, indent=4)
     return ufc_roster
 
 
-def scrape_list_of_fighters(fighters_list, filename, filetype='csv', gender=None):
+def iter_scrape_list_of_fighters(fighters_list, filename, filetype='csv', gender=None, compression=None,
+                                 build_offset_index=False, gyms=None, retry_queue=None, sinks=None, records=None):
     """
-    Scrapes information about list of fighters in sherdog's database and saves them into csv or json file.
+    Scrapes information about list of fighters in sherdog's database and saves them into csv or json file, yielding
+    outcome for every fighter as soon as it is done (in order of completion, not in order of fighters_list). Csv rows
+    are appended while scraping, json file (see save_data) is written once the generator is exhausted.
     :param fighters_list: list with fighters to be scrapped from sherdog, fighter list should contain tuple with
            (name, weight-division, nickname) for each fighter
     :param filename: string with name of the file we want to save data to; file will be created with given name
     :param filetype: string with either 'csv' or 'json' as a type of file where results will be stored. Default is 'csv'
-    :return: None
+    :param compression: optional - string with either 'gzip' or 'zstd', None (default) for plain file
+    :param build_offset_index: boolean, if True sidecar offset index is updated while csv output is written
+    :param gyms: optional - GymTable instance where gyms of scraped fighters are registered
+    :param retry_queue: optional - RetryQueue instance where fighters which failed with transient errors are recorded
+    :param sinks: optional - FanOut instance (see sinks.py) receiving records of scraped fighters
+    :param records: optional - RecordCache instance where parsed fighter records are cached
+    :return: generator of FighterOutcome instances
     """
     number_of_women = 0
     if(gender and len(fighters_list) == 2):
@@ -814,29 +1479,36 @@ def scrape_list_of_fighters(fighters_list, filename, filetype='csv', gender=None
         except TypeError:   #normal search not entire UFC
             pass
 
+    threads = min(MAX_THREADS, max(len(fighters_list), 1))
 
-    scrape_start_time = time.time()
-    threads = min(MAX_THREADS, len(fighters_list))
-    
-    def search_fighter(fighter_tuple):
+    def search_url(fighter_tuple, search_number):
         """
-        Nested function that creates response objects for fighter based on the information included in fighter's tuple.
+        Nested function that creates fightfinder url for fighter based on the information included in fighter's tuple.
         :param fighter_tuple: tuple that contains (name, weight-division, nickname) for certain fighter.
-        :return: list of four response objects [1, 2, 3, 4].
+        :param search_number: integer with one of four searches [1, 2, 3, 4].
                  1 - based only on fighter's name
                  2 - based on fighter's name and weight class
                  3 - based on fighter's name and nickname
                  4 - based on fighter's name, nickname and weight class
+        :return: string with url
+        """
+        if search_number == 1:
+            return f'https://www.sherdog.com/stats/fightfinder?SearchTxt={fighter_tuple[0]}'
+        elif search_number == 2:
+            return (f'https://www.sherdog.com/stats/fightfinder?SearchTxt={fighter_tuple[0]}'
+                    f'&weight={weight_classes[fighter_tuple[1]]}')
+        elif search_number == 3:
+            return f'https://www.sherdog.com/stats/fightfinder?SearchTxt={fighter_tuple[0]}+{fighter_tuple[2]}'
+        return (f'https://www.sherdog.com/stats/fightfinder?SearchTxt={fighter_tuple[0]}'
+                f'+{fighter_tuple[2]}&weight={weight_classes[fighter_tuple[1]]}')
+
+    def load_search(url):
+        """
+        Nested function that sends fightfinder search and picks out its results.
+        :param url: string with fightfinder url
+        :return: css selector's match, or IndexError if there is none
         """
-        res_1 = requests.get(f'https://www.sherdog.com/stats/fightfinder?SearchTxt={fighter_tuple[0]}')
-        res_2 = requests.get(f'https://www.sherdog.com/stats/fightfinder?SearchTxt={fighter_tuple[0]}'
-                             f'&weight={weight_classes[fighter_tuple[1]]}')
-        res_3 = requests.get(f'https://www.sherdog.com/stats/fightfinder?SearchTxt={fighter_tuple[0]}'
-                             f'+{fighter_tuple[2]}')
-        res_4 = requests.get(f'https://www.sherdog.com/stats/fightfinder?SearchTxt={fighter_tuple[0]}'
-                             f'+{fighter_tuple[2]}&weight={weight_classes[fighter_tuple[1]]}')
-
-        return [res_1, res_2, res_3, res_4]
+        return check_result(soup_selector(retry_with_backoff(lambda: fetch(url))))
 
     def soup_selector(request):
         """
@@ -844,6 +1516,7 @@ def scrape_list_of_fighters(fighters_list, filename, filetype='csv', gender=None
         :param request: response object
         :return: css selector
         """
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(request.text, features='html.parser')
         css_selector = soup.select('body > div.container > div:nth-child(3) > div.col_left > section:nth-child(2) > '
                                    'div > div.content.table > table')
@@ -865,7 +1538,7 @@ def scrape_list_of_fighters(fighters_list, filename, filetype='csv', gender=None
         """
         Nested function that makes creating and scraping fighter's instance object more convenient.
         :param matching: css selector results
-        :return: None
+        :return: scraped Fighter instance
         """
         try:
             fighter_page = matching[0]['href']
@@ -880,7 +1553,10 @@ def scrape_list_of_fighters(fighters_list, filename, filetype='csv', gender=None
         else:
             F.gender = gender
         print(f"Created fighter {fighter_page}")
-        F.scrape_fighter(filetype, filename, fighter_page=fighter_page)
+        retry_with_backoff(lambda: F.scrape_fighter(filetype, filename, fighter_page=fighter_page,
+                                                    compression=compression, index=offsets, gyms=gyms,
+                                                    sinks=sinks, records=records))
+        return F
 
     weight_classes = {
         "Heavyweight": 2,
@@ -899,152 +1575,460 @@ def scrape_list_of_fighters(fighters_list, filename, filetype='csv', gender=None
     }
 
     if filetype == 'csv':
-        headers = ['Fighter', 'Opponent', 'Result', 'Event', 'Event_date', 'Method', 'Referee', 'Round', 'Time']
-        with open(f'{filename}.csv', 'w', newline='') as csvfile:
+        headers = CSV_HEADERS
+        with open_output(output_path(filename, 'csv', compression), 'w', compression, newline='') as csvfile:
             init_writer = csv.writer(csvfile, delimiter=';')
             init_writer.writerow(headers)
 
     elif filetype == 'json':
         json_init = {}
-        with open(f'{filename}.json', 'w') as fighter_json:
+        with open_output(output_path(filename, 'json', compression), 'w', compression) as fighter_json:
             json.dump(json_init, fighter_json)
+    offsets = _open_offset_index(filename, filetype, compression, build_offset_index)
 
-    def scrape_fighter_data(fighter):
-        global number_of_failed_searches
-        index = fighters_list.index(fighter)
+    def scrape_fighter_data(position, fighter):
+        """
+        Nested function that finds fighter on sherdog with up to four searches, narrowing them down step by step, and
+        scrapes the matching profile.
+        :param position: integer with position of the fighter in fighters_list
+        :param fighter: tuple that contains (name, weight-division, nickname) for certain fighter.
+        :return: FighterOutcome instance
+        """
         print(f'Web scapring started for {fighter}')
-        search_results = search_fighter(fighter)   # variable that stores different searching results.
-        find_fighter = search_results[0]           # assigning first result to variable.
-        selector = soup_selector(find_fighter)     # creating selector based on search result.
-        results = check_result(selector)           # checking if there is a valid outcome.
-        if results == IndexError:
-            logging.info(f'Error occurred with {fighter}, please check carefully '
-                         f'if there is no mistake in fighter name!')
-            number_of_failed_searches += 1
-            create_fighter_instance(find_sherdog_url_with_google(fighter))
-            return None
-        else:
-            if len(results) == 1:
-                create_fighter_instance(results, index)         # creating Fighter's instance and saving it.
+        search_start_time = time.time()
+        state = {'hops': 0, 'url': None, 'status': 'ambiguous', 'scrape_seconds': 0.0, 'error': None,
+                 'transient': False}
+        responses = {}  # search number -> result of that search, so no search is sent twice.
+
+        def search(search_number):
+            # the same search sent by another thread at the same time is shared, not repeated.
+            return fetch_once(search_url(fighter, search_number), load_search)
+
+        def lookup(search_number):
+            # searches are sent lazily, only when the previous one was not enough to find the fighter.
+            if search_number not in responses:
+                if profiler is None:
+                    responses[search_number] = search(search_number)
+                else:
+                    with profiler.profile('search', f'{fighter[0]} (search {search_number})'):
+                        responses[search_number] = search(search_number)
+                state['hops'] += 1
+            return responses[search_number]
+
+        def found(matching):
+            scrape_start_time = time.time()
+            F = create_fighter_instance(matching, position)  # creating Fighter's instance and saving it.
+            state['scrape_seconds'] = time.time() - scrape_start_time
+            state['url'] = F.url
+            if F.name is None:
+                state['status'] = 'empty'
+            else:
+                state['status'] = 'scraped' if F.validation is True else 'invalid'
+
+        def not_found(message=None):
+            if message is not None:
+                logging.info(message)
+            count_failed_search()
+            fighter_page = find_sherdog_url_with_google(fighter)
+            if fighter_page is None:
+                state['status'] = 'not_found'
             else:
-                if( fighter[2] != 'NA'):    #if fighter has nickname (not NA), then and only then search #2 should have priority over search #3) - see Steve Garcia
-                    find_fighter = search_results[2]         # assigning third result to variable.
-                    selector = soup_selector(find_fighter)   # creating selector based on search result.
-                    results = check_result(selector)
+                found(fighter_page)
 
+        try:
+            results = lookup(1)                # checking if there is a valid outcome of search based on name.
+            if results == IndexError:
+                not_found(f'Error occurred with {fighter}, please check carefully '
+                          f'if there is no mistake in fighter name!')
+            elif len(results) == 1:
+                found(results)
+            elif fighter[2] != 'NA':    #if fighter has nickname (not NA), then and only then search #2 should have priority over search #3) - see Steve Garcia
+                results = lookup(3)
+                if results == IndexError:
+                    not_found()
+                elif len(results) == 1:
+                    found(results)
+            else:
+                results = lookup(2)
+                if results == IndexError:
+                    results = lookup(3)
                     if results == IndexError:
-                        number_of_failed_searches += 1
-                        create_fighter_instance(find_sherdog_url_with_google(fighter))
-                        return None
+                        not_found(f'Error occured with {fighter}, please check carefully if there is no mistake '
+                                  f'in nickname!')
                     elif len(results) == 1:
-                        create_fighter_instance(results, index)
-                elif(fighter[2] == 'NA' or results == IndexError):
-                    find_fighter = search_results[1]         # assigning second result to variable.
-                    selector = soup_selector(find_fighter)   # creating selector based on search result.
-                    results = check_result(selector)         # checking if there is a valid outcome.
+                        found(results)
+                elif len(results) == 1:
+                    found(results)
+                else:
+                    results = lookup(3)
                     if results == IndexError:
-                        try:
-                            find_fighter = search_results[2]         # assigning third result to variable.
-                        except KeyError:
-                            print('Search engine tried to narrow down findings by using weight-class filter, apparently '
-                                'you have not specified weight-class data!')
-                        else:
-                            selector = soup_selector(find_fighter)   # creating selector based on search result.
-                            results = check_result(selector)         # checking if there is a valid outcome.
-                            if results == IndexError:
-                                logging.info(f'Error occured with {fighter}, please check carefully if there is no mistake '
-                                            f'in nickname!')
-                                number_of_failed_searches += 1
-                                create_fighter_instance(find_sherdog_url_with_google(fighter))
-                                return None
-                            else:
-                                if len(results) == 1:
-                                    create_fighter_instance(results, index)  # creating Fighter's instance and saving it.
+                        not_found(f'Error occurred with {fighter}, please check carefully '
+                                  f'- searching with name & nickname data was unsuccessful!')
+                    elif len(results) == 1:
+                        found(results)
                     else:
-                        selector = soup_selector(find_fighter)        # creating selector based on search result.
-                        results = check_result(selector)              # checking if there is a valid outcome.
+                        results = lookup(4)
                         if results == IndexError:
-                            logging.info(f'Error occured with {fighter}, please check carefully if there is no mistake '
-                                            f'in nickname!')
-                            number_of_failed_searches += 1
-                            create_fighter_instance(find_sherdog_url_with_google(fighter))
-                            return None
+                            not_found(f'Error occurred with {fighter}, please check carefully '
+                                      f'- searching with all provided data was unsuccessful!')
                         else:
-                            if len(results) == 1:
-                                create_fighter_instance(results, index)      # creating Fighter's instance and saving it.
-                            else:
-                                try:
-                                    find_fighter = search_results[2]  # assigning third result to variable.
-                                except KeyError:
-                                    print(f'Search engine tried to narrow down findings by name & nickname, apparently this'
-                                        f'was not enough to find {fighter[0]}!')
-                                else:
-                                    selector = soup_selector(find_fighter)  # creating selector based on search result.
-                                    results = check_result(selector)        # checking if there is a valid outcome.
-                                    if results == IndexError:
-                                        logging.info(f'Error occurred with {fighter}, please check carefully '
-                                                    f'- searching with name & nickname data was unsuccessful!')
-                                        number_of_failed_searches += 1
-                                        create_fighter_instance(find_sherdog_url_with_google(fighter))
-                                        return None
-                                    else:
-                                        if len(results) == 1:
-                                            create_fighter_instance(results, index)  # creating Fighter's instance and saving it.
-                                        else:
-                                            try:
-                                                find_fighter = search_results[3]  # assigning fourth result to variable.
-                                            except KeyError:
-                                                print(f'Search engine tried to narrow down findings by using all filters, '
-                                                    f'apparently this was not enough to find {fighter[0]}!')
-                                            else:
-                                                # creating selector based on search result.
-                                                selector = soup_selector(find_fighter)
-                                                # checking if there is a valid outcome.
-                                                results = check_result(selector)
-                                                if results == IndexError:
-                                                    logging.info(f'Error occurred with {fighter}, please check carefully '
-                                                                f'- searching with all provided data was unsuccessful!')
-                                                    number_of_failed_searches += 1
-                                                    create_fighter_instance(find_sherdog_url_with_google(fighter))
-                                                    return None
-                                                else:
-                                                    # creating Fighter's instance and saving it.
-                                                    create_fighter_instance(results, index)
-        
-    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
-        executor.map(scrape_fighter_data, fighters_list)
-    #for i in range(len(fighters_list)):
-    #    scrape_fighter_data(fighters_list[i])
+                            found(results)
+        except KeyError:
+            print('Search engine tried to narrow down findings by using weight-class filter, apparently '
+                  'you have not specified weight-class data!')
+            state['status'] = 'unknown_weight_class'
+        except TRANSIENT_ERRORS as e:
+            logging.info(f'Error occurred with {fighter}: {e!r}')
+            state['status'] = 'error'
+            state['error'] = repr(e)
+            state['transient'] = True
+        except Exception as e:
+            logging.info(f'Error occurred with {fighter}: {e!r}')
+            state['status'] = 'error'
+            state['error'] = repr(e)
+        if state['status'] == 'ambiguous':
+            logging.info(f'Search for {fighter} returned several fighters and could not be narrowed down!')
+        search_seconds = time.time() - search_start_time - state['scrape_seconds']
+        if retry_queue is not None:
+            # only errors which may disappear on a retry are queued, saved fighters never are.
+            if state['transient']:
+                retry_queue.record_failure('search', list(fighter), state['error'])
+            else:
+                retry_queue.resolve('search', list(fighter))
+        return FighterOutcome(position, fighter, state['url'], state['hops'], state['status'], search_seconds,
+                              state['scrape_seconds'], state['error'])
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            futures = [executor.submit(scrape_fighter_data, position, fighter)
+                       for position, fighter in enumerate(fighters_list)]
+            for future in concurrent.futures.as_completed(futures):
+                yield future.result()
+        if filetype == 'json':
+            with open_replacement(output_path(filename, 'json', compression), compression) as fighter_json:
+                json.dump(allfighters, fighter_json, indent=4)
+            print(f'JSON file was successfully saved for {len(fighters_list)} fighters!')
+    finally:
+        flush_outputs()
+        if offsets is not None:
+            offsets.close()
+
+
+def scrape_list_of_fighters(fighters_list, filename, filetype='csv', gender=None, compression=None,
+                            build_offset_index=False, gyms_file=None, scrape_gym_rosters=False, dead_letter_file=None,
+                            sinks=None, record_cache_file=None):
+    """
+    Scrapes information about list of fighters in sherdog's database and saves them into csv or json file.
+    :param fighters_list: list with fighters to be scrapped from sherdog, fighter list should contain tuple with
+           (name, weight-division, nickname) for each fighter
+    :param filename: string with name of the file we want to save data to; file will be created with given name
+    :param filetype: string with either 'csv' or 'json' as a type of file where results will be stored. Default is 'csv'
+    :param compression: optional - string with either 'gzip' or 'zstd', None (default) for plain file
+    :param build_offset_index: boolean, if True sidecar offset index '<output>.idx' is built for random-access lookups
+                               of single fighters (see offset_index.py), works only for plain files
+    :param gyms_file: optional - string with path to gym table json file (see gyms.py), every gym is stored there once
+                      and json output references gyms by id
+    :param scrape_gym_rosters: boolean, if True page of every gym in the table is scraped (once) for its roster
+    :param dead_letter_file: optional - string with path to retry queue file (see retry_queue.py) where fighters that
+                             could not be scraped are recorded for 'retry-failed' command
+    :param sinks: optional - list of 'kind:path' specs or Sink instances (see sinks.py), every scraped fighter is
+                  also written to all of them, for instance ['jsonl:sherdog.jsonl', 'sqlite:sherdog.db']
+    :param record_cache_file: optional - string with path to record cache database (see record_cache.py), pages which
+                              have not changed since they were cached are not parsed again
+    :return: list of FighterOutcome instances in the same order as fighters_list
+    """
+    scrape_start_time = time.time()
+    gyms = _open_gym_table(gyms_file)
+    retry_queue = RetryQueue(dead_letter_file) if dead_letter_file else None
+    fan_out = _open_sinks(sinks)
+    records = _open_record_cache(record_cache_file)
+    outcomes = sorted(iter_scrape_list_of_fighters(fighters_list, filename, filetype=filetype, gender=gender,
+                                                   compression=compression, build_offset_index=build_offset_index,
+                                                   gyms=gyms, retry_queue=retry_queue, sinks=fan_out,
+                                                   records=records),
+                      key=lambda outcome: outcome.position)
+    statuses = collections.Counter(outcome.status for outcome in outcomes)
 
     scrape_complete_time = time.time()
-    print(f"\nScraping {len(fighters_list) - number_of_failed_searches} fighter's data from Sherdog completed in {round(scrape_complete_time-scrape_start_time,2)} seconds.")
-    print(f"Failed to find {number_of_failed_searches} fighter in Sherdog.")
+    print(f"\nScraping {statuses['scraped']} fighter's data from Sherdog completed in {round(scrape_complete_time-scrape_start_time,2)} seconds.")
+    print(f"Failed to find {len(outcomes) - statuses['scraped']} fighter in Sherdog: {dict(statuses)}")
+    report_transfer()
+
+    _close_offset_index(None, filename, filetype, build_offset_index)
+    _close_gym_table(gyms, scrape_gym_rosters)
+    _close_sinks(fan_out)
+    _close_record_cache(records)
+    return outcomes
+
+def scrape_leased_fighters(db_path, filename, filetype='csv', worker_id=None, lease_seconds=None,
+                           compression=None, build_offset_index=False, gyms_file=None, scrape_gym_rosters=False,
+                           dead_letter_file=None, sinks=None, record_cache_file=None):
+    """
+    Runs crawl worker - claims work units from coordinator's database file (see coordinator.py), scrapes fighters
+    from each unit and marks it as done. Several workers may run at once on one machine (database file has to be on
+    local disk), every worker should save data to its own file. Transient errors are retried with exponential
+    backoff, fighters which still fail are recorded in retry queue and the unit goes on.
+    :param db_path: string with path to coordinator's sqlite database file
+    :param filename: string with name of the file we want to save data to; data is appended if file already exists
+    :param filetype: string with either 'csv' or 'json' as a type of file where results will be stored
+    :param worker_id: optional - string identifying the worker, 'hostname:pid' by default
+    :param lease_seconds: optional - integer with number of seconds unit stays leased without heartbeat, None for
+                          coordinator's default (LEASE_SECONDS)
+    :param compression: optional - string with either 'gzip' or 'zstd', None (default) for plain file
+    :param build_offset_index: boolean, if True sidecar offset index '<output>.idx' is built for random-access lookups
+                               of single fighters (see offset_index.py), works only for plain files
+    :param gyms_file: optional - string with path to gym table json file (see gyms.py), every gym is stored there once
+                      and json output references gyms by id
+    :param scrape_gym_rosters: boolean, if True page of every gym in the table is scraped (once) for its roster
+    :param dead_letter_file: optional - string with path to retry queue file (see retry_queue.py) where fighters that
+                             could not be scraped are recorded for 'retry-failed' command
+    :param sinks: optional - list of 'kind:path' specs or Sink instances (see sinks.py), every scraped fighter is
+                  also written to all of them, existing sink files are appended to like the output file
+    :param record_cache_file: optional - string with path to record cache database (see record_cache.py), pages which
+                              have not changed since they were cached are not parsed again
+    :return: integer with number of completed units
+    """
+    from coordinator import CrawlCoordinator, default_worker_id, LEASE_SECONDS
+    worker_id = worker_id or default_worker_id()
+    coordinator = CrawlCoordinator(db_path, lease_seconds=lease_seconds or LEASE_SECONDS)
 
-    with open(f'{filename}.json', 'w') as fighter_json:
+    if filetype == 'csv' and not os.path.exists(output_path(filename, 'csv', compression)):
+        headers = CSV_HEADERS
+        with open_output(output_path(filename, 'csv', compression), 'w', compression, newline='') as csvfile:
+            init_writer = csv.writer(csvfile, delimiter=';')
+            init_writer.writerow(headers)
+    elif filetype == 'json' and not os.path.exists(output_path(filename, 'json', compression)):
+        with open_output(output_path(filename, 'json', compression), 'w', compression) as fighter_json:
+            json.dump({}, fighter_json)
+    index = _open_offset_index(filename, filetype, compression, build_offset_index, keep=True)
+    gyms = _open_gym_table(gyms_file)
+    retry_queue = RetryQueue(dead_letter_file) if dead_letter_file else None
+    fan_out = _open_sinks(sinks, append=True)
+    records = _open_record_cache(record_cache_file)
+
+    completed_units = 0
+    while True:
+        unit = coordinator.claim(worker_id)
+        if unit is None:  # all units are either done or leased by other workers.
+            break
+        logging.info(f'Worker {worker_id} claimed unit {unit.id} (attempt {unit.attempts})')
+        if unit.kind == 'range':
+            work = [(('index', fighter_index), {'fighter_index': fighter_index})
+                    for fighter_index in range(unit.start, unit.stop)]
+        else:
+            work = [(('page', url.split('sherdog.com')[-1]), {'fighter_page': url.split('sherdog.com')[-1]})
+                    for url in unit.urls]
+        lease_lost = False
+        try:
+            for item, fighter_kwargs in work:
+                # transient errors are retried here, only fatal ones release the unit below.
+                scrape_with_retry(retry_queue, item, filetype, filename, compression=compression, index=index,
+                                  gyms=gyms, sinks=fan_out, records=records, **fighter_kwargs)
+                if not coordinator.heartbeat(unit.id, worker_id):
+                    lease_lost = True
+                    logging.info(f'Worker {worker_id} lost lease on unit {unit.id}, unit was handed to another worker')
+                    break
+        except BaseException:
+            coordinator.release(unit.id, worker_id)  # unit goes back to the pool right away instead of expiring.
+            raise
+        flush_outputs()  # unit is completed only once its fighters are written.
+        if filetype == 'json' and unit.kind == 'urls':
+            with open_replacement(output_path(filename, 'json', compression), compression) as fighter_json:
+                json.dump(allfighters, fighter_json, indent=4)
+        if not lease_lost and coordinator.complete(unit.id, worker_id):
+            completed_units += 1
+    coordinator.close()
+    _close_offset_index(index, filename, filetype, build_offset_index)
+    _close_gym_table(gyms, scrape_gym_rosters)
+    _close_sinks(fan_out)
+    _close_record_cache(records)
+    print(f'Worker {worker_id} completed {completed_units} work units.')
+    report_transfer()
+    return completed_units
+
+def scrape_recrawl(previous_output, filename, filetype='csv', budget=500, roster_file=None, compression=None,
+                   gyms_file=None, scrape_gym_rosters=False, dead_letter_file=None, sinks=None,
+                   record_cache_file=None):
+    """
+    Refreshes fighters from previous output in order of freshness priority (see scheduler.py) - recently active
+    fighters, UFC roster members and fighters not scraped for a long time go first, until budget is spent.
+    :param previous_output: string with path to csv or json file produced earlier, it has to contain fighter urls
+    :param filename: string with name of the file we want to save data to; file will be created with given name
+    :param filetype: string with either 'csv' or 'json' as a type of file where results will be stored
+    :param budget: integer with maximum number of fighter profiles requested in this run
+    :param roster_file: optional - string with path to csv file made by scrape_ufc_roster
+    :param compression: optional - string with either 'gzip' or 'zstd', None (default) for plain file
+    :param gyms_file: optional - string with path to gym table json file (see gyms.py), every gym is stored there once
+                      and json output references gyms by id
+    :param scrape_gym_rosters: boolean, if True page of every gym in the table is scraped (once) for its roster
+    :param dead_letter_file: optional - string with path to retry queue file (see retry_queue.py) where fighters that
+                             could not be scraped are recorded for 'retry-failed' command
+    :param sinks: optional - list of 'kind:path' specs or Sink instances (see sinks.py), every scraped fighter is
+                  also written to all of them, for instance ['jsonl:sherdog.jsonl', 'sqlite:sherdog.db']
+    :param record_cache_file: optional - string with path to record cache database (see record_cache.py), pages which
+                              have not changed since they were cached are not parsed again
+    :return: list of fighter pages that were recrawled
+    """
+    scrape_start_time = time.time()
+    gyms = _open_gym_table(gyms_file)
+    retry_queue = RetryQueue(dead_letter_file) if dead_letter_file else None
+    fan_out = _open_sinks(sinks)
+    records = _open_record_cache(record_cache_file)
+    roster_names = read_roster_names(roster_file) if roster_file else ()
+    plan = plan_recrawl(load_fighter_states(previous_output), budget, roster_names)
+    fighter_pages = [page for priority, page in plan]
+
+    if filetype == 'csv':
+        headers = CSV_HEADERS
+        with open_output(output_path(filename, 'csv', compression), 'w', compression, newline='') as csvfile:
+            init_writer = csv.writer(csvfile, delimiter=';')
+            init_writer.writerow(headers)
+
+    def recrawl_fighter(fighter_page):
+        scrape_with_retry(retry_queue, ('page', fighter_page), filetype, filename, fighter_page=fighter_page,
+                          compression=compression, gyms=gyms, sinks=fan_out, records=records)
+
+    threads = min(MAX_THREADS, max(len(fighter_pages), 1))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(recrawl_fighter, fighter_pages))
+    flush_outputs()
+
+    if filetype == 'json':
+        with open_output(output_path(filename, 'json', compression), 'w', compression) as fighter_json:
             json.dump(allfighters, fighter_json, indent=4)
-            print(f'JSON file was successfully saved for {len(fighters_list)} fighters!')
+    _close_gym_table(gyms, scrape_gym_rosters)
+    _close_sinks(fan_out)
+    _close_record_cache(records)
+    print(f'Recrawled {len(fighter_pages)} fighters in {round(time.time() - scrape_start_time, 2)} seconds.')
+    report_transfer()
+    return fighter_pages
+
+def scrape_failed_fighters(dead_letter_file, filename, filetype='csv', compression=None, max_attempts=None,
+                           sinks=None, record_cache_file=None):
+    """
+    Retries fighters recorded in retry queue file by earlier runs, without re-running the whole crawl. Fighters found
+    by search are searched again, fighters known by index or page are scraped directly. Items which succeed are marked
+    as resolved, the others stay in the file with increased attempt count.
+    :param dead_letter_file: string with path to retry queue file (see retry_queue.py)
+    :param filename: string with name of the file we want to save data to; file will be created with given name
+    :param filetype: string with either 'csv' or 'json' as a type of file where results will be stored
+    :param compression: optional - string with either 'gzip' or 'zstd', None (default) for plain file
+    :param max_attempts: optional - integer, items which already failed that many times are not retried
+    :param sinks: optional - list of 'kind:path' specs or Sink instances (see sinks.py), every scraped fighter is
+                  also written to all of them
+    :param record_cache_file: optional - string with path to record cache database (see record_cache.py), pages which
+                              have not changed since they were cached are not parsed again
+    :return: integer with number of items still waiting in retry queue
+    """
+    retry_queue = RetryQueue(dead_letter_file)
+    fan_out = _open_sinks(sinks)
+    records = _open_record_cache(record_cache_file)
+    pending = retry_queue.pending(max_attempts)
+    searches = [record['payload'] for record in pending if record['kind'] == 'search']
+    pages = [record for record in pending if record['kind'] != 'search']
+    print(f'Retrying {len(searches)} searches and {len(pages)} fighter pages from {dead_letter_file}.')
+
+    # searching initializes output file (and writes json one with fighters found), pages are appended afterwards.
+    for outcome in iter_scrape_list_of_fighters(searches, filename, filetype=filetype, compression=compression,
+                                                retry_queue=retry_queue, sinks=fan_out, records=records):
+        logging.info(f'Retried search for {outcome.fighter}: {outcome.status}')
+    if not searches and filetype == 'csv':
+        with open_output(output_path(filename, 'csv', compression), 'w', compression, newline='') as csvfile:
+            csv.writer(csvfile, delimiter=';').writerow(CSV_HEADERS)
+
+    def retry_fighter(record):
+        # index items are requested as pages, so json output has the same layout for every retried fighter.
+        fighter_page = f'/fighter/index?id={record["payload"]}.' if record['kind'] == 'index' else record['payload']
+        scrape_with_retry(retry_queue, (record['kind'], record['payload']), filetype, filename,
+                          fighter_page=fighter_page, compression=compression, sinks=fan_out, records=records)
+
+    threads = min(MAX_THREADS, max(len(pages), 1))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(retry_fighter, pages))
+    flush_outputs()
+
+    if filetype == 'json' and pages:
+        with open_replacement(output_path(filename, 'json', compression), compression) as fighter_json:
+            json.dump(allfighters, fighter_json, indent=4)
+    retry_queue.compact()
+    _close_sinks(fan_out)
+    _close_record_cache(records)
+    remaining = len(retry_queue.pending())
+    print(f'{len(pending) - remaining} fighters recovered, {remaining} still waiting in {dead_letter_file}.')
+    report_transfer()
+    return remaining
+
+
+def export_record_cache(record_cache_file, filename, filetype='csv', compression=None, gyms_file=None, sinks=None):
+    """
+    Regenerates output from record cache - no requests are sent and no html is parsed, so after a change in save_*
+    methods or output format data is written again at disk speed. Only records of current PARSER_VERSION are used.
+    Json is always written in the layout of scrape_list_of_fighters ({'fighters': [...]}, see save_data), also for
+    fighters cached by scrape_all_fighters, whose own json output keys fighters by name (see save_to_json).
+    :param record_cache_file: string with path to record cache database (see record_cache.py)
+    :param filename: string with name of the file we want to save data to; file will be created with given name
+    :param filetype: string with either 'csv' or 'json' as a type of file where results will be stored
+    :param compression: optional - string with either 'gzip' or 'zstd', None (default) for plain file
+    :param gyms_file: optional - string with path to gym table json file (see gyms.py), json output then references
+                      gyms by id
+    :param sinks: optional - list of 'kind:path' specs or Sink instances (see sinks.py), every fighter is also
+                  written to all of them
+    :return: integer with number of exported fighters
+    """
+    export_start_time = time.time()
+    records = _open_record_cache(record_cache_file)
+    gyms = _open_gym_table(gyms_file)
+    fan_out = _open_sinks(sinks)
+    if filetype == 'csv':
+        with open_output(output_path(filename, 'csv', compression), 'w', compression, newline='') as csvfile:
+            csv.writer(csvfile, delimiter=';').writerow(CSV_HEADERS)
+
+    exported = 0
+    for url, scraped_at, fields in records.iter_records():
+        F = Fighter()
+        F.url = url
+        F.scraped_at = scraped_at
+        F._restore_fields(fields)
+        if F.save_extracted(filetype, filename, compression=compression, gyms=gyms, sinks=fan_out):
+            exported += 1
+    records.close()
+    flush_outputs()
+
+    if filetype == 'json':
+        with open_output(output_path(filename, 'json', compression), 'w', compression) as fighter_json:
+            json.dump(allfighters, fighter_json, indent=4)
+    _close_gym_table(gyms)
+    _close_sinks(fan_out)
+    print(f'Exported {exported} fighters from {record_cache_file} in '
+          f'{round(time.time() - export_start_time, 2)} seconds.')
+    return exported
 
-def helper_read_fighters_from_csv(filename, delimiter=','):
+def helper_read_fighters_from_csv(filename, delimiter=',', compression=None):
     """
     Helper function that will help creating fighters list from existing csv file.
     :param filename: csv filename
     :param delimiter: string with delimiter used in csv file, default = ','
+    :param compression: optional - string with either 'gzip' or 'zstd' for roster saved with compression
     :return: list of fighters, where each fighter is a tuple(name, weight-division, nickname)
     """
     fighters_list = []
-    with open(f'{filename}.csv', 'r') as csvFile:
+    with open_input(output_path(filename, 'csv', compression), compression) as csvFile:
         reader = csv.reader(csvFile)
         next(reader, None)
         for row in reader:
             str_row = f'{delimiter}'.join(row)
             split_str = str_row.split(f'{delimiter}')
+            if len(split_str) < 3:
+                message = f'Row {row} of {filename}.csv was skipped, expected name, weight-division and nickname!'
+                print(message)
+                logging.info(message)
+                continue
             fighters_list.append(split_str)
     return fighters_list
 
 def find_sherdog_url_with_google(fighter):
     return None
     #time.sleep(1.0) #TODO: figure out TIME to not get blocked by Google on search query 9 out of 50 get blocked
-    global number_of_failed_searches
     global since_last_google_rq
     if(since_last_google_rq == 0.0):
         since_last_google_rq = time.time()
@@ -1060,12 +2044,13 @@ def find_sherdog_url_with_google(fighter):
     else:
         query = fighter[0] + " " + fighter[1] + " :site:sherdog.com/fighter"
 
+    from googlesearch import search
     try:
         for firstSearch in search(query, lang = "en", tld="com", num=1, stop=1, pause=4, user_agent= user_agent):
             fighter_page = firstSearch.split("sherdog.com")[1]
             print(f'Found {fighter_page} - for {fighter} via Google search...')
             logging.info(f'Found {fighter_page} - for {fighter} via Google search...')
-            number_of_failed_searches -= 1
+            count_failed_search(-1)
             return fighter_page
 
         print("Didn't find google search result with nickname, now searching with only the name...")
@@ -1074,26 +2059,134 @@ def find_sherdog_url_with_google(fighter):
             fighter_page = secondSearch.split("sherdog.com")[1]
             print(f'Found {fighter_page} - for {fighter} via Google search(name)...')
             logging.info(f'Found {fighter_page} - for {fighter} via Google search(name)...')
-            number_of_failed_searches -= 1
+            count_failed_search(-1)
             return fighter_page
     except Exception as e:
         logging.info(f'Google blocked requests....on {fighter}...with exception: {e}')
         print(f'Google blocked requests....on {fighter}...')
 
+def main(argv=None):
+    """
+    Command-line entry point with roster, list, all, resume, recrawl, retry-failed, export-cache and worker
+    subcommands.
+    :param argv: optional - list of command-line arguments, sys.argv is used when None
+    :return: None
+    """
+    global MAX_THREADS
+    parser = argparse.ArgumentParser(description='Scrapes fighters data from sherdog & UFC roster.')
+    parser.add_argument('--threads', type=int, default=MAX_THREADS, help='number of concurrent requests')
+    parser.add_argument('--format', dest='filetype', choices=['csv', 'json'], default='csv', help='output format')
+    parser.add_argument('--compression', choices=['gzip', 'zstd'], default=None, help='compress output file')
+    parser.add_argument('--log-file', default=LOG_FILE, help='path to log file')
+    parser.add_argument('--index', action='store_true', help='build sidecar offset index for fighter lookups')
+    parser.add_argument('--gyms', metavar='GYMS_FILE', default=None,
+                        help='store every gym once in GYMS_FILE, json output references gyms by id')
+    parser.add_argument('--gym-rosters', action='store_true', help='scrape roster from page of every gym (once)')
+    parser.add_argument('--dead-letter', metavar='FAILED_FILE', default=None,
+                        help='retry queue file for fighters that could not be scraped, default is <output>-failed.jsonl')
+    parser.add_argument('--sink', dest='sinks', action='append', metavar='KIND:PATH', default=None,
+                        help='also write fighters to csv:, jsonl: or sqlite: sink, may be repeated')
+    parser.add_argument('--record-cache', metavar='CACHE_FILE', default=None,
+                        help='cache parsed fighters in CACHE_FILE, unchanged pages are not parsed again')
+    parser.add_argument('--profile', metavar='REPORT_FILE', default=None,
+                        help='profile every fighter & search and write hot-path report to REPORT_FILE')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    commands.add_parser('roster', help='scrape current UFC roster to ufc-roster.csv/json')
+
+    fighters = commands.add_parser('list', help='scrape fighters listed in csv file made by roster command')
+    fighters.add_argument('roster_file', help='csv file with (name, weight-division, nickname) rows')
+    fighters.add_argument('--delimiter', default=',')
+    fighters.add_argument('--gender', choices=['men', 'women'], default=None,
+                          help='gender of all fighters in the roster file')
+    fighters.add_argument('-o', '--output', default='scraped_list', help='output filename without extension')
+
+    recrawl = commands.add_parser('recrawl', help='refresh fighters from previous output by freshness priority')
+    recrawl.add_argument('previous_output', help='csv or json file produced earlier')
+    recrawl.add_argument('--budget', type=int, default=500, help='maximum number of profiles requested')
+    recrawl.add_argument('--roster', default=None, help='csv file made by roster command')
+    recrawl.add_argument('-o', '--output', default='recrawl', help='output filename without extension')
+
+    retry = commands.add_parser('retry-failed', help='retry only fighters recorded in retry queue file')
+    retry.add_argument('failed_file', help='retry queue file written by earlier runs')
+    retry.add_argument('--max-attempts', type=int, default=None, help='skip fighters which failed that many times')
+    retry.add_argument('-o', '--output', default='retried', help='output filename without extension')
+
+    worker = commands.add_parser('worker', help='scrape work units leased from coordinator database (see coordinator.py)')
+    worker.add_argument('db', help='coordinator database file made by coordinator.py init-range / init-urls')
+    worker.add_argument('--worker-id', default=None, help="worker name, default is 'hostname:pid'")
+    worker.add_argument('--lease-seconds', type=int, default=None, help='lease duration without heartbeat')
+    worker.add_argument('-o', '--output', default='worker', help='output filename without extension, one per worker')
+
+    export = commands.add_parser('export-cache', help='write output again from record cache, without any requests')
+    export.add_argument('cache_file', help='record cache file written by earlier runs with --record-cache')
+    export.add_argument('-o', '--output', default='exported', help='output filename without extension')
+
+    for name, description in (('all', 'scrape all fighters in sherdog database'),
+                              ('resume', 'continue interrupted "all" crawl using its id bitmap')):
+        crawl = commands.add_parser(name, help=description)
+        crawl.add_argument('-o', '--output', default='sherdog', help='output filename without extension')
+        crawl.add_argument('--bitmap', default=None, help='id bitmap file, default is <output>-ids.bin')
+        crawl.add_argument('--probe', action='store_true', help='probe end of id space before crawling')
+    args = parser.parse_args(argv)
+
+    setup_logging(args.log_file)
+    MAX_THREADS = args.threads
+    if args.profile:
+        enable_profiling(args.profile)
+    try:
+        run_command(args)
+    finally:
+        write_profile_report()
+
+
+def run_command(args):
+    """
+    Runs subcommand parsed by main.
+    :param args: argparse.Namespace returned by main's parser
+    :return: None
+    """
+    dead_letter_file = args.dead_letter or f'{getattr(args, "output", "sherdog")}-failed.jsonl'
+    if args.command == 'roster':
+        scrape_ufc_roster(save='yes', filetype=args.filetype, compression=args.compression)
+    elif args.command == 'list':
+        roster_compression = compression_from_path(args.roster_file)
+        roster_name = args.roster_file[:len(args.roster_file) - len(COMPRESSIONS[roster_compression])]
+        fighters_list = helper_read_fighters_from_csv(roster_name.rsplit('.csv', 1)[0], delimiter=args.delimiter,
+                                                      compression=roster_compression)
+        if args.gender:
+            # roster file has no gender column, all fighters are given the chosen one (see iter_scrape_list_of_fighters).
+            fighters_list = {'men': [], 'women': [], args.gender: fighters_list}
+        scrape_list_of_fighters(fighters_list, args.output, filetype=args.filetype, gender=args.gender,
+                                compression=args.compression, build_offset_index=args.index, gyms_file=args.gyms,
+                                scrape_gym_rosters=args.gym_rosters, dead_letter_file=dead_letter_file,
+                                sinks=args.sinks, record_cache_file=args.record_cache)
+    elif args.command == 'recrawl':
+        scrape_recrawl(args.previous_output, args.output, filetype=args.filetype, budget=args.budget,
+                       roster_file=args.roster, compression=args.compression, gyms_file=args.gyms,
+                       scrape_gym_rosters=args.gym_rosters, dead_letter_file=dead_letter_file,
+                       sinks=args.sinks, record_cache_file=args.record_cache)
+    elif args.command == 'retry-failed':
+        scrape_failed_fighters(args.failed_file, args.output, filetype=args.filetype, compression=args.compression,
+                               max_attempts=args.max_attempts, sinks=args.sinks,
+                               record_cache_file=args.record_cache)
+    elif args.command == 'worker':
+        scrape_leased_fighters(args.db, args.output, filetype=args.filetype, worker_id=args.worker_id,
+                               lease_seconds=args.lease_seconds, compression=args.compression,
+                               build_offset_index=args.index, gyms_file=args.gyms,
+                               scrape_gym_rosters=args.gym_rosters, dead_letter_file=dead_letter_file,
+                               sinks=args.sinks, record_cache_file=args.record_cache)
+    elif args.command == 'export-cache':
+        export_record_cache(args.cache_file, args.output, filetype=args.filetype, compression=args.compression,
+                            gyms_file=args.gyms, sinks=args.sinks)
+    else:
+        scrape_all_fighters(args.output, filetype=args.filetype, compression=args.compression,
+                            bitmap_file=args.bitmap or f'{args.output}-ids.bin', probe=args.probe,
+                            resume=args.command == 'resume', build_offset_index=args.index, gyms_file=args.gyms,
+                            scrape_gym_rosters=args.gym_rosters, dead_letter_file=dead_letter_file,
+                            sinks=args.sinks, record_cache_file=args.record_cache)
+
+
 if __name__ == '__main__':
-    #scrape_all_fighters('sherdog')
-    #scrape_all_fighters(filename='fighters' ,filetype="json")
-    f_list = [('Francis Ngannou', 'Heavyweight', 'NA'), ('Stipe Miocic', 'Heavyweight', 'NA')
-    , ('Tim Means', 'Welterweight', 'NA'), ('Khabib Nurmagomedov', 'Lightweight', 'NA')]
-    #scrape_list_of_fighters(f_list, 'scraped_list', filetype='json')
-    #scrape_list_of_fighters(ufc['men'], 'ufc-roster', filetype='json')
-    #ufc = scrape_ufc_roster(save='no', filetype=None)
-    #scrape_list_of_fighters(ufc, 'ufc-roster-9', filetype='json')
-    #f_list = [('Da-un Jung', 'Light Heavyweight', '"Sseda"'), ('Serghei Spivac', 'Heavyweight', '"Polar Bear"'), ('Askar Askar', 'Bantamweight', 'NA'),
-    #f_list  = [('Aoriqileng', 'Flyweight', 'NA'), ('Serghei Spivac', 'Heavyweight', "Polar Bear"), ('Askar Askar', 'Bantamweight', 'NA'), ('Da-un Jung', 'Light Heavyweight', '"Sseda"')]
-    #f_list  = [('Askar Askar', 'Bantamweight', 'NA'), ('Da-un Jung', 'Light Heavyweight', '"Sseda"')]
-    #f_list = [('Da-un Jung', 'Light Heavyweight', '"Sseda"')]
-    #f_list = [('Steve Garcia', 'Featherweight', 'NA')]
-    scrape_list_of_fighters(f_list, 'ufc-roster-7', filetype='json')
-    #find_sherdog_url_with_google(('Jeffrey Molina', 'Flyweight', 'NA'))
-    #find_sherdog_url_with_google(('Askar Askar', 'Bantamweight', 'NA'))
\ No newline at end of file
+    main()
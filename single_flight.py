@@ -0,0 +1,76 @@
+# Python 3.7
+# appendix to sherdog-parser.py
+# Created by - Montanaz0r (https://github.com/Montanaz0r)
+# Single-flight coalescing of duplicate requests. Scraping threads often ask for the same url at the same time -
+# duplicate roster entries, name searches matching the same person, or opponents crawled from several fighters.
+# The first thread asking for a key runs the work (download and parse), threads asking for the same key while it is
+# in flight wait for it and share its result, or its exception, instead of sending the same request again. Nothing is
+# cached once the work is done, so later requests always see a fresh page.
+
+import threading
+
+
+class _Flight(object):
+    """_Flight class - one piece of work in progress and its outcome.
+    """
+
+    def __init__(self):
+        """
+        Initializes a _Flight instance.
+        """
+        self.done = threading.Event()  # Event: set once result or error is known
+        self.result = None  # value returned by the work, None by default
+        self.error = None  # exception raised by the work, None if it has succeeded
+
+
+class SingleFlight(object):
+    """SingleFlight class - runs concurrent calls for the same key only once.
+    """
+
+    def __init__(self):
+        """
+        Initializes a SingleFlight instance.
+        """
+        self.lock = threading.Lock()
+        self.flights = {}  # dictionary: key -> _Flight instance of work in progress
+        self.calls = 0  # int: works actually run
+        self.saved = 0  # int: calls which shared result of another call instead of running the work
+
+    def do(self, key, function):
+        """
+        Runs function, unless work for the same key is already in flight - then waits for it and shares its outcome.
+        :param key: hashable key of the work, for instance url
+        :param function: function without arguments doing the work
+        :return: value returned by function, exception raised by function is raised in every waiting thread as well
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+                self.calls += 1
+            else:
+                self.saved += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = function()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result
+
+    def stats(self):
+        """
+        Reports how many calls were coalesced.
+        :return: dictionary with 'calls' (works run) and 'saved' (requests saved by sharing) counts
+        """
+        with self.lock:
+            return {'calls': self.calls, 'saved': self.saved}
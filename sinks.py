@@ -0,0 +1,257 @@
+# Python 3.7
+# appendix to sherdog-parser.py
+# Created by - Montanaz0r (https://github.com/Montanaz0r)
+# Fan-out export. One scrape pass can feed several outputs at once - csv, json lines and sqlite database. Every sink
+# runs in its own thread behind its own bounded buffer: scraping threads only put fighter records into buffers, so a
+# slow sink does not slow down fetching until its buffer is full (then it applies backpressure to scraping threads).
+# Errors are handled per sink - a failing sink logs the error, counts dropped records and is switched off after
+# too many errors, while other sinks and the scrape itself go on.
+#
+# Sinks are given as 'kind:path' specs, for instance 'csv:sherdog.csv.gz', 'jsonl:sherdog.jsonl' or 'sqlite:sherdog.db'.
+
+import csv
+import json
+import logging
+import os
+import queue
+import threading
+
+from compressed_io import compression_from_path, open_output
+
+CSV_HEADERS = ['Fighter', 'Opponent', 'Result', 'Event', 'Event_date', 'Method', 'Referee', 'Round', 'Time',
+               'Event_day', 'Round_number', 'Fight_seconds', 'Fighter_url', 'Scraped_at']
+BUFFER_SIZE = 256  # records buffered per sink before scraping threads have to wait.
+BATCH_SIZE = 64  # records written at once.
+MAX_ERRORS = 10  # failed batches after which sink is switched off.
+_stop = object()
+
+
+class Sink(object):
+    """Sink class - base of buffered outputs, subclasses implement _open, _write_batch and _close.
+    """
+
+    def __init__(self, path, buffer_size=BUFFER_SIZE, batch_size=BATCH_SIZE, max_errors=MAX_ERRORS, append=False):
+        """
+        Initializes a Sink instance and starts its writer thread.
+        :param path: string with path to the output
+        :param buffer_size: integer with maximum number of records waiting in buffer
+        :param batch_size: integer with maximum number of records written at once
+        :param max_errors: integer with number of failed batches after which sink is switched off
+        :param append: boolean, if True existing output is appended to instead of being overwritten (resumed crawl)
+        """
+        self.path = path
+        self.append = append
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.buffer = queue.Queue(maxsize=buffer_size)
+        self.written = 0  # int: records written successfully
+        self.dropped = 0  # int: records lost because of errors
+        self.errors = 0  # int: failed batches
+        self.disabled = False  # boolean: True after max_errors, remaining records are dropped
+        self.thread = threading.Thread(target=self._run, name=f'{type(self).__name__}({path})', daemon=True)
+        self.thread.start()
+
+    def put(self, record):
+        """
+        Adds record to the buffer, blocks while the buffer is full.
+        :param record: dictionary with fighter's data made by Fighter.to_record
+        :return: None
+        """
+        self.buffer.put(record)
+
+    def close(self):
+        """
+        Writes everything left in the buffer and closes the output.
+        :return: dictionary with 'written', 'dropped' and 'errors' counts
+        """
+        self.buffer.put(_stop)
+        self.thread.join()
+        return {'written': self.written, 'dropped': self.dropped, 'errors': self.errors}
+
+    def _run(self):
+        """
+        Supporting method run by writer thread - collects records into batches and writes them until close is called.
+        :return: None
+        """
+        opened = False
+        try:
+            self._open()
+            opened = True
+        except Exception as e:
+            self._fail(f'Could not open {self.path}: {e!r}', disable=True)
+        stopping = False
+        while not stopping:
+            batch = [self.buffer.get()]
+            while len(batch) < self.batch_size and not self.buffer.empty():
+                batch.append(self.buffer.get())
+            if batch[-1] is _stop:
+                batch.pop()
+                stopping = True
+            if not batch:
+                continue
+            if self.disabled:
+                self.dropped += len(batch)
+                continue
+            try:
+                self._write_batch(batch)
+                self.written += len(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                self._fail(f'Writing {len(batch)} records to {self.path} failed: {e!r}')
+        try:
+            if opened:
+                self._close()
+        except Exception as e:
+            self._fail(f'Could not close {self.path}: {e!r}')
+
+    def _fail(self, message, disable=False):
+        """
+        Supporting method recording sink error.
+        :param message: string with error description
+        :param disable: boolean, if True sink is switched off right away
+        :return: None
+        """
+        self.errors += 1
+        print(message)
+        logging.info(message)
+        if disable or self.errors >= self.max_errors:
+            if not self.disabled:
+                logging.info(f'Sink {self.path} switched off after {self.errors} errors!')
+            self.disabled = True
+
+    def _open(self):
+        pass
+
+    def _write_batch(self, records):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+
+class CsvSink(Sink):
+    """CsvSink class - writes fights in the same layout as csv output of sherdog-parser.py.
+    """
+
+    def _open(self):
+        appending = self.append and os.path.exists(self.path) and os.path.getsize(self.path) > 0
+        self.file = open_output(self.path, 'a' if appending else 'w', compression_from_path(self.path),
+                                encoding='ISO-8859-1', newline='')
+        self.writer = csv.writer(self.file, delimiter=';')
+        if not appending:  # headers are already in the file written before the crawl was interrupted.
+            self.writer.writerow(CSV_HEADERS)
+
+    def _write_batch(self, records):
+        for record in records:
+            for fight in record['fightHistoryPro']:
+                try:
+                    self.writer.writerow([record['name'], fight['opponent'], fight['result'], fight['event'],
+                                          fight['date'], fight['method'], fight['judge'], fight['round'],
+                                          fight['time'], fight['dateDay'], fight['roundNumber'], fight['fightSeconds'],
+                                          record['fighterUrl'], record['scrapedAt']])
+                except UnicodeEncodeError:
+                    print(f'Coding error while attempting to save date for {record["name"]}, line was dropped!')
+        self.file.flush()
+
+    def _close(self):
+        self.file.close()
+
+
+class JsonLinesSink(Sink):
+    """JsonLinesSink class - writes one json object per fighter per line.
+    """
+
+    def _open(self):
+        self.file = open_output(self.path, 'a' if self.append else 'w', compression_from_path(self.path),
+                                encoding='utf-8')
+
+    def _write_batch(self, records):
+        self.file.write(''.join(json.dumps(record) + '\n' for record in records))
+        self.file.flush()
+
+    def _close(self):
+        self.file.close()
+
+
+class SqliteSink(Sink):
+    """SqliteSink class - writes fighters and their fights to sqlite database, rescraped fighters are replaced.
+    """
+
+    _schema = '''
+    CREATE TABLE IF NOT EXISTS fighters (fighter_url TEXT PRIMARY KEY, name TEXT, nick_name TEXT, gender TEXT,
+        birth_day INTEGER, height_cm REAL, weight_kg REAL, weight_class TEXT, wins INTEGER, losses INTEGER,
+        draws INTEGER, no_contests INTEGER, scraped_at INTEGER, record TEXT);
+    CREATE TABLE IF NOT EXISTS fights (fighter_url TEXT NOT NULL, opponent TEXT, opponent_url TEXT, result TEXT,
+        event TEXT, event_url TEXT, date TEXT, event_day INTEGER, method TEXT, referee TEXT, round TEXT, time TEXT,
+        round_number INTEGER, fight_seconds INTEGER);
+    CREATE INDEX IF NOT EXISTS fights_fighter ON fights (fighter_url);
+    '''
+
+    def _open(self):
+        import sqlite3  # imported only when sqlite sink is used, csv headers are imported by sherdog-parser.py.
+        self.connection = sqlite3.connect(self.path)  # created in writer thread, used only there.
+        self.connection.executescript(self._schema)
+
+    def _write_batch(self, records):
+        with self.connection:
+            for record in records:
+                self.connection.execute('DELETE FROM fights WHERE fighter_url = ?', (record['fighterUrl'],))
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO fighters VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (record['fighterUrl'], record['name'], record['nickName'], record['gender'], record['birthDay'],
+                     record['heightCm'], record['weightKg'], record['weightClass'], record['wins'], record['losses'],
+                     record['draws'], record['noContests'], record['scrapedAt'], json.dumps(record)))
+                self.connection.executemany(
+                    'INSERT INTO fights VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(record['fighterUrl'], fight['opponent'], fight['opponentUrl'], fight['result'], fight['event'],
+                      fight['eventUrl'], fight['date'], fight['dateDay'], fight['method'], fight['judge'],
+                      fight['round'], fight['time'], fight['roundNumber'], fight['fightSeconds'])
+                     for fight in record['fightHistoryPro']])
+
+    def _close(self):
+        self.connection.close()
+
+
+SINKS = {'csv': CsvSink, 'jsonl': JsonLinesSink, 'sqlite': SqliteSink}
+
+
+def open_sink(spec, append=False):
+    """
+    Creates sink from 'kind:path' spec.
+    :param spec: string, for instance 'jsonl:sherdog.jsonl.gz'
+    :param append: boolean, if True existing output is appended to instead of being overwritten
+    :return: Sink instance
+    """
+    kind, _, path = spec.partition(':')
+    if kind not in SINKS or not path:
+        raise ValueError(f'Unknown sink {spec}, please use kind:path with kind one of {list(SINKS)}!')
+    return SINKS[kind](path, append=append)
+
+
+class FanOut(object):
+    """FanOut class - passes every fighter record to several sinks.
+    """
+
+    def __init__(self, sinks, append=False):
+        """
+        Initializes a FanOut instance.
+        :param sinks: list of Sink instances or 'kind:path' specs
+        :param append: boolean, if True sinks given as specs append to existing outputs (resumed crawl)
+        """
+        self.sinks = [open_sink(sink, append) if isinstance(sink, str) else sink for sink in sinks]
+
+    def emit(self, record):
+        """
+        Puts record into buffer of every sink.
+        :param record: dictionary with fighter's data made by Fighter.to_record
+        :return: None
+        """
+        for sink in self.sinks:
+            sink.put(record)
+
+    def close(self):
+        """
+        Flushes and closes all sinks.
+        :return: dictionary sink path -> dictionary with 'written', 'dropped' and 'errors' counts
+        """
+        return {sink.path: sink.close() for sink in self.sinks}
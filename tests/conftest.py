@@ -0,0 +1,42 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+# modules of this repository live in its top directory, next to sherdog-parser.py.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+_sherdog = None
+
+
+@pytest.fixture
+def sherdog():
+    """sherdog-parser.py module (its name is not importable), saved fighters and buffered rows are dropped."""
+    global _sherdog
+    if _sherdog is None:
+        spec = importlib.util.spec_from_file_location('sherdog_parser', os.path.join(ROOT, 'sherdog-parser.py'))
+        _sherdog = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_sherdog)
+    _sherdog.allfighters['fighters'].clear()
+    _sherdog.buffered_outputs.clear()
+    return _sherdog
+
+
+@pytest.fixture
+def make_fighter(sherdog):
+    """Builds Fighter instance with extracted data, as if its profile was scraped."""
+    def make_fighter(name, fights=(), url=None, scraped_at=None):
+        F = sherdog.Fighter()
+        F.name, F.url, F.scraped_at = name, url, scraped_at
+        F.association_names, F.association_urls = [], []
+        columns = list(zip(*fights)) or [()] * 5
+        F.opponents, F.result_data, F.events_date, F.rounds, F.time = (list(column) for column in columns)
+        F.opponent_urls = [f'/fighter/{opponent.replace(" ", "-")}' for opponent in F.opponents]
+        F.events = [f'Event {number}' for number in range(len(F.opponents))]
+        F.event_urls = ['/events/1'] * len(F.opponents)
+        F.method = ['KO'] * len(F.opponents)
+        F.judges = ['N/A'] * len(F.opponents)
+        F.normalize_fields()
+        return F
+    return make_fighter
@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import analytics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def fighters(make_fighter):
+    zed = make_fighter('Zed', [('Bob', 'win', 'Jan / 02 / 2008', '2', '1:00'),
+                               ('Amy', 'win', 'Jan / 02 / 2007', '3', '5:00'),
+                               ('Bob', 'loss', 'Jan / 02 / 2006', '1', '0:30'),
+                               ('Cid', 'win', 'Jan / 02 / 2005', '', '')], url='/fighter/Zed-1')
+    zed.method = ['TKO (Punches)', 'Decision (Unanimous)', 'Submission (Armbar)', 'KO (Punch)']
+    bob = make_fighter('Bob', [('Zed', 'loss', 'Jan / 02 / 2008', '2', '1:00'),
+                               ('Zed', 'win', 'Jan / 02 / 2006', '1', '0:30')], url='/fighter/Bob-2')
+    return [zed, bob]
+
+
+def load(sherdog, fighters, tmp_path, filetype):
+    filename = str(tmp_path / 'out')
+    if filetype == 'csv':
+        for F in fighters:
+            F.save_to_csv(filename)
+    else:
+        for F in fighters:
+            F.save_data()
+        with open(f'{filename}.json', 'w') as fighter_json:
+            json.dump(sherdog.allfighters, fighter_json)
+    return analytics.load_fights(f'{filename}.{filetype}')
+
+
+@pytest.mark.parametrize('filetype', ['csv', 'json'])
+def test_career_stats(sherdog, fighters, tmp_path, filetype):
+    table = load(sherdog, fighters, tmp_path, filetype)
+    assert list(table.fighters) == ['/fighter/Bob-2', '/fighter/Zed-1']
+    assert list(table.fighter_names) == ['Bob', 'Zed']
+    stats = {column: list(values) for column, values in analytics.compute_career_stats(table).items()}
+    assert stats['wins'] == [1, 3] and stats['losses'] == [1, 1]
+    assert stats['wins_ko_tko'] == [1, 2] and stats['wins_decision'] == [0, 1]
+    assert stats['losses_submission'] == [0, 1]
+    assert stats['win_finish_rate'] == [1.0, 2 / 3]
+    assert stats['current_streak'] == [-1, 2] and stats['longest_win_streak'] == [1, 2]
+    assert stats['max_gap_days'] == [730, 365]
+    # Cid fight has no round & time, it is left out of cage time.
+    assert stats['fight_seconds'] == [360 + 30, 360 + 900 + 30]
+    assert stats['mean_fight_seconds'] == [195.0, 430.0]
+    assert stats['mean_finish_round'] == [1.0, 2.0]
+
+
+def test_pair_records(sherdog, fighters, tmp_path):
+    table = load(sherdog, fighters, tmp_path, 'csv')
+    records = analytics.compute_pair_records(table)
+    zed_bob = [index for index in range(len(records['fighter']))
+               if table.fighters[records['fighter'][index]] == '/fighter/Zed-1'
+               and table.opponents[records['counterpart'][index]] == 'Bob']
+    assert [(records['win'][index], records['loss'][index]) for index in zed_bob] == [(1, 1)]
+
+
+def test_stats_file_name_drops_compression_suffix(sherdog, fighters, tmp_path):
+    for F in fighters:
+        F.save_to_csv(str(tmp_path / 'out'), 'gzip')
+    sherdog.flush_outputs()
+    subprocess.run([sys.executable, os.path.join(ROOT, 'analytics.py'), 'out.csv.gz'], cwd=tmp_path, check=True,
+                   stdout=subprocess.DEVNULL)
+    header, bob, zed = [row.split(';') for row in (tmp_path / 'out-stats.csv').read_text().splitlines()]
+    assert zed[:4] == ['Zed', '/fighter/Zed-1', '4', '3']
+    assert np.isclose(float(zed[header.index('mean_finish_round')]), 2.0)
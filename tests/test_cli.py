@@ -0,0 +1,64 @@
+import pytest
+
+COMMANDS = ('scrape_ufc_roster', 'scrape_list_of_fighters', 'scrape_recrawl', 'scrape_failed_fighters',
+            'scrape_leased_fighters', 'export_record_cache', 'scrape_all_fighters')
+
+
+@pytest.fixture
+def calls(sherdog, monkeypatch):
+    # every command function only records its arguments, nothing is scraped or logged.
+    calls = []
+    for name in COMMANDS:
+        monkeypatch.setattr(sherdog, name, lambda *args, _name=name, **kwargs: calls.append((_name, args, kwargs)))
+    monkeypatch.setattr(sherdog, 'setup_logging', lambda filename: calls.append(('setup_logging', filename)))
+    monkeypatch.setattr(sherdog, 'MAX_THREADS', sherdog.MAX_THREADS)
+    return calls
+
+
+def test_roster_gets_global_options(sherdog, calls):
+    sherdog.main(['--threads', '3', '--format', 'json', '--compression', 'gzip', '--log-file', 'x.log', 'roster'])
+    assert calls == [('setup_logging', 'x.log'),
+                     ('scrape_ufc_roster', (), {'save': 'yes', 'filetype': 'json', 'compression': 'gzip'})]
+    assert sherdog.MAX_THREADS == 3
+
+
+def test_list_reads_roster_file(sherdog, calls, tmp_path):
+    roster = tmp_path / 'roster.csv'
+    roster.write_text('Name,Division,Nickname\nZed,Lightweight,Z\n')
+    sherdog.main(['--sink', 'jsonl:out.jsonl', 'list', str(roster), '--gender', 'women', '-o', 'out'])
+    [(name, (fighters_list, output), kwargs)] = calls[1:]
+    assert (name, output) == ('scrape_list_of_fighters', 'out')
+    assert fighters_list == {'men': [], 'women': [['Zed', 'Lightweight', 'Z']]}
+    assert kwargs['gender'] == 'women' and kwargs['sinks'] == ['jsonl:out.jsonl']
+    assert kwargs['dead_letter_file'] == 'out-failed.jsonl'
+
+
+def test_resume_uses_default_bitmap(sherdog, calls):
+    sherdog.main(['--dead-letter', 'failed.jsonl', 'resume', '-o', 'crawl'])
+    [(name, (output,), kwargs)] = calls[1:]
+    assert (name, output) == ('scrape_all_fighters', 'crawl')
+    assert kwargs['bitmap_file'] == 'crawl-ids.bin' and kwargs['resume']
+    assert kwargs['dead_letter_file'] == 'failed.jsonl'
+
+
+@pytest.mark.parametrize('argv, name, source', [(['recrawl', 'old.csv', '--budget', '5'], 'scrape_recrawl', 'old.csv'),
+                                                (['retry-failed', 'failed.jsonl'], 'scrape_failed_fighters',
+                                                 'failed.jsonl'),
+                                                (['worker', 'crawl.db'], 'scrape_leased_fighters', 'crawl.db'),
+                                                (['all'], 'scrape_all_fighters', 'sherdog')])
+def test_subcommand_dispatch(sherdog, calls, argv, name, source):
+    sherdog.main(['--record-cache', 'records.db'] + argv)
+    [(called, args, kwargs)] = calls[1:]
+    assert (called, args[0], kwargs['record_cache_file']) == (name, source, 'records.db')
+
+
+def test_export_cache_makes_no_requests(sherdog, calls):
+    sherdog.main(['--gyms', 'gyms.json', 'export-cache', 'records.db', '-o', 'out'])
+    assert calls[1] == ('export_record_cache', ('records.db', 'out'),
+                        {'filetype': 'csv', 'compression': None, 'gyms_file': 'gyms.json', 'sinks': None})
+
+
+def test_command_is_required(sherdog, calls):
+    with pytest.raises(SystemExit):
+        sherdog.main(['--threads', '2'])
+    assert calls == []
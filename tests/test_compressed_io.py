@@ -0,0 +1,92 @@
+import gzip
+import json
+
+import pytest
+
+from compressed_io import BufferedAppender, open_input, open_output, open_replacement
+
+
+def test_truncated_gzip_member_is_read_up_to_last_complete_line(tmp_path):
+    path = str(tmp_path / 'out.csv.gz')
+    for member in range(3):
+        with open_output(path, 'a', 'gzip', newline='') as output_file:
+            output_file.write(''.join(f'row {member}-{line}\n' for line in range(1000)))
+    data = open(path, 'rb').read()
+    with open_input(path) as input_file:
+        assert input_file.read() == gzip.open(path, 'rt').read()
+
+    open(path, 'wb').write(data[:-40])  # crash while the last member was written.
+    with pytest.raises(EOFError):
+        gzip.open(path, 'rt').read()
+    with open_input(path) as input_file:
+        lines = input_file.read().split('\n')
+    assert lines[-1] == ''
+    assert lines[:2000] == [f'row {member}-{line}' for member in range(2) for line in range(1000)]
+    assert 2000 < len(lines) - 1 < 3000 and lines[-2].startswith('row 2-')
+
+
+def test_binary_input(tmp_path):
+    path = str(tmp_path / 'out.json.gz')
+    with open_output(path, 'w', 'gzip', encoding='utf-8') as output_file:
+        output_file.write('{\n    "a": []\n}')
+    with open_input(path, binary=True) as input_file:
+        assert input_file.readline() == b'{\n'
+
+
+def test_appender_writes_member_per_many_records(tmp_path, monkeypatch):
+    buffered, separate = str(tmp_path / 'buffered.csv.gz'), str(tmp_path / 'separate.csv.gz')
+    appender = BufferedAppender(buffered, 'gzip', member_bytes=4096)
+    for record in range(500):
+        rows = ''.join(f'Fighter {record};Opponent {fight};win;UFC {fight}\r\n' for fight in range(5))
+        appender.write(rows)
+        appender.end_record()
+        with open_output(separate, 'a', 'gzip', newline='') as output_file:
+            output_file.write(rows)
+    appender.close()
+    with open_input(buffered, newline='') as buffered_file, open_input(separate, newline='') as separate_file:
+        assert buffered_file.read() == separate_file.read()
+    assert len(open(buffered, 'rb').read()) * 4 < len(open(separate, 'rb').read())
+
+
+def test_appender_raises_encoding_errors_on_write(tmp_path):
+    appender = BufferedAppender(str(tmp_path / 'out.csv.gz'), 'gzip', encoding='ISO-8859-1')
+    with pytest.raises(UnicodeEncodeError):
+        appender.write('ÐœА\n')
+    assert appender.size == 0
+
+
+def test_replacement_keeps_old_file_on_error(tmp_path):
+    path = str(tmp_path / 'out.json.gz')
+    with open_replacement(path, 'gzip') as output_file:
+        json.dump({'a': []}, output_file)
+    with pytest.raises(RuntimeError):
+        with open_replacement(path, 'gzip') as output_file:
+            output_file.write('{"b": ')
+            raise RuntimeError('crash')
+    with open_input(path) as input_file:
+        assert json.load(input_file) == {'a': []}
+    assert [entry.name for entry in tmp_path.iterdir()] == ['out.json.gz']
+
+
+def test_compressed_csv_output_is_buffered(sherdog, make_fighter, tmp_path):
+    filename = str(tmp_path / 'out')
+    with open_output(f'{filename}.csv.gz', 'w', 'gzip', newline='') as csvfile:
+        csvfile.write('header\r\n')
+    for number in range(3):
+        make_fighter(f'F{number}', [('A', 'win', 'Mar / 20 / 2005', '1', '3:24')]).save_to_csv(filename, 'gzip')
+    with open_input(f'{filename}.csv.gz', newline='') as csvfile:
+        assert csvfile.read() == 'header\r\n'  # rows wait until a member is full or the run ends.
+    sherdog.flush_outputs()
+    with open_input(f'{filename}.csv.gz', newline='', encoding='ISO-8859-1') as csvfile:
+        assert [line.split(';')[0] for line in csvfile.read().splitlines()] == ['header', 'F0', 'F1', 'F2']
+
+
+def test_all_crawl_json_is_replaced(sherdog, make_fighter, tmp_path):
+    filename = str(tmp_path / 'all')
+    with open_output(f'{filename}.json.gz', 'w', 'gzip') as fighter_json:
+        json.dump({}, fighter_json)
+    make_fighter('Zed').save_to_json(filename, 'gzip')
+    make_fighter('Bob').save_to_json(filename, 'gzip')
+    with open_input(f'{filename}.json.gz') as fighter_json:
+        assert json.load(fighter_json) == {'Zed': [], 'Bob': []}
+    assert sorted(entry.name for entry in tmp_path.iterdir()) == ['all.json.gz']
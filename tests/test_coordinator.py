@@ -0,0 +1,143 @@
+import collections
+import multiprocessing
+
+import pytest
+
+import coordinator
+import retry_queue
+from coordinator import CrawlCoordinator
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(coordinator.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'crawl.db')
+
+
+def test_id_range_is_split_into_units(db_path):
+    crawl = CrawlCoordinator(db_path)
+    crawl.add_id_range(0, 1050, unit_size=500)
+    units = [crawl.claim('w1') for _ in range(3)]
+    assert [(unit.kind, unit.start, unit.stop) for unit in units] == [('range', 0, 500), ('range', 500, 1000),
+                                                                       ('range', 1000, 1050)]
+    assert crawl.claim('w1') is None
+    assert crawl.progress() == {'pending': 0, 'leased': 3, 'done': 0}
+
+
+def test_url_units_keep_urls(db_path):
+    crawl = CrawlCoordinator(db_path)
+    crawl.add_urls(['/fighter/A-1', '/fighter/B-2', '/fighter/C-3'], unit_size=2)
+    assert crawl.claim('w1').urls == ['/fighter/A-1', '/fighter/B-2']
+    assert crawl.claim('w1').urls == ['/fighter/C-3']
+
+
+def test_leased_unit_is_not_handed_out_twice(db_path, clock):
+    crawl = CrawlCoordinator(db_path, lease_seconds=60)
+    crawl.add_id_range(0, 10, unit_size=10)
+    assert crawl.claim('w1') is not None
+    clock[0] += 59
+    assert crawl.claim('w2') is None
+
+
+def test_expired_lease_goes_to_another_worker(db_path, clock):
+    crawl = CrawlCoordinator(db_path, lease_seconds=60)
+    crawl.add_id_range(0, 10, unit_size=10)
+    first = crawl.claim('w1')
+    clock[0] += 61
+    second = crawl.claim('w2')
+    assert second.id == first.id
+    assert second.attempts == 2
+    # the first worker lost its lease, it can neither extend nor complete the unit.
+    assert not crawl.heartbeat(first.id, 'w1')
+    assert not crawl.complete(first.id, 'w1')
+    assert crawl.complete(second.id, 'w2')
+    assert crawl.progress() == {'pending': 0, 'leased': 0, 'done': 1}
+
+
+def test_heartbeat_extends_lease(db_path, clock):
+    crawl = CrawlCoordinator(db_path, lease_seconds=60)
+    crawl.add_id_range(0, 10, unit_size=10)
+    unit = crawl.claim('w1')
+    for _ in range(5):
+        clock[0] += 50
+        assert crawl.heartbeat(unit.id, 'w1')
+    assert crawl.claim('w2') is None
+
+
+def test_release_and_recover_expired(db_path, clock):
+    crawl = CrawlCoordinator(db_path, lease_seconds=60)
+    crawl.add_id_range(0, 20, unit_size=10)
+    first, second = crawl.claim('w1'), crawl.claim('w1')
+    assert crawl.release(first.id, 'w1')
+    assert crawl.progress() == {'pending': 1, 'leased': 1, 'done': 0}
+    clock[0] += 61
+    assert crawl.recover_expired() == 1
+    assert crawl.progress() == {'pending': 2, 'leased': 0, 'done': 0}
+    assert not crawl.release(second.id, 'w1')
+
+
+def _claim_all(args):
+    db_path, worker_id = args
+    crawl = CrawlCoordinator(db_path)
+    claimed = []
+    while True:
+        unit = crawl.claim(worker_id)
+        if unit is None:
+            break
+        claimed.append(unit.id)
+        assert crawl.complete(unit.id, worker_id)
+    crawl.close()
+    return claimed
+
+
+def test_workers_in_separate_processes_claim_every_unit_once(db_path):
+    crawl = CrawlCoordinator(db_path)
+    crawl.add_id_range(0, 2000, unit_size=10)
+    crawl.close()
+    with multiprocessing.get_context('spawn').Pool(4) as pool:
+        claimed = pool.map(_claim_all, [(db_path, f'w{number}') for number in range(4)])
+    units = [unit for worker in claimed for unit in worker]
+    assert sorted(units) == list(range(1, 201))
+    assert CrawlCoordinator(db_path).progress() == {'pending': 0, 'leased': 0, 'done': 200}
+
+
+def test_worker_retries_transient_errors(sherdog, db_path, tmp_path, monkeypatch):
+    crawl = CrawlCoordinator(db_path)
+    crawl.add_id_range(0, 4, unit_size=2)
+    crawl.close()
+    monkeypatch.setattr('retry_queue.time.sleep', lambda seconds: None)
+    calls = collections.Counter()
+
+    def scrape_fighter(self, filetype, filename, fighter_index=None, **kwargs):
+        calls[fighter_index] += 1
+        if fighter_index == 2 or (fighter_index == 1 and calls[1] == 1):
+            raise sherdog.TransientError('503')
+        self.name, self.validation, self.saved = f'fighter {fighter_index}', True, True
+        return True
+
+    monkeypatch.setattr(sherdog.Fighter, 'scrape_fighter', scrape_fighter)
+    failed = str(tmp_path / 'failed.jsonl')
+    assert sherdog.scrape_leased_fighters(db_path, str(tmp_path / 'worker'), dead_letter_file=failed) == 2
+    assert calls == {0: 1, 1: 2, 2: retry_queue.RETRY_ATTEMPTS, 3: 1}
+    assert [record['payload'] for record in sherdog.RetryQueue(failed).pending()] == [2]
+    assert CrawlCoordinator(db_path).progress() == {'pending': 0, 'leased': 0, 'done': 2}
+
+
+def test_worker_releases_unit_on_fatal_error(sherdog, db_path, tmp_path, monkeypatch):
+    crawl = CrawlCoordinator(db_path)
+    crawl.add_id_range(0, 2, unit_size=2)
+    crawl.close()
+
+    def scrape_fighter(self, *args, **kwargs):
+        raise RuntimeError('parser bug')
+
+    monkeypatch.setattr(sherdog.Fighter, 'scrape_fighter', scrape_fighter)
+    with pytest.raises(RuntimeError):
+        sherdog.scrape_leased_fighters(db_path, str(tmp_path / 'worker'))
+    assert CrawlCoordinator(db_path).progress() == {'pending': 1, 'leased': 0, 'done': 0}
@@ -0,0 +1,25 @@
+from gyms import GymTable
+from normalize import normalize_name
+
+
+def test_normalize_name():
+    assert normalize_name('José  Aldo') == normalize_name('jose aldo') == 'jose aldo'
+    assert normalize_name(None) == ''
+
+
+def test_members_are_registered_once(tmp_path):
+    path = str(tmp_path / 'gyms.json')
+    table = GymTable(path)
+    first = table.register_fighter(['Team Alpha Male', 'Nova União'], ['/gym/Team-Alpha-Male-1', None], '/fighter/A-1')
+    assert first == [1, 2]
+    assert table.register('Team Alpha Male', '/gym/Team-Alpha-Male-1', '/fighter/A-1') == 1
+    table.save()
+
+    table = GymTable(path)
+    table.register('Team Alpha Male', 'https://www.sherdog.com/gym/Team-Alpha-Male-1', '/fighter/A-1')
+    table.register('Team Alpha Male', '/gym/Team-Alpha-Male-1', '/fighter/B-2')
+    gym = table.find(url='/gym/Team-Alpha-Male-1')
+    assert gym['fighters'] == ['/fighter/A-1', '/fighter/B-2']
+    gym['roster'] = ['/fighter/B-2', '/fighter/C-3']
+    assert table.fighters_of(gym) == ['/fighter/A-1', '/fighter/B-2', '/fighter/C-3']
+    assert table.find(name='nova uniao')['gymId'] == 2
@@ -0,0 +1,76 @@
+import csv
+
+import pytest
+
+from compressed_io import open_input
+from id_bitmap import EMPTY, UNKNOWN, VALID, IdBitmap, probe_upper_bound
+
+
+def test_states_are_saved_and_loaded(tmp_path):
+    path = str(tmp_path / 'ids.bin')
+    bitmap = IdBitmap(path)
+    for index, state in ((0, EMPTY), (1, VALID), (6, VALID), (7, EMPTY)):
+        bitmap.set(index, state)
+    bitmap.save()
+    loaded = IdBitmap(path)
+    assert [loaded.get(index) for index in range(9)] == [EMPTY, VALID, UNKNOWN, UNKNOWN, UNKNOWN, UNKNOWN, VALID,
+                                                          EMPTY, UNKNOWN]
+    assert loaded.last_valid() == 6
+    assert loaded.counts() == {'unknown': 4, 'empty': 2, 'valid': 2}
+
+
+def test_journal_is_replayed_after_crash(tmp_path):
+    path = str(tmp_path / 'ids.bin')
+    bitmap = IdBitmap(path)
+    bitmap.mark_valid(1)
+    bitmap.save()
+    bitmap.mark_empty(2)
+    bitmap.mark_valid(9)
+    bitmap.flush()
+    bitmap.mark_valid(10)  # not flushed before the crash.
+    with open(f'{path}.log', 'ab') as journal_file:
+        journal_file.write(b'\x0b\x00')  # entry cut short by the crash.
+    loaded = IdBitmap(path)
+    assert [loaded.get(index) for index in (1, 2, 9, 10, 11)] == [VALID, EMPTY, VALID, UNKNOWN, UNKNOWN]
+    assert loaded.last_valid() == 9
+    loaded.save()
+    assert not (tmp_path / 'ids.bin.log').exists()
+    assert IdBitmap(path).get(9) == VALID
+
+
+def test_probe_finds_end_of_id_space():
+    valid = set(range(1, 5000, 3)) - set(range(2000, 2030))  # gap shorter than window does not end id space.
+    upper = probe_upper_bound(lambda index: index in valid, start=1, window=50)
+    assert max(valid) < upper <= max(valid) + 2 * 50
+
+
+def crawl(sherdog, make_fighter, monkeypatch, filename, compression, crash_at=None, resume=False):
+    scraped = []
+
+    def scrape_with_retry(retry_queue, work, filetype, filename, fighter_index=None, compression=None, **kwargs):
+        if fighter_index == crash_at:
+            raise KeyboardInterrupt
+        scraped.append(fighter_index)
+        if fighter_index >= 7:
+            return sherdog.Fighter()  # empty profile.
+        F = make_fighter(f'F{fighter_index}', [('A', 'win', 'Mar / 20 / 2005', '1', '3:24')],
+                         url=f'/fighter/index?id={fighter_index}.')
+        F.save_to_csv(filename, compression)
+        return F
+
+    monkeypatch.setattr(sherdog, 'scrape_with_retry', scrape_with_retry)
+    sherdog.scrape_all_fighters(filename, compression=compression, bitmap_file=f'{filename}-ids.bin', resume=resume)
+    return scraped
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_resume_after_crash_does_not_repeat_fighters(sherdog, make_fighter, tmp_path, monkeypatch, compression):
+    filename = str(tmp_path / 'sherdog')
+    with pytest.raises(KeyboardInterrupt):
+        crawl(sherdog, make_fighter, monkeypatch, filename, compression, crash_at=5)
+    sherdog.buffered_outputs.clear()  # rows which were not written yet die with the process.
+    scraped = crawl(sherdog, make_fighter, monkeypatch, filename, compression, resume=True)
+    assert scraped[0] == (5 if compression is None else 0)  # compressed rows were still waiting in memory.
+    with open_input(sherdog.output_path(filename, 'csv', compression), newline='', encoding='ISO-8859-1') as csvfile:
+        names = [row[0] for row in csv.reader(csvfile, delimiter=';')][1:]
+    assert names == [f'F{index}' for index in range(7)]
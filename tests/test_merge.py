@@ -0,0 +1,105 @@
+import json
+
+import pytest
+
+import merge
+
+
+def all_crawl_json(sherdog, path, fighters):
+    # the same way scrape_all_fighters writes it - empty file first, then save_to_json for every fighter.
+    filename = str(path)[:-len('.json')]
+    with open(path, 'w') as fighter_json:
+        json.dump({}, fighter_json)
+    for F in fighters:
+        F.save_to_json(filename)
+    return str(path)
+
+
+def list_json(sherdog, path, fighters):
+    # the same way scrape_list_of_fighters writes it.
+    for F in fighters:
+        F.save_data()
+    with open(path, 'w') as fighter_json:
+        json.dump(sherdog.allfighters, fighter_json, indent=4)
+    sherdog.allfighters['fighters'].clear()
+    return str(path)
+
+
+def test_reads_all_crawl_json(sherdog, make_fighter, tmp_path):
+    path = all_crawl_json(sherdog, tmp_path / 'all.json', [
+        make_fighter('Zed', [('A', 'win', 'Mar / 20 / 2005', '1', '3:24'),
+                             ('B', 'loss', 'Jun / 24 / 2000', '2', '0:07')]),
+        make_fighter('Bob'),
+    ])
+    fighters = {fighter[0]: fighter[1] for key, timestamp, fighter in merge.iter_fighters(path)}
+    assert fighters == json.load(open(path))
+    assert [fight['opponent'] for fight in fighters['Zed']] == ['A', 'B']
+
+
+def test_merges_all_crawl_json(sherdog, make_fighter, tmp_path):
+    first = all_crawl_json(sherdog, tmp_path / 'first.json', [
+        make_fighter('Zed', [('A', 'win', 'Mar / 20 / 2005', '1', '3:24')]), make_fighter('Bob')])
+    second = all_crawl_json(sherdog, tmp_path / 'second.json', [
+        make_fighter('Zed', [('A', 'win', 'Mar / 20 / 2005', '1', '3:24'),
+                             ('C', 'win', 'Jan / 02 / 2006', '3', '5:00')]),
+        make_fighter('Amy', [('D', 'loss', 'Jan / 02 / 2006', '1', '1:00')])])
+    output = tmp_path / 'merged.json'
+    assert merge.merge_outputs([first, second], str(output)) == {'read': 4, 'written': 3, 'duplicates': 1}
+    merged = json.load(open(output))
+    assert sorted(merged) == ['Amy', 'Bob', 'Zed']
+    assert [fight['opponent'] for fight in merged['Zed']] == ['A', 'C']  # later file wins, there are no timestamps.
+
+
+def test_merges_list_json_with_json_lines(sherdog, make_fighter, tmp_path):
+    path = list_json(sherdog, tmp_path / 'list.json', [
+        make_fighter('Zed', [('A', 'win', 'Mar / 20 / 2005', '1', '3:24')], url='/fighter/Zed-1', scraped_at=10),
+        make_fighter('Bob', url='/fighter/Bob-2', scraped_at=10)])
+    newer = make_fighter('Zed', [('A', 'win', 'Mar / 20 / 2005', '1', '3:24'),
+                                 ('B', 'win', 'Jan / 02 / 2006', '2', '1:00')], url='/fighter/Zed-1', scraped_at=20)
+    lines = tmp_path / 'sink.jsonl'
+    lines.write_text(json.dumps(newer.to_record()) + '\n')
+    output = tmp_path / 'merged.json'
+    assert merge.merge_outputs([str(lines), path], str(output))['written'] == 2
+    fighters = json.load(open(output))['fighters']
+    assert [(fighter['fighterUrl'], len(fighter['fightHistoryPro'])) for fighter in fighters] == [
+        ('/fighter/Bob-2', 0), ('/fighter/Zed-1', 2)]
+
+
+def test_all_crawl_json_is_not_mixed_with_list_json(sherdog, make_fighter, tmp_path):
+    crawl = all_crawl_json(sherdog, tmp_path / 'all.json', [
+        make_fighter('Zed', [('A', 'win', 'Mar / 20 / 2005', '1', '3:24')])])
+    listed = list_json(sherdog, tmp_path / 'list.json', [make_fighter('Bob', url='/fighter/Bob-2', scraped_at=1)])
+    with pytest.raises(ValueError):
+        merge.merge_outputs([crawl, listed], str(tmp_path / 'merged.json'))
+    with pytest.raises(ValueError):
+        merge.merge_outputs([crawl], str(tmp_path / 'merged.jsonl'))
+    assert not (tmp_path / 'merged.json').exists() and not (tmp_path / 'merged.jsonl').exists()
+
+
+def test_json_writer_rejects_mixed_layouts(tmp_path):
+    with open(tmp_path / 'out.json', 'w') as output_file:
+        writer = merge._JsonWriter(output_file, flat=True)
+        writer.write(['Zed', []])
+        with pytest.raises(ValueError):
+            writer.write({'name': 'Bob', 'fighterUrl': '/fighter/Bob-2'})
+
+
+def test_failed_pass_removes_its_runs(tmp_path, monkeypatch):
+    source = tmp_path / 'in.jsonl'
+    source.write_text(''.join(json.dumps({'fighterUrl': f'/fighter/{number}', 'scrapedAt': 1, 'name': 'x',
+                                          'fightHistoryPro': []}) + '\n' for number in range(200)))
+    runs = tmp_path / 'runs'
+    runs.mkdir()
+    monkeypatch.setattr(merge, 'MAX_OPEN_RUNS', 3)
+    original, opened = merge._iter_run, []
+
+    def failing_iter_run(path):
+        opened.append(path)
+        if len(opened) == 20:
+            raise OSError('disk full')
+        return original(path)
+
+    monkeypatch.setattr(merge, '_iter_run', failing_iter_run)
+    with pytest.raises(OSError):
+        merge.merge_outputs([str(source)], str(tmp_path / 'out.jsonl'), buffer_bytes=500, temp_dir=str(runs))
+    assert list(runs.iterdir()) == []
@@ -0,0 +1,15 @@
+import normalize
+
+
+def test_fight_seconds():
+    assert normalize.parse_fight_seconds('2', '3:24') == 300 + 204
+    assert normalize.parse_fight_seconds('2', '3:24', round_seconds=180) == 180 + 204
+    assert normalize.parse_fight_seconds('', '3:24') is None
+    assert normalize.parse_fight_seconds('1', 'N/A') is None
+
+
+def test_event_date_and_measurements():
+    assert normalize.parse_event_date('Jan / 02 / 1970') == 1
+    assert normalize.parse_event_date('N/A') is None
+    assert normalize.parse_height('6\'4"') == 193.0
+    assert normalize.parse_weight('205 lbs') == 93.0
@@ -0,0 +1,67 @@
+import csv
+import json
+
+import pytest
+
+from offset_index import OffsetIndex, OffsetReader, build_index
+from sinks import CSV_HEADERS
+
+
+@pytest.fixture
+def fighters(make_fighter):
+    return [make_fighter('José Aldo', [('Bob', 'win', 'Jan / 02 / 2008', '2', '1:00'),
+                                       ('Amy', 'loss', 'Jan / 02 / 2007', '3', '5:00')], url='/fighter/Jose-Aldo-1'),
+            make_fighter('Bob', [('José Aldo', 'loss', 'Jan / 02 / 2008', '2', '1:00')], url='/fighter/Bob-2')]
+
+
+def test_csv_index_built_while_writing(fighters, tmp_path):
+    path = str(tmp_path / 'out.csv')
+    with open(path, 'w', newline='') as csvfile:
+        csv.writer(csvfile, delimiter=';').writerow(CSV_HEADERS)
+    index = OffsetIndex(path)
+    for F in fighters:
+        F.save_to_csv(str(tmp_path / 'out'), index=index)
+    index.close()
+    written = OffsetIndex(path).connection.execute('SELECT key, offset, length FROM entries ORDER BY key').fetchall()
+    assert build_index(path) == 2  # the same entries are found by a scan of the finished file.
+    assert OffsetIndex(path).connection.execute('SELECT key, offset, length FROM entries ORDER BY key').fetchall() \
+        == written
+
+    reader = OffsetReader(path)
+    [rows] = reader.read_fighter(name='jose aldo')
+    assert [(row[0], row[1]) for row in rows] == [('José Aldo', 'Bob'), ('José Aldo', 'Amy')]
+    [[row]] = reader.read_fighter(url='/fighter/Bob-2')
+    assert (row[0], row[1], row[12]) == ('Bob', 'José Aldo', '/fighter/Bob-2')
+    assert reader.read_fighter(name='Nobody') == []
+    reader.close()
+
+
+def test_list_json_index(sherdog, fighters, tmp_path):
+    for F in fighters:
+        F.save_data()
+    path = str(tmp_path / 'list.json')
+    with open(path, 'w') as fighter_json:
+        json.dump(sherdog.allfighters, fighter_json, indent=4)
+    assert build_index(path) == 2
+    reader = OffsetReader(path)
+    assert reader.read_fighter(url='/fighter/Bob-2') == [sherdog.allfighters['fighters'][1]]
+    assert reader.read_fighter(name='Jose Aldo') == [sherdog.allfighters['fighters'][0]]
+    reader.close()
+
+
+def test_all_crawl_json_index(fighters, tmp_path):
+    path = str(tmp_path / 'all.json')
+    with open(path, 'w') as fighter_json:
+        json.dump({}, fighter_json)
+    for F in fighters:
+        F.save_to_json(str(tmp_path / 'all'))
+    assert build_index(path) == 2
+    reader = OffsetReader(path)
+    [(name, fights)] = reader.read_fighter(name='José Aldo')
+    assert name == 'José Aldo' and fights == json.load(open(path))['José Aldo']
+    reader.close()
+
+
+def test_compressed_output_cannot_be_indexed(sherdog, tmp_path):
+    with pytest.raises(ValueError):
+        sherdog._open_offset_index(str(tmp_path / 'out'), 'csv', 'gzip', True)
@@ -0,0 +1,43 @@
+import json
+
+import numpy as np
+
+from analytics import RESULTS
+from opponent_graph import OpponentGraph, build_graph
+
+
+def all_crawl_json(path, fighters):
+    # the same way scrape_all_fighters writes it - empty file first, then save_to_json for every fighter.
+    with open(path, 'w') as fighter_json:
+        json.dump({}, fighter_json)
+    for F in fighters:
+        F.save_to_json(str(path)[:-len('.json')])
+    return str(path)
+
+
+def test_graph_from_all_crawl_json(make_fighter, tmp_path):
+    path = all_crawl_json(tmp_path / 'all.json', [
+        make_fighter('Zed', [('Amy', 'win', 'Mar / 20 / 2005', '1', '3:24'),
+                             ('Bob', 'loss', 'Jun / 24 / 2006', '3', '5:00'),
+                             ('Bob', 'win', 'Jun / 24 / 2007', '2', '1:00')]),
+        make_fighter('Bob', [('Zed', 'win', 'Jun / 24 / 2006', '3', '5:00'),
+                             ('Zed', 'loss', 'Jun / 24 / 2007', '2', '1:00'),
+                             ('Cid', 'win', 'Jan / 02 / 2008', '1', '0:30')]),
+    ])
+    graph = build_graph([path])
+    assert sorted(graph.names) == ['Amy', 'Bob', 'Cid', 'Zed']
+    assert list(graph.scraped[[graph.node('Zed'), graph.node('Amy')]]) == [True, False]
+
+    fights = graph.head_to_head('Zed', 'Bob')
+    assert [RESULTS[result] for result in fights['result']] == ['loss', 'win']
+    assert list(fights['day']) == [np.datetime64(day, 'D').astype(int) for day in ('2006-06-24', '2007-06-24')]
+    # Amy was not scraped, her fight comes from Zed's record.
+    assert [RESULTS[result] for result in graph.head_to_head('Amy', 'Zed')['result']] == ['loss']
+
+    found, hops = graph.k_hop('Amy', 2)
+    assert dict(zip(graph.names[found], hops.tolist())) == {'Zed': 1, 'Bob': 2}
+    assert graph.describe(graph.win_chain('Zed', 'Cid')) == ['Zed (name:zed)', 'Bob (name:bob)', 'Cid (name:cid)']
+
+    graph.save(str(tmp_path / 'graph'))
+    loaded = OpponentGraph.load(str(tmp_path / 'graph'))
+    assert list(loaded.opponents('Bob')) == list(graph.opponents('Bob'))
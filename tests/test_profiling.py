@@ -0,0 +1,39 @@
+import cProfile
+
+import pytest
+
+import profiling
+
+
+class SilentProfile(cProfile.Profile):
+    # records nothing, like a profile of a call which was switched off right away.
+    def enable(self, *args, **kwargs):
+        pass
+
+    def disable(self):
+        pass
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    profiler = profiling.ScrapeProfiler(str(tmp_path / 'profile.txt'))
+    yield profiler
+    profiler.close()
+
+
+def test_report_lists_profiled_calls(profiler):
+    with profiler.profile('fighter', 'Zed') as record:
+        sorted(range(1000), key=lambda number: -number)
+        record['url'] = '/fighter/Zed-1'
+    report = open(profiler.write_report()).read()
+    assert report.startswith('Profiled calls: 1 (0 timed only)')
+    assert 'Zed  /fighter/Zed-1' in report and '<lambda>' in report
+
+
+def test_empty_profile_does_not_hide_exception(profiler, monkeypatch):
+    monkeypatch.setattr(profiling.cProfile, 'Profile', SilentProfile)
+    with pytest.raises(ValueError):
+        with profiler.profile('fighter', 'Zed'):
+            raise ValueError('parser bug')
+    assert profiler.calls == 1 and profiler.stats is None
+    assert 'Profiled calls: 1' in open(profiler.write_report()).read()
@@ -0,0 +1,77 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+import ratings
+from opponent_graph import build_graph
+from ratings import RatingEngine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def graph_of(sherdog, make_fighter, path, records):
+    # records: name -> fights, every fighter is scraped with url matching opponent urls made by make_fighter.
+    for name, fights in records.items():
+        make_fighter(name, fights, url=f'/fighter/{name}', scraped_at=1).save_data()
+    with open(path, 'w') as fighter_json:
+        json.dump(sherdog.allfighters, fighter_json, indent=4)  # the way scrape_list_of_fighters writes it.
+    sherdog.allfighters['fighters'].clear()
+    return build_graph([str(path)])
+
+
+def tournament(day='Jan / 02 / 2008'):
+    return {'Zed': [('Bob', 'win', day, '1', '1:00'), ('Bob', 'win', day, '1', '2:00'),
+                    ('Amy', 'loss', 'Jan / 02 / 2007', '3', '5:00')],
+            'Bob': [('Zed', 'loss', day, '1', '1:00'), ('Zed', 'loss', day, '1', '2:00')]}
+
+
+def test_same_day_rematches_are_kept(sherdog, make_fighter, tmp_path):
+    graph = graph_of(sherdog, make_fighter, tmp_path / 'list.json', tournament())
+    bouts = ratings.extract_bouts(graph)
+    pairs = sorted(zip((graph.keys[bouts['a']]).tolist(), graph.keys[bouts['b']].tolist(), bouts['rematch'].tolist()))
+    assert pairs == [('/fighter/Amy', '/fighter/Zed', 0), ('/fighter/Bob', '/fighter/Zed', 0),
+                     ('/fighter/Bob', '/fighter/Zed', 1)]
+
+
+def test_bouts_of_one_day_are_rated_together(sherdog, make_fighter, tmp_path):
+    graph = graph_of(sherdog, make_fighter, tmp_path / 'list.json', tournament())
+    engine = RatingEngine('elo')
+    assert engine.update(graph) == {'applied': 3, 'late': 0, 'undated': 0, 'days': 2}
+    rating = dict(zip(engine.keys.tolist(), engine.rating.tolist()))
+    # Zed lost to Amy first (-16), then beat Bob twice, both bouts rated against ratings from the start of the day.
+    expected = 1 / (1 + 10 ** ((1500 - 1484) / 400))
+    assert np.isclose(rating['/fighter/Zed'], 1484 + 2 * ratings.ELO_K * (1 - expected))
+    assert np.isclose(rating['/fighter/Bob'], 1500 - 2 * ratings.ELO_K * (1 - expected))
+    assert dict(zip(engine.keys.tolist(), engine.fights.tolist())) == {'/fighter/Amy': 1, '/fighter/Bob': 2,
+                                                                       '/fighter/Zed': 3}
+
+
+def test_incremental_update_matches_replay(sherdog, make_fighter, tmp_path):
+    records = tournament()
+    first = graph_of(sherdog, make_fighter, tmp_path / 'first.json', records)
+    records['Zed'].insert(0, ('Cid', 'draw', 'Jan / 02 / 2009', '3', '5:00'))
+    second = graph_of(sherdog, make_fighter, tmp_path / 'second.json', records)
+
+    engine = RatingEngine()
+    engine.update(first)
+    engine.save(str(tmp_path / 'state.npz'))
+    engine = RatingEngine.load(str(tmp_path / 'state.npz'))
+    assert engine.update(second) == {'applied': 1, 'late': 0, 'undated': 0, 'days': 1}
+    replayed = RatingEngine()
+    replayed.update(second)
+    assert list(engine.keys) == list(replayed.keys)
+    assert np.allclose(engine.rating, replayed.rating) and np.allclose(engine.rd, replayed.rd)
+
+
+def test_system_of_checkpoint_cannot_change(sherdog, make_fighter, tmp_path):
+    graph_of(sherdog, make_fighter, tmp_path / 'list.json', tournament()).save(str(tmp_path / 'graph'))
+    command = [sys.executable, os.path.join(ROOT, 'ratings.py'), 'graph', 'state.npz']
+    assert subprocess.run(command + ['--system', 'elo'], cwd=tmp_path, stdout=subprocess.DEVNULL).returncode == 0
+    assert subprocess.run(command + ['--system', 'glicko'], cwd=tmp_path, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL).returncode == 2
+    assert subprocess.run(command + ['--system', 'glicko', '--replay'], cwd=tmp_path,
+                          stdout=subprocess.DEVNULL).returncode == 0
+    assert RatingEngine.load(str(tmp_path / 'state.npz')).system == 'glicko'
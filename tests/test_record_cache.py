@@ -0,0 +1,49 @@
+import json
+import pickle
+import sqlite3
+
+from record_cache import RecordCache, content_hash
+
+PROFILE = ('<div class="module bio_fighter"><h1><span class="fn">Zed</span></h1></div>'
+           '<div class="module fight_history"><h2>Fight History - Pro</h2>{fights}</div>')
+
+
+def page(header='', ads='', fights='<td>win</td>'):
+    return (f'<html><head><script>var token = "{header}";</script></head><body>{header}'
+            + PROFILE.format(fights=f'<script>ad({ads!r})</script><!-- {ads} -->{fights}'))
+
+
+def test_hash_ignores_page_header_and_scripts():
+    assert content_hash(page('a', 'x')) == content_hash(page('b', 'y'))
+    assert content_hash(page('a', 'x')) != content_hash(page('a', 'x', fights='<td>loss</td>'))
+
+
+def test_records_are_stored_as_json(tmp_path):
+    path = str(tmp_path / 'records.db')
+    cache = RecordCache(path, parser_version=1)
+    fields = {'name': 'Zed', 'opponents': ['Bob', 'José'], 'fight_seconds': [90, None]}
+    cache.put('/fighter/Zed-1', page('a'), fields, scraped_at=10)
+    assert cache.get('/fighter/Zed-1', page('b', 'other ad')) == fields
+    assert cache.get('/fighter/Zed-1', page('a', fights='<td>loss</td>')) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+    stored = sqlite3.connect(path).execute('SELECT fields FROM records').fetchone()[0]
+    assert json.loads(stored) == fields
+    assert list(RecordCache(path, parser_version=1).iter_records()) == [('/fighter/Zed-1', 10, fields)]
+    assert list(RecordCache(path, parser_version=2).iter_records()) == []
+    assert RecordCache(path, parser_version=2).prune() == 1
+
+
+def test_pickled_cache_is_dropped(tmp_path):
+    path = str(tmp_path / 'records.db')
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE records (url TEXT PRIMARY KEY, content_hash TEXT NOT NULL, '
+                       'parser_version INTEGER NOT NULL, scraped_at INTEGER, fields BLOB NOT NULL)')
+    connection.execute('INSERT INTO records VALUES (?, ?, ?, ?, ?)',
+                       ('/fighter/Zed-1', content_hash(page()), 1, 10, pickle.dumps({'name': 'Zed'})))
+    connection.commit()
+    connection.close()
+    cache = RecordCache(path, parser_version=1)
+    assert cache.get('/fighter/Zed-1', page()) is None
+    assert list(cache.iter_records()) == []
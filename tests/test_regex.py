@@ -0,0 +1,52 @@
+import csv
+import random
+import re
+
+import pytest
+
+import regex
+
+
+def old_repair_row(row):
+    # repair rules of regex.py before it was made linear-time, kept as reference.
+    if len(row) == 1:
+        subbed = re.sub(r'(?!(([^"]*"){2})*[^"]*$),', '', row[0])
+        return subbed.replace('"', '').replace('-', '').split(',')
+    new_row = []
+    for word in row:
+        subbed = re.sub(r'(?!(([^"]*"){2})*[^"]*$),', '', word)
+        new_row.append(subbed.replace('"', '').replace('-', ''))
+    return new_row
+
+
+def random_text(generator, length):
+    return ''.join(generator.choice('ab ,"-') for _ in range(length))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_repair_field_matches_old_regex(seed):
+    generator = random.Random(seed)
+    for _ in range(2000):
+        text = random_text(generator, generator.randrange(30))
+        assert regex.repair_row([text]) == old_repair_row([text])
+        row = [random_text(generator, generator.randrange(10)) for _ in range(generator.randrange(2, 6))]
+        assert regex.repair_row(row) == old_repair_row(row)
+
+
+@pytest.mark.parametrize('jobs', [1, 3])
+def test_repair_csv_matches_old_script(tmp_path, jobs):
+    generator = random.Random(jobs)
+    source = tmp_path / 'sherdog.csv'
+    lines = ['Tony Galindo,Tony Lopez,loss,"KOTC 49 - Soboba, CA",Mar / 20 / 2005']
+    lines += [','.join(random_text(generator, 8) for _ in range(5)) for _ in range(500)]
+    source.write_text('\n'.join(lines) + '\n')
+
+    output = tmp_path / 'sherdog-subbed.csv'
+    with open(source, newline='') as csvfile:
+        rows = list(csv.reader(csvfile))
+    assert regex.repair_csv(str(source), str(output), jobs=jobs, chunk_size=37) == len(rows)
+
+    expected = tmp_path / 'expected.csv'
+    with open(expected, 'w', newline='') as f:
+        csv.writer(f, delimiter=';', skipinitialspace=True).writerows(old_repair_row(row) for row in rows)
+    assert output.read_bytes() == expected.read_bytes()
@@ -0,0 +1,80 @@
+import pytest
+
+import retry_queue
+from retry_queue import RetryQueue, TransientError
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    monkeypatch.setattr('retry_queue.time.sleep', lambda seconds: None)
+
+
+def test_queue_replays_pending_items(tmp_path):
+    path = str(tmp_path / 'failed.jsonl')
+    queue = RetryQueue(path)
+    queue.record_failure('index', 1, 'timeout')
+    queue.record_failure('page', '/fighter/A-2', 'timeout')
+    queue.record_failure('index', 1, 'timeout', attempts=2)
+    queue.resolve('page', '/fighter/A-2')
+    with open(path, 'a') as queue_file:
+        queue_file.write('{"key": "index:3", "kin')  # line cut short by a crash.
+    pending = RetryQueue(path).pending()
+    assert [(record['payload'], record['attempts']) for record in pending] == [(1, 3)]
+    assert RetryQueue(path).pending(max_attempts=3) == []
+
+
+def test_failed_validation_is_saved_not_queued(sherdog, tmp_path, monkeypatch):
+    queue = RetryQueue(str(tmp_path / 'failed.jsonl'))
+    queue.record_failure('index', 5, 'timeout')  # failed in an earlier run.
+
+    def scrape_fighter(self, *args, **kwargs):
+        self.name, self.validation, self.saved = 'Zed', False, True  # lists of different lengths are still saved.
+        return True
+
+    monkeypatch.setattr(sherdog.Fighter, 'scrape_fighter', scrape_fighter)
+    assert sherdog.scrape_with_retry(queue, ('index', 5), 'csv', str(tmp_path / 'out'), fighter_index=5).saved
+    assert queue.pending() == []
+
+
+def test_only_transient_errors_are_queued(sherdog, tmp_path, monkeypatch, no_sleep):
+    queue = RetryQueue(str(tmp_path / 'failed.jsonl'))
+
+    def scrape_fighter(self, filetype, filename, fighter_index=None, **kwargs):
+        if fighter_index == 1:
+            raise TransientError('503')
+        raise ValueError('parser bug')
+
+    monkeypatch.setattr(sherdog.Fighter, 'scrape_fighter', scrape_fighter)
+    assert sherdog.scrape_with_retry(queue, ('index', 1), 'csv', str(tmp_path / 'out'), fighter_index=1) is None
+    with pytest.raises(ValueError):
+        sherdog.scrape_with_retry(queue, ('index', 2), 'csv', str(tmp_path / 'out'), fighter_index=2)
+    assert [(record['payload'], record['attempts']) for record in queue.pending()] == [
+        (1, retry_queue.RETRY_ATTEMPTS)]
+
+
+def test_search_queues_only_transient_failures(sherdog, tmp_path, monkeypatch, no_sleep):
+    queue = RetryQueue(str(tmp_path / 'failed.jsonl'))
+    fighters = [('Lost', 'Lightweight', 'NA'), ('Gone', 'Lightweight', 'NA'), ('Odd', 'Lightweight', 'NA'),
+                ('Nowhere', 'Lightweight', 'NA')]
+    for fighter in fighters:
+        queue.record_failure('search', list(fighter), 'ambiguous')  # queued by an earlier version.
+
+    def fetch_once(url, load):
+        if 'Lost' in url:
+            raise TransientError('503')
+        if 'Gone' in url:
+            raise KeyError('weight class')
+        if 'Odd' in url:
+            return [{'href': '/fighter/Odd-3'}]
+        return IndexError
+
+    def scrape_fighter(self, *args, fighter_page=None, **kwargs):
+        self.name, self.url, self.validation, self.saved = 'Odd', fighter_page, False, True
+        return True
+
+    monkeypatch.setattr(sherdog, 'fetch_once', fetch_once)
+    monkeypatch.setattr(sherdog.Fighter, 'scrape_fighter', scrape_fighter)
+    outcomes = sherdog.iter_scrape_list_of_fighters(fighters, str(tmp_path / 'out'), retry_queue=queue)
+    statuses = {outcome.fighter[0]: outcome.status for outcome in outcomes}
+    assert statuses == {'Lost': 'error', 'Gone': 'unknown_weight_class', 'Odd': 'invalid', 'Nowhere': 'not_found'}
+    assert [record['payload'] for record in queue.pending()] == [list(fighters[0])]
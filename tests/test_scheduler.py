@@ -0,0 +1,23 @@
+import json
+
+import pytest
+
+import scheduler
+
+
+def test_states_from_list_json(sherdog, make_fighter, tmp_path):
+    make_fighter('Zed', [('A', 'win', 'Mar / 20 / 2005', '1', '3:24'), ('B', 'loss', 'Jun / 24 / 2007', '2', '0:07')],
+                 url='/fighter/Zed-1', scraped_at=86400).save_data()
+    path = tmp_path / 'list.json'
+    path.write_text(json.dumps(sherdog.allfighters))
+    states = scheduler.load_fighter_states(str(path))
+    assert states == {'/fighter/Zed-1': {'name': 'Zed', 'last_event_day': 13688, 'scraped_at': 86400}}
+    assert scheduler.plan_recrawl(states, 5, now=86400 * 13700)[0][1] == '/fighter/Zed-1'
+
+
+def test_all_crawl_json_is_rejected(sherdog, make_fighter, tmp_path):
+    path = tmp_path / 'all.json'
+    path.write_text('{}')
+    make_fighter('Zed', [('A', 'win', 'Mar / 20 / 2005', '1', '3:24')]).save_to_json(str(tmp_path / 'all'))
+    with pytest.raises(ValueError):
+        scheduler.load_fighter_states(str(path))
@@ -0,0 +1,19 @@
+import json
+
+
+def test_generator_writes_json_when_exhausted(sherdog, make_fighter, tmp_path, monkeypatch):
+    fighters = [('Zed', 'Lightweight', 'NA'), ('Bob', 'Lightweight', 'NA')]
+
+    def scrape_fighter(self, filetype, filename, fighter_page=None, **kwargs):
+        name = fighter_page.split('/')[-1]
+        vars(self).update(vars(make_fighter(name, [('A', 'win', 'Mar / 20 / 2005', '1', '3:24')], url=fighter_page)))
+        return self.save_extracted(filetype, filename)
+
+    monkeypatch.setattr(sherdog, 'fetch_once', lambda url, load: [{'href': f'/fighter/{url.split("=")[-1]}'}])
+    monkeypatch.setattr(sherdog.Fighter, 'scrape_fighter', scrape_fighter)
+    path = tmp_path / 'list.json'
+    outcomes = sherdog.iter_scrape_list_of_fighters(fighters, str(tmp_path / 'list'), filetype='json')
+    assert next(outcomes).status == 'scraped'
+    assert json.load(open(path)) == {}  # only initialized so far.
+    assert [outcome.status for outcome in outcomes] == ['scraped']
+    assert sorted(fighter['name'] for fighter in json.load(open(path))['fighters']) == ['Bob', 'Zed']
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def run_together(flights, count, key, function):
+    # starts count threads calling flights.do at once, returns their results (or exceptions).
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def call(position):
+        barrier.wait()
+        try:
+            results[position] = flights.do(key, function)
+        except Exception as e:
+            results[position] = e
+
+    threads = [threading.Thread(target=call, args=(position,)) for position in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def slow(flights, waiting, result=None, error=None):
+    # work finishes only once the other threads are waiting for it.
+    calls = []
+
+    def work():
+        calls.append(1)
+        deadline = time.time() + 5
+        while flights.stats()['saved'] < waiting and time.time() < deadline:
+            time.sleep(0.01)
+        if error is not None:
+            raise error
+        return result
+    return work, calls
+
+
+def test_concurrent_calls_share_one_result():
+    flights = SingleFlight()
+    work, calls = slow(flights, 7, result='page')
+    assert run_together(flights, 8, 'url', work) == ['page'] * 8
+    assert len(calls) == 1
+    assert flights.stats() == {'calls': 1, 'saved': 7}
+    assert flights.flights == {}
+
+
+def test_error_is_raised_in_every_waiting_thread():
+    flights = SingleFlight()
+    error = ValueError('503')
+    work, calls = slow(flights, 3, error=error)
+    assert run_together(flights, 4, 'url', work) == [error] * 4
+    assert len(calls) == 1
+
+
+def test_finished_work_is_not_cached():
+    flights = SingleFlight()
+    assert flights.do('url', lambda: 1) == 1
+    assert flights.do('url', lambda: 2) == 2
+    with pytest.raises(KeyError):
+        flights.do('url', lambda: {}['missing'])
+    assert flights.do('other', lambda: 3) == 3
+    assert flights.stats() == {'calls': 4, 'saved': 0}
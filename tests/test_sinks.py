@@ -0,0 +1,73 @@
+import csv
+import gzip
+import json
+import sqlite3
+
+import pytest
+
+import sinks
+from sinks import CSV_HEADERS, FanOut, Sink
+
+
+@pytest.fixture
+def records(make_fighter):
+    return [make_fighter('Zed', [('Bob', 'win', 'Jan / 02 / 2008', '2', '1:00'),
+                                 ('Amy', 'loss', 'Jan / 02 / 2007', '3', '5:00')], url='/fighter/Zed-1',
+                         scraped_at=10).to_record(),
+            make_fighter('Bob', [('Zed', 'loss', 'Jan / 02 / 2008', '2', '1:00')], url='/fighter/Bob-2',
+                         scraped_at=20).to_record()]
+
+
+class BrokenSink(Sink):
+    def _write_batch(self, records):
+        raise OSError('disk full')
+
+
+def test_fan_out_writes_every_sink(records, tmp_path):
+    fan_out = FanOut([f'csv:{tmp_path / "out.csv.gz"}', f'jsonl:{tmp_path / "out.jsonl"}',
+                      f'sqlite:{tmp_path / "out.db"}'])
+    for record in records:
+        fan_out.emit(record)
+    assert set(stats['written'] for stats in fan_out.close().values()) == {2}
+
+    with gzip.open(tmp_path / 'out.csv.gz', 'rt', encoding='ISO-8859-1', newline='') as csvfile:
+        rows = list(csv.reader(csvfile, delimiter=';'))
+    assert rows[0] == CSV_HEADERS
+    assert [(row[0], row[1], row[11], row[12]) for row in rows[1:]] == [
+        ('Zed', 'Bob', '360', '/fighter/Zed-1'), ('Zed', 'Amy', '900', '/fighter/Zed-1'),
+        ('Bob', 'Zed', '360', '/fighter/Bob-2')]
+    assert [json.loads(line) for line in open(tmp_path / 'out.jsonl')] == records
+    database = sqlite3.connect(str(tmp_path / 'out.db'))
+    assert database.execute('SELECT fighter_url, scraped_at FROM fighters ORDER BY fighter_url').fetchall() == [
+        ('/fighter/Bob-2', 20), ('/fighter/Zed-1', 10)]
+    assert database.execute('SELECT COUNT(*) FROM fights').fetchone() == (3,)
+
+
+def test_rescraped_fighter_replaces_sqlite_rows_and_csv_appends(records, tmp_path):
+    for append in (False, True):
+        fan_out = FanOut([f'sqlite:{tmp_path / "out.db"}', f'csv:{tmp_path / "out.csv"}'], append=append)
+        fan_out.emit(records[0])
+        fan_out.close()
+    database = sqlite3.connect(str(tmp_path / 'out.db'))
+    assert database.execute('SELECT COUNT(*) FROM fighters').fetchone() == (1,)
+    assert database.execute('SELECT COUNT(*) FROM fights').fetchone() == (2,)
+    rows = list(csv.reader(open(tmp_path / 'out.csv', newline=''), delimiter=';'))
+    assert [row[0] for row in rows] == ['Fighter', 'Zed', 'Zed', 'Zed', 'Zed']  # headers are written only once.
+
+
+def test_failing_sink_is_switched_off(records, tmp_path):
+    broken = BrokenSink(str(tmp_path / 'broken'), batch_size=1, max_errors=2)
+    fan_out = FanOut([broken, f'jsonl:{tmp_path / "out.jsonl"}'])
+    for record in records * 3:
+        fan_out.emit(record)
+    stats = fan_out.close()
+    assert stats[broken.path] == {'written': 0, 'dropped': 6, 'errors': 2}
+    assert broken.disabled
+    assert stats[str(tmp_path / 'out.jsonl')] == {'written': 6, 'dropped': 0, 'errors': 0}
+
+
+def test_unknown_sink_is_rejected():
+    with pytest.raises(ValueError):
+        sinks.open_sink('parquet:out.parquet')
+    with pytest.raises(ValueError):
+        sinks.open_sink('csv')
@@ -0,0 +1,61 @@
+PAGE = ('<html><body><div class="module bio_fighter"><h1><span class="fn">José Aldo</span></h1></div>'
+        '<div class="module fight_history"><div class="module_header"><h2>Fight History - Amateur</h2></div>'
+        '<table><tr><td>win</td></tr></table></div>'
+        '<div class="module fight_history"><div class="module_header"><h2>Fight History - Pro</h2></div>'
+        '<table><tr><td>loss</td></tr></table></div>')
+FOOTER = '<div class="footer">' + 'x' * 5000 + '</div></body></html>'
+
+
+class FakeResponse(object):
+    # streamed response handing out the body in chunks and counting how many of them were read.
+    def __init__(self, body, chunk_size):
+        self.body = body.encode('utf-8')
+        self.chunk_size = chunk_size
+        self.encoding = 'utf-8'
+        self.read = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size=None):
+        for start in range(0, len(self.body), self.chunk_size):
+            self.read += 1
+            yield self.body[start:start + self.chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+def test_parser_waits_for_pro_history(sherdog):
+    watcher = sherdog.ProfileStreamParser()
+    amateur_end = PAGE.index('Fight History - Pro')
+    for position in range(0, amateur_end, 7):  # heading text split between chunks.
+        watcher.feed(PAGE[position:min(position + 7, amateur_end)])
+    assert not watcher.complete
+    watcher.feed(PAGE[amateur_end:-10])
+    assert not watcher.complete
+    watcher.feed(PAGE[-10:])
+    assert watcher.complete
+
+
+def test_streaming_stops_after_pro_history(sherdog, monkeypatch):
+    chunk_size = PAGE.encode('utf-8').index('é'.encode('utf-8')) + 1  # the first chunk ends inside 'é'.
+    response = FakeResponse(PAGE + FOOTER, chunk_size)
+    monkeypatch.setattr(sherdog, 'fetch', lambda url, stream=False: response)
+    F = sherdog.Fighter()
+    F.url = '/fighter/Jose-Aldo-1'
+    F._set_resource()
+    assert response.closed
+    assert response.read == len(PAGE.encode('utf-8')) // chunk_size + 1  # footer was never downloaded.
+    assert F.html.startswith(PAGE) and len(F.html) < len(PAGE) + chunk_size
+    F._set_soup()
+    F.set_name()
+    assert F.name == 'José Aldo'  # multi-byte character split between chunks is decoded.
+
+
+def test_page_without_pro_history_is_read_to_the_end(sherdog, monkeypatch):
+    body = PAGE[:PAGE.index('<div class="module fight_history"><div class="module_header"><h2>Fight History - Pro')]
+    response = FakeResponse(body + FOOTER, chunk_size=100)
+    monkeypatch.setattr(sherdog, 'fetch', lambda url, stream=False: response)
+    F = sherdog.Fighter()
+    F._set_resource()
+    assert F.html == body + FOOTER
+    assert response.closed